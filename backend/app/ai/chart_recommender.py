@@ -0,0 +1,158 @@
+"""Rule-based analysis for results too simple to need an LLM call.
+
+Empty results, single values and two-column time series get a chart config
+and a templated insight straight from the shape and value types of the
+result.  ``analyze_locally`` returns ``None`` for anything else, and the
+caller falls back to ``AnalyzeAndVisualize``.  The return value has the same
+keys as ``AnalyzeAndVisualize.analyze``.
+"""
+
+import datetime as dt
+import re
+from decimal import Decimal
+
+from app.core.constants import LOCAL_ANALYSIS_MAX_ROWS
+
+# Matched against whole words of the column name ("unit_price", "churnRate").
+_CURRENCY_HINTS = frozenset({
+    "revenue", "sales", "amount", "price", "cost", "spend", "income", "profit", "gmv", "arpu",
+})
+_PERCENT_HINTS = frozenset({"pct", "percent", "rate", "ratio", "share"})
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_NAME_WORD = re.compile(r"[a-z0-9]+")
+_YEAR_MONTH = re.compile(r"^\d{4}-\d{2}$")
+
+NO_TOKENS = {"input_tokens": 0, "output_tokens": 0}
+
+
+def analyze_locally(user_message: str, result_data: dict) -> dict | None:
+    """Insight and chart for a trivial result, or ``None`` if it needs the LLM."""
+    columns = result_data.get("columns", [])
+    rows = result_data.get("rows", [])
+    if result_data.get("truncated") or result_data.get("sample_percent") is not None \
+            or len(rows) > LOCAL_ANALYSIS_MAX_ROWS:
+        return None
+
+    if not rows:
+        return _analysis(
+            "No rows matched your question. Try widening the filters or the date range.",
+            f"Query for '{user_message[:80]}' returned no rows.",
+            {"chart_type": "table", "title": "Results", "highlight_columns": []},
+        )
+
+    if len(rows) == 1 and len(columns) == 1 and _is_number(rows[0][0]):
+        column, value = columns[0], rows[0][0]
+        label, fmt = _label(column), _value_format(column)
+        shown = _format_value(value, fmt, _is_fraction([value]))
+        return _analysis(
+            f"{label}: {shown}.",
+            f"Answered '{user_message[:80]}' with a single value: {label} = {shown}.",
+            {"chart_type": "kpi", "value_column": column, "title": label, "format": fmt},
+        )
+
+    if len(columns) == 2 and len(rows) >= 2:
+        for x, y in ((0, 1), (1, 0)):
+            if all(_is_temporal(row[x]) and _is_number(row[y]) for row in rows):
+                points = [(row[x], row[y]) for row in rows]
+                return _time_series(user_message, columns[x], columns[y], points)
+
+    return None
+
+
+def _time_series(user_message: str, x_column: str, y_column: str, points: list[tuple]) -> dict:
+    points.sort(key=lambda p: _sort_key(p[0]))
+    label, fmt = _label(y_column), _value_format(y_column)
+    fraction = _is_fraction([y for _, y in points])
+    (x_first, first), (x_last, last) = points[0], points[-1]
+    x_peak, peak = max(points, key=lambda p: p[1])
+    x_low, low = min(points, key=lambda p: p[1])
+
+    change = ""
+    if first:
+        change = f" ({(float(last) - float(first)) / abs(float(first)):+.1%})"
+    insight = (
+        f"{label} went from {_format_value(first, fmt, fraction)} ({x_first}) to "
+        f"{_format_value(last, fmt, fraction)} ({x_last}){change} over {len(points)} periods. "
+        f"It peaked at {_format_value(peak, fmt, fraction)} ({x_peak}) and was lowest at "
+        f"{_format_value(low, fmt, fraction)} ({x_low})."
+    )
+    return _analysis(
+        insight,
+        f"Showed {label.lower()} by {_label(x_column).lower()} from {x_first} to {x_last}; "
+        f"latest {_format_value(last, fmt, fraction)}{change}.",
+        {
+            "chart_type": "line",
+            "x_column": x_column,
+            "y_column": y_column,
+            "title": f"{label} by {_label(x_column).lower()}",
+            "color_column": None,
+            "sort_by": x_column,
+            "sort_order": "asc",
+        },
+    )
+
+
+def _analysis(insight: str, context_summary: str, chart_config: dict) -> dict:
+    return {
+        "insight": insight,
+        "context_summary": context_summary,
+        "chart_config": chart_config,
+        "token_usage": dict(NO_TOKENS),
+    }
+
+
+# ── Value inspection ────────────────────────────────────────────────────────
+
+def _is_number(value) -> bool:
+    return isinstance(value, int | float | Decimal) and not isinstance(value, bool)
+
+
+def _is_temporal(value) -> bool:
+    if isinstance(value, dt.date | dt.datetime):
+        return True
+    if not isinstance(value, str):
+        return False
+    if _YEAR_MONTH.match(value):
+        return True
+    try:
+        dt.datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _sort_key(value) -> str:
+    # ISO strings and date/datetime reprs order the same way lexically.
+    return value.isoformat() if isinstance(value, dt.date | dt.datetime) else value
+
+
+def _label(column: str) -> str:
+    return column.replace("_", " ").strip().capitalize() or column
+
+
+def _value_format(column: str) -> str:
+    words = _NAME_WORD.findall(_CAMEL_BOUNDARY.sub("_", column).lower())
+    words += [word.removesuffix("s") for word in words]  # "prices", "rates"
+    if not _PERCENT_HINTS.isdisjoint(words):
+        return "percent"
+    if not _CURRENCY_HINTS.isdisjoint(words):
+        return "currency"
+    return "number"
+
+
+def _is_fraction(values: list) -> bool:
+    """Whether a percent column holds fractions (0.25) rather than points (25),
+    judged on all of its values so one column never mixes the two."""
+    return all(abs(float(value)) <= 1 for value in values)
+
+
+def _format_value(value, fmt: str, fraction: bool = False) -> str:
+    number = float(value)
+    if fmt == "percent":
+        return f"{number:.1%}" if fraction else f"{number:.1f}%"
+    for threshold, suffix in ((1e9, "B"), (1e6, "M")):
+        if abs(number) >= threshold:
+            return f"{number / threshold:.1f}{suffix}"
+    if isinstance(value, int) or number.is_integer():
+        return f"{int(number):,}"
+    return f"{number:,.2f}"
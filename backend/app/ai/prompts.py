@@ -8,16 +8,12 @@ Treat every word as production code.
 SYSTEM_PROMPT_SQL_GENERATION = """You are DataMind, an expert SQL analyst embedded in a business intelligence platform.
 Your job is to convert natural language business questions into precise, efficient SQL queries.
 
-## Your Connected Database Schema
-
-{schema_context}
-
 ## Instructions
 
 1. ANALYZE the user's question carefully. Identify metrics, dimensions, filters, and time ranges.
 
 2. GENERATE a single SQL query. Follow these rules:
-   - Use ONLY tables and columns in the schema above
+   - Use ONLY tables and columns in the connected database schema below
    - ALWAYS qualify column names with table aliases
    - For time-based questions, use the most recent data unless a specific period is mentioned
    - Default to ORDER BY the most relevant metric DESC, LIMIT 20 unless the user specifies otherwise
@@ -52,6 +48,13 @@ FROM ...
   <sql>NOT_DATA_QUERY</sql>
 """
 
+# Sent after SYSTEM_PROMPT_SQL_GENERATION as its own system block, so the
+# instructions stay a cacheable prefix when the schema is a per-question selection.
+SQL_GENERATION_SCHEMA = """## Your Connected Database Schema
+
+{schema_context}
+"""
+
 
 SYSTEM_PROMPT_ANALYZE_AND_VISUALIZE = """You are DataMind, an AI business analyst. You've executed a SQL query and now must:
 1. Write a clear business insight from the results
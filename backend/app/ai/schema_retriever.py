@@ -0,0 +1,177 @@
+"""Relevance-ranked schema selection for SQL generation prompts.
+
+Large warehouses do not fit in a prompt, so instead of the whole schema the
+SQL generator gets the tables most relevant to the question:
+
+1. Every table is a document (name, column names, AI descriptions, business
+   terms, sample values) in a BM25 index.
+2. The best-scoring tables seed the selection and pull in their foreign-key
+   partners (both directions) so the joins the question needs are present.
+3. Tables are rendered in score order, in full while the token budget
+   allows, then as a one-line summary; remaining table names are listed last.
+
+Everything is local and deterministic (ties break on table name), so
+retrieval can be benchmarked for recall and latency offline.
+"""
+
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+# BM25 parameters (the usual defaults).
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Field weights: a hit in a table name says more than one in a sample value.
+TABLE_NAME_WEIGHT = 3
+COLUMN_NAME_WEIGHT = 2
+
+# Tables chosen by score before FK expansion; partners inherit a damped score.
+SEED_TABLES = 8
+FK_PARTNER_DAMPING = 0.5
+
+CHARS_PER_TOKEN = 4
+
+# Plural acronym (IDs), acronym before a word (HTTPServer), word, bare acronym, number.
+_WORD = re.compile(r"[A-Z]+s(?![a-z])|[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased terms; splits snake_case and camelCase, folds simple plurals."""
+    terms = []
+    for word in _WORD.findall(text):
+        if len(word) > 2 and word.endswith("s") and word[:-1].isupper():
+            word = word[:-1]
+        word = word.lower()
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class SchemaDocument:
+    """One table: its prompt renderings plus what retrieval needs."""
+    name: str
+    full: str  # Multi-line block with every column
+    compact: str  # One line: name and column list
+    search_text: str  # Descriptions, business terms, sample values
+    column_names: list[str]
+    fk_tables: list[str]  # Tables this one references
+
+    def to_dict(self) -> dict:
+        return self.__dict__.copy()
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SchemaDocument":
+        return cls(**data)
+
+
+class SchemaIndex:
+    """BM25 index over a connection's tables (build once per schema version)."""
+
+    def __init__(self, documents: list[SchemaDocument]):
+        self.documents = documents
+        self._by_name = {doc.name: doc for doc in documents}
+        # Rendered once: indexes are cached per schema version.
+        self._full_context: str | None = None
+        self._full_tokens: int | None = None
+        self._term_freqs: list[Counter] = []
+        for doc in documents:
+            terms = Counter()
+            for term in tokenize(doc.name):
+                terms[term] += TABLE_NAME_WEIGHT
+            for column in doc.column_names:
+                for term in tokenize(column):
+                    terms[term] += COLUMN_NAME_WEIGHT
+            terms.update(tokenize(doc.search_text))
+            self._term_freqs.append(terms)
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if documents else 0.0
+        doc_freq = Counter(term for tf in self._term_freqs for term in tf)
+        n = len(documents)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+        # Undirected FK graph for join-partner expansion.
+        self._neighbours: dict[str, set[str]] = {doc.name: set() for doc in documents}
+        for doc in documents:
+            for target in doc.fk_tables:
+                if target in self._neighbours and target != doc.name:
+                    self._neighbours[doc.name].add(target)
+                    self._neighbours[target].add(doc.name)
+
+    def full_context(self) -> str:
+        if self._full_context is None:
+            self._full_context = "\n\n".join(doc.full for doc in self.documents)
+        return self._full_context
+
+    def fits(self, token_budget: int) -> bool:
+        """Whether ``select`` renders the full schema, the same text for every question."""
+        if self._full_tokens is None:
+            self._full_tokens = estimate_tokens(self.full_context())
+        return self._full_tokens <= token_budget
+
+    def scores(self, question: str) -> dict[str, float]:
+        """BM25 score of every table for *question* (0 for no overlap)."""
+        query = set(tokenize(question))
+        scores = {}
+        for doc, tf, length in zip(self.documents, self._term_freqs, self._lengths):
+            score = 0.0
+            for term in query:
+                freq = tf.get(term)
+                if freq:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (self._avg_length or 1))
+                    score += self._idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            scores[doc.name] = score
+        return scores
+
+    def rank(self, question: str) -> list[str]:
+        """Table names by relevance: BM25 seeds, then their FK partners, then the rest."""
+        scores = self.scores(question)
+        seeds = sorted((name for name, s in scores.items() if s > 0), key=lambda n: (-scores[n], n))
+        ranked = {name: scores[name] for name in seeds[:SEED_TABLES]}
+        for seed in seeds[:SEED_TABLES]:
+            for partner in self._neighbours[seed]:
+                ranked[partner] = max(
+                    ranked.get(partner, 0.0), scores[partner], scores[seed] * FK_PARTNER_DAMPING,
+                )
+        for name in seeds[SEED_TABLES:]:
+            ranked.setdefault(name, scores[name])
+        ordered = sorted(ranked, key=lambda n: (-ranked[n], n))
+        # No lexical match at all: keep the catalog order so the prompt degrades to a truncated full schema.
+        rest = [doc.name for doc in self.documents if doc.name not in ranked]
+        return ordered + rest
+
+    def select(self, question: str, token_budget: int) -> str:
+        """Render the most relevant tables for *question* within *token_budget*."""
+        if self.fits(token_budget):
+            return self.full_context()
+
+        parts, leftovers, used = [], [], 0
+        for name in self.rank(question):
+            doc = self._by_name[name]
+            for text in (doc.full, doc.compact):
+                cost = estimate_tokens(text) + 1
+                if used + cost <= token_budget:
+                    parts.append(text)
+                    used += cost
+                    break
+            else:
+                leftovers.append(name)
+
+        if leftovers:
+            listing = "Other tables (not shown): "
+            for name in leftovers:
+                if estimate_tokens(listing + name) + used > token_budget:
+                    listing += "..."
+                    break
+                listing += name + ", "
+            parts.append(listing.rstrip(", "))
+        return "\n\n".join(parts)
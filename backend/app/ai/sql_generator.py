@@ -3,10 +3,21 @@
 import re
 from typing import Optional
 from anthropic import AsyncAnthropic
-from app.ai.prompts import SYSTEM_PROMPT_SQL_GENERATION
+from app.ai.prompts import SQL_GENERATION_SCHEMA, SYSTEM_PROMPT_SQL_GENERATION
+from app.core.metrics import metrics
 from loguru import logger
 
 
+def usage_dict(usage) -> dict:
+    """Token usage of a response, including prompt-cache writes and reads."""
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+    }
+
+
 class SQLGenerator:
     def __init__(self, client: AsyncAnthropic, model: str = "claude-sonnet-4-20250514"):
         self.client = client
@@ -18,22 +29,43 @@ class SQLGenerator:
         schema_context: str,
         conversation_history: list[dict],
         on_stream: Optional[callable] = None,
+        cache_schema: bool = True,
     ) -> dict:
-        """Generate SQL from natural language question."""
-        system_prompt = SYSTEM_PROMPT_SQL_GENERATION.format(
-            schema_context=schema_context
-        )
+        """Generate SQL from natural language question.
+
+        The system prompt is the instructions, which never change and are sent
+        as a prompt-cache block, followed by the schema context.  The schema
+        is cached as well unless ``cache_schema=False``: a per-question table
+        selection would only write cache entries the next question misses.
+
+        The instructions alone are below Anthropic's minimum cacheable prompt
+        (1024 tokens), so their breakpoint is a no-op: a schema too large to
+        send whole is not cached at all, and only schemas within
+        ``SCHEMA_CONTEXT_TOKEN_BUDGET`` get cache reads.
+        """
+        schema_block = {
+            "type": "text",
+            "text": SQL_GENERATION_SCHEMA.format(schema_context=schema_context),
+        }
+        if cache_schema:
+            schema_block["cache_control"] = {"type": "ephemeral"}
+        system_blocks = [
+            {
+                "type": "text",
+                "text": SYSTEM_PROMPT_SQL_GENERATION,
+                "cache_control": {"type": "ephemeral"},
+            },
+            schema_block,
+        ]
 
         messages = [*conversation_history, {"role": "user", "content": user_message}]
 
         full_text = ""
-        input_tokens = 0
-        output_tokens = 0
 
-        async with self.client.messages.stream(
+        async with self.client.beta.prompt_caching.messages.stream(
             model=self.model,
             max_tokens=2000,
-            system=system_prompt,
+            system=system_blocks,
             messages=messages,
         ) as stream:
             async for text in stream.text_stream:
@@ -41,8 +73,10 @@ class SQLGenerator:
                 if on_stream:
                     await on_stream({"phase": "generating_sql", "chunk": text})
             final_message = await stream.get_final_message()
-            input_tokens = final_message.usage.input_tokens
-            output_tokens = final_message.usage.output_tokens
+
+        token_usage = usage_dict(final_message.usage)
+        for key in ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            metrics.incr(f"llm.sql.{key}", token_usage[key])
 
         sql = self._extract_sql(full_text)
         reasoning = self._extract_reasoning(full_text)
@@ -51,10 +85,7 @@ class SQLGenerator:
             "sql": sql,
             "reasoning": reasoning,
             "raw_response": full_text,
-            "token_usage": {
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-            },
+            "token_usage": token_usage,
         }
 
     def _extract_sql(self, text: str) -> str:
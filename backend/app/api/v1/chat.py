@@ -16,6 +16,7 @@ from sqlalchemy.orm import selectinload
 
 from app.core.database import get_db
 from app.core.exceptions import raise_not_found, raise_forbidden
+from app.core.metrics import StageTimer
 from app.core.sql_validator import SQLSafetyValidator
 from app.dependencies import get_current_user
 from app.models.chat_session import ChatSession
@@ -101,9 +102,9 @@ async def send_message(
 
     # Run the AI pipeline
     connection_manager = ConnectionManager()
-    schema_discoverer = SchemaDiscoverer()
-    query_executor = QueryExecutor(connection_manager)
     cache_service = CacheService()
+    schema_discoverer = SchemaDiscoverer(cache=cache_service)
+    query_executor = QueryExecutor(connection_manager)
     conversation_manager = ConversationManager()
     sql_validator = SQLSafetyValidator()
 
@@ -115,6 +116,7 @@ async def send_message(
         conversation_provider=conversation_manager,
     )
 
+    timer = StageTimer()
     try:
         ai_response = await ai_engine.process_message(
             user_message=payload.message,
@@ -122,6 +124,7 @@ async def send_message(
             session_id=str(session.id),
             db=db,
             org_id=str(user.org_id),
+            timer=timer,
         )
     except Exception as e:
         logger.error(f"AIEngine error for session {session.id}: {e}")
@@ -145,9 +148,10 @@ async def send_message(
         token_usage=ai_response.token_usage,
         context_summary=ai_response.context_summary,
     )
-    db.add(assistant_message)
-    await db.flush()
-    await db.refresh(assistant_message)
+    with timer.stage("persist"):
+        db.add(assistant_message)
+        await db.flush()
+        await db.refresh(assistant_message)
 
     return ChatResponse(
         content=ai_response.content,
@@ -158,6 +162,7 @@ async def send_message(
         chart_config=ai_response.chart_config,
         execution_time_ms=ai_response.execution_time_ms,
         token_usage=ai_response.token_usage,
+        stage_timings=timer.as_dict(),
         error_message=ai_response.error_message,
         session_id=session.id,
         message_id=assistant_message.id,
@@ -14,7 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 
 from app.core.database import get_db
-from app.core.exceptions import raise_not_found
+from app.core.exceptions import raise_forbidden, raise_not_found
 from app.core.security import encrypt_value
 from app.dependencies import get_current_user, require_role
 from app.models.connection import Connection
@@ -24,6 +24,7 @@ from app.schemas.connection import (
     ConnectionCreate,
     ConnectionResponse,
     ConnectionTestResult,
+    PreflightConfig,
 )
 from app.services.audit_service import AuditService
 from app.services.connection_manager import ConnectionManager
@@ -90,6 +91,9 @@ async def create_connection(
     The plaintext password is encrypted before storage and is never returned
     in API responses.
     """
+    if payload.preflight and user.role != "admin":
+        raise_forbidden("Only admins can set the pre-flight cost policy")
+
     password_encrypted = None
     if payload.password:
         password_encrypted = encrypt_value(payload.password)
@@ -106,6 +110,7 @@ async def create_connection(
         password_encrypted=password_encrypted,
         ssl_mode=payload.ssl_mode,
         file_path=payload.file_path,
+        extra_config={"preflight": payload.preflight.model_dump()} if payload.preflight else {},
         is_active=True,
     )
     db.add(connection)
@@ -151,6 +156,7 @@ async def delete_connection(
     connection_id_str = str(connection.id)
     await db.delete(connection)
     await db.flush()
+    await connection_manager.invalidate(connection_id_str)
     try:
         await AuditService.log(
             db=db, org_id=user.org_id, user_id=user.id,
@@ -164,6 +170,37 @@ async def delete_connection(
     return None
 
 
+@router.put("/{connection_id}/preflight", response_model=PreflightConfig)
+async def update_preflight(
+    connection_id: uuid.UUID,
+    payload: PreflightConfig,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_role("admin")),
+):
+    """Set the EXPLAIN cost limits checked before queries run on this connection."""
+    connection = await _get_connection_or_404(
+        connection_id, user.org_id, db,
+    )
+    previous = (connection.extra_config or {}).get("preflight")
+    connection.extra_config = {**(connection.extra_config or {}), "preflight": payload.model_dump()}
+    await db.flush()
+    # Drop the cached connection snapshot so executors pick up the new policy
+    await connection_manager.invalidate(str(connection.id))
+    try:
+        await AuditService.log(
+            db=db, org_id=user.org_id, user_id=user.id,
+            action="connection.preflight_update",
+            resource_type="connection",
+            resource_id=str(connection.id),
+            details={"previous": previous, "preflight": payload.model_dump()},
+            ip_address=request.client.host if request.client else None,
+        )
+    except Exception:
+        pass  # Don't block main operation if audit fails
+    return payload
+
+
 # ── Test Connection ──────────────────────────────────────────────────────────
 
 @router.post("/{connection_id}/test", response_model=ConnectionTestResult)
@@ -181,20 +218,19 @@ async def test_connection(
         connection_id, user.org_id, db,
     )
 
-    connector = None
     try:
-        connector = await connection_manager.get_connector(
+        async with connection_manager.get_connector(
             str(connection.id), str(user.org_id), db,
-        )
-        success = await connector.test_connection()
+        ) as connector:
+            success = await connector.test_connection()
 
-        tables_found = None
-        if success:
-            try:
-                tables = await connector.get_tables()
-                tables_found = len(tables)
-            except Exception:
-                pass
+            tables_found = None
+            if success:
+                try:
+                    tables = await connector.get_tables()
+                    tables_found = len(tables)
+                except Exception:
+                    pass
 
         return ConnectionTestResult(
             success=success,
@@ -206,9 +242,3 @@ async def test_connection(
             success=False,
             message=f"Connection failed: {exc}",
         )
-    finally:
-        if connector is not None:
-            try:
-                await connector.close()
-            except Exception:
-                pass
@@ -324,12 +324,11 @@ async def refresh_widget(
         if not validation["is_safe"]:
             return WidgetRefreshResponse(widget_id=widget.id, error=f"Widget SQL is unsafe: {validation['reason']}")
 
-    connector = None
     try:
-        connector = await connection_manager.get_connector(
+        async with connection_manager.get_connector(
             str(widget.connection_id), str(user.org_id), db,
-        )
-        query_result = await connector.execute_query(widget.query_sql)
+        ) as connector:
+            query_result = await connector.execute_query(widget.query_sql)
 
         widget.last_refreshed_at = datetime.now(timezone.utc)
         widget.last_error = query_result.error
@@ -341,7 +340,7 @@ async def refresh_widget(
             widget_id=widget.id,
             query_result_preview={
                 "columns": query_result.columns,
-                "rows": query_result.rows,
+                "rows": list(query_result.rows),
                 "row_count": query_result.row_count,
                 "execution_time_ms": query_result.execution_time_ms,
             },
@@ -358,12 +357,6 @@ async def refresh_widget(
             error=str(exc),
             last_refreshed_at=widget.last_refreshed_at,
         )
-    finally:
-        if connector is not None:
-            try:
-                await connector.close()
-            except Exception:
-                pass
 
 
 # ── Pin-from-Chat ────────────────────────────────────────────────────────────
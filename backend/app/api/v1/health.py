@@ -1,10 +1,12 @@
 """Health check endpoint with DB and Redis connectivity verification."""
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy import text
 
 from app.config import settings
 from app.core.database import engine
+from app.core.metrics import metrics
+from app.dependencies import require_role
 
 router = APIRouter()
 
@@ -60,3 +62,9 @@ async def health_check(detail: bool = Query(default=False)):
         response["checks"] = checks
 
     return response
+
+
+@router.get("/health/metrics")
+async def worker_metrics(user=Depends(require_role("admin"))):
+    """In-process counters for this worker (cache hit rate, encoded bytes, ...)."""
+    return metrics.snapshot()
@@ -1,6 +1,6 @@
 """Organization management endpoints (budget, settings)."""
 
-from typing import Optional
+from typing import Literal, Optional
 
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel, Field
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.exceptions import raise_forbidden
 from app.dependencies import get_current_user
+from app.models.organization import Organization
 from app.models.user import User
 from app.services.token_budget_service import TokenBudgetService
 
@@ -21,6 +22,13 @@ class BudgetUpdateRequest(BaseModel):
     )
 
 
+class SettingsUpdateRequest(BaseModel):
+    analysis_mode: Optional[Literal["auto", "llm"]] = Field(
+        None,
+        description='"auto" answers trivial results without an LLM call; "llm" always uses the LLM',
+    )
+
+
 @router.get("/budget")
 async def get_budget(
     db: AsyncSession = Depends(get_db),
@@ -57,4 +65,39 @@ async def update_budget(
     await db.flush()
 
     service = TokenBudgetService()
+    await service.update_cached(org)
     return await service.get_budget_status(str(user.org_id), db)
+
+
+@router.get("/settings")
+async def get_settings(
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Get the current organization's chat settings."""
+    org = await db.get(Organization, user.org_id)
+    if not org:
+        raise_forbidden("Organization not found")
+    return {"analysis_mode": org.analysis_mode}
+
+
+@router.put("/settings")
+async def update_settings(
+    payload: SettingsUpdateRequest,
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Update the organization's chat settings. Admin only."""
+    if user.role != "admin":
+        raise_forbidden("Only admins can update organization settings")
+
+    org = await db.get(Organization, user.org_id)
+    if not org:
+        raise_forbidden("Organization not found")
+
+    if payload.analysis_mode is not None:
+        org.analysis_mode = payload.analysis_mode
+
+    await db.flush()
+    await TokenBudgetService().update_cached(org)  # Chat reads the mode from the budget counter
+    return {"analysis_mode": org.analysis_mode}
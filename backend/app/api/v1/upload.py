@@ -1,15 +1,149 @@
-"""File upload endpoints: CSV, Excel."""
-from fastapi import APIRouter, Depends
-from app.dependencies import get_current_user
+"""File upload endpoints: CSV, Excel.
+
+Uploads are ingested from the temporary file the multipart parser spooled them
+to (never buffered whole in memory, never copied again) into a SQLite database
+by ``UploadService`` and registered as a ``sqlite`` connection in the caller's
+organization.  Request bodies over
+``MAX_UPLOAD_BYTES`` are refused before parsing by ``UploadSizeLimitMiddleware``.
+"""
+
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+
+from app.core.constants import MAX_UPLOAD_BYTES
+from app.core.database import get_db
+from app.dependencies import require_role
+from app.models.connection import Connection
+from app.models.upload import Upload
+from app.models.user import User
+from app.services.audit_service import AuditService
+from app.services.upload_service import UploadService
 
 router = APIRouter()
 
+CSV_EXTENSIONS = {".csv", ".txt"}
+EXCEL_EXTENSIONS = {".xlsx", ".xlsm"}
+
+
+@router.post("/csv", status_code=201)
+async def upload_csv(
+    request: Request,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_role("admin", "analyst")),
+):
+    """Upload a CSV file and register it as a queryable connection."""
+    return await _handle_upload(file, "csv", CSV_EXTENSIONS, request, db, user)
+
+
+@router.post("/excel", status_code=201)
+async def upload_excel(
+    request: Request,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(require_role("admin", "analyst")),
+):
+    """Upload an Excel workbook (first sheet) and register it as a queryable connection."""
+    return await _handle_upload(file, "excel", EXCEL_EXTENSIONS, request, db, user)
+
+
+# ── Helpers ──────────────────────────────────────────────────────────────────
+
+async def _handle_upload(
+    file: UploadFile,
+    file_type: str,
+    extensions: set[str],
+    request: Request,
+    db: AsyncSession,
+    user: User,
+) -> dict:
+    filename = os.path.basename(file.filename or "")
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in extensions:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported file type; expected one of {', '.join(sorted(extensions))}",
+        )
+
+    size = await _upload_size(file)
+    if size > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File exceeds the {MAX_UPLOAD_BYTES // 1024 ** 2} MB upload limit",
+        )
+
+    # Ingested from the parser's own temporary file: no second copy on disk
+    service = UploadService()
+    try:
+        if file_type == "csv":
+            result = await service.ingest_csv(file.file, filename)
+        else:
+            result = await service.ingest_excel(file.file, filename)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Could not parse {filename}: {exc}",
+        )
+
+    try:
+        connection = Connection(
+            org_id=user.org_id,
+            created_by_id=user.id,
+            name=os.path.splitext(filename)[0] or filename,
+            type="sqlite",
+            file_path=result["db_path"],
+            is_active=True,
+        )
+        db.add(connection)
+        await db.flush()
+
+        upload = Upload(
+            user_id=user.id,
+            connection_id=connection.id,
+            original_filename=filename,
+            file_size_bytes=size,
+            mime_type=file.content_type,
+            storage_path=result["db_path"],
+            row_count=result["row_count"],
+            column_count=result["column_count"],
+        )
+        db.add(upload)
+        await db.flush()
+    except BaseException:
+        # No connection will point at the database; don't leave it orphaned on disk
+        os.remove(result["db_path"])
+        raise
+
+    try:
+        await AuditService.log(
+            db=db, org_id=user.org_id, user_id=user.id,
+            action="upload.create",
+            resource_type="connection",
+            resource_id=str(connection.id),
+            details={"filename": filename, "rows": result["row_count"]},
+            ip_address=request.client.host if request.client else None,
+        )
+    except Exception:
+        pass  # Don't block main operation if audit fails
 
-@router.post("/csv")
-async def upload_csv(user=Depends(get_current_user)):
-    return {"message": "CSV upload placeholder"}
+    return {
+        "upload_id": str(upload.id),
+        "connection_id": str(connection.id),
+        "table_name": result["table_name"],
+        "row_count": result["row_count"],
+        "column_count": result["column_count"],
+        "columns": result["columns"],
+        "elapsed_ms": result["elapsed_ms"],
+        "rows_per_second": result["rows_per_second"],
+    }
 
 
-@router.post("/excel")
-async def upload_excel(user=Depends(get_current_user)):
-    return {"message": "Excel upload placeholder"}
+async def _upload_size(file: UploadFile) -> int:
+    """Size of the spooled upload, by seeking to its end when the parser didn't record it."""
+    if file.size is not None:
+        return file.size
+    return await asyncio.to_thread(file.file.seek, 0, os.SEEK_END)
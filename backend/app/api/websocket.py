@@ -1,13 +1,15 @@
 """WebSocket endpoint with JWT auth, AI streaming, and Redis PubSub for multi-replica support."""
 
 import asyncio
-from typing import Optional
+import uuid
+from typing import Coroutine, Optional
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from sqlalchemy import select
 
 from app.core.security import decode_jwt, is_token_blacklisted
 from app.core.database import async_session_factory
+from app.core.metrics import StageTimer
 from app.core.sql_validator import SQLSafetyValidator
 from app.models.chat_session import ChatSession
 from app.models.chat_message import ChatMessage
@@ -32,6 +34,8 @@ class ConnectionManagerWS:
 
     def __init__(self):
         self.active_connections: dict[str, WebSocket] = {}
+        # Running chat pipelines: user_id -> {request key -> task}
+        self.chat_tasks: dict[str, dict[str, asyncio.Task]] = {}
         self._redis = None
         self._pubsub = None
         self._listener_task: Optional[asyncio.Task] = None
@@ -70,8 +74,41 @@ class ConnectionManagerWS:
 
     def disconnect(self, user_id: str):
         self.active_connections.pop(user_id, None)
+        cancelled = self.cancel_chat_tasks(user_id)
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} abandoned chat task(s) for user {user_id}")
         logger.info(f"WebSocket disconnected: user {user_id}")
 
+    def start_chat_task(self, user_id: str, key: str, coro: Coroutine) -> Optional[asyncio.Task]:
+        """Run a chat pipeline in the background; None if *key* is already running."""
+        tasks = self.chat_tasks.setdefault(user_id, {})
+        if key in tasks and not tasks[key].done():
+            coro.close()
+            return None
+        task = asyncio.create_task(coro)
+        tasks[key] = task
+
+        def _forget(_task: asyncio.Task) -> None:
+            user_tasks = self.chat_tasks.get(user_id, {})
+            if user_tasks.get(key) is _task:
+                del user_tasks[key]
+            if not user_tasks:
+                self.chat_tasks.pop(user_id, None)
+
+        task.add_done_callback(_forget)
+        return task
+
+    def cancel_chat_tasks(self, user_id: str, key: Optional[str] = None) -> int:
+        """Cancel one (by key) or all of a user's running chat pipelines."""
+        tasks = self.chat_tasks.get(user_id, {})
+        if key is None:
+            targets = list(tasks.values())
+        else:
+            targets = [tasks[key]] if key in tasks else []
+        for task in targets:
+            task.cancel()
+        return len(targets)
+
     async def send_to_user(self, user_id: str, data: dict):
         """Send to local connection first; if not found, publish to Redis for other replicas."""
         ws = self.active_connections.get(user_id)
@@ -150,9 +187,21 @@ async def websocket_endpoint(
             if event_type == "ping":
                 await websocket.send_json({"type": "pong"})
             elif event_type == "chat_message":
-                await _handle_chat_message(websocket, user_id, message)
+                # Run in the background so cancel_query can be received mid-pipeline.
+                key = _chat_task_key(message)
+                task = ws_manager.start_chat_task(
+                    user_id, key, _run_chat_task(websocket, user_id, key, message),
+                )
+                if task is None:
+                    await websocket.send_json({
+                        "type": "error",
+                        "request_id": message.get("request_id"),
+                        "content": "A query is already running for this session.",
+                    })
             elif event_type == "cancel_query":
-                logger.info(f"Query cancel requested by user {user_id}")
+                key = message.get("request_id") or message.get("session_id")
+                cancelled = ws_manager.cancel_chat_tasks(user_id, key)
+                logger.info(f"Query cancel requested by user {user_id}: {cancelled} task(s) cancelled")
             else:
                 logger.debug(f"Unknown WS event from {user_id}: {event_type}")
 
@@ -163,6 +212,30 @@ async def websocket_endpoint(
         ws_manager.disconnect(user_id)
 
 
+def _chat_task_key(message: dict) -> str:
+    """Key a chat pipeline by client request id, else session; new sessions get a fresh key."""
+    return message.get("request_id") or message.get("session_id") or str(uuid.uuid4())
+
+
+async def _run_chat_task(websocket: WebSocket, user_id: str, key: str, message: dict):
+    """Tracked wrapper: cancellation propagates into the DB driver and the Anthropic stream."""
+    try:
+        await _handle_chat_message(websocket, user_id, message)
+    except asyncio.CancelledError:
+        logger.info(f"Chat pipeline {key} cancelled for user {user_id}")
+        try:
+            await websocket.send_json({
+                "type": "query_cancelled",
+                "request_id": message.get("request_id"),
+                "session_id": message.get("session_id"),
+            })
+        except Exception:
+            pass  # Socket already gone (disconnect-triggered cancel)
+        raise  # End the task as cancelled, not as completed
+    except Exception as e:
+        logger.error(f"Unhandled chat task error for user {user_id}: {e}")
+
+
 async def _handle_chat_message(
     websocket: WebSocket, user_id: str, message: dict
 ):
@@ -170,18 +243,26 @@ async def _handle_chat_message(
     user_text = message.get("message", "").strip()
     connection_id = message.get("connection_id")
     session_id = message.get("session_id")
+    # Client-generated id of this message, echoed on every reply (and used to cancel)
+    request_id = message.get("request_id")
 
     if not user_text or not connection_id:
         await websocket.send_json({
             "type": "error",
+            "request_id": request_id,
             "content": "Missing message or connection_id.",
         })
         return
 
     async def on_stream(event: dict):
-        """Stream callback — sends each text chunk to the client."""
+        """Stream callback — sends each text chunk, or a typed event
+        (``query_result``, ``chart_config``) as its own frame."""
+        if "type" in event:
+            await websocket.send_json({**event, "request_id": request_id})
+            return
         await websocket.send_json({
             "type": "stream",
+            "request_id": request_id,
             "phase": event.get("phase", ""),
             "chunk": event.get("chunk", ""),
         })
@@ -195,7 +276,7 @@ async def _handle_chat_message(
             user = result.scalar_one_or_none()
             if not user:
                 await websocket.send_json({
-                    "type": "error", "content": "User not found.",
+                    "type": "error", "request_id": request_id, "content": "User not found.",
                 })
                 return
 
@@ -210,7 +291,8 @@ async def _handle_chat_message(
                 session = sess_result.scalar_one_or_none()
                 if not session:
                     await websocket.send_json({
-                        "type": "error", "content": "Session not found.",
+                        "type": "error", "request_id": request_id,
+                        "content": "Session not found.",
                     })
                     return
             else:
@@ -238,19 +320,22 @@ async def _handle_chat_message(
             db.add(user_msg)
             await db.flush()
             await db.refresh(user_msg)
+            # Keep the session and question even if the pipeline is cancelled.
+            await db.commit()
 
             # Notify client that streaming has started
             await websocket.send_json({
                 "type": "stream_start",
+                "request_id": request_id,
                 "session_id": str(session.id),
                 "message_id": str(user_msg.id),
             })
 
             # Build AIEngine (same dependencies as REST endpoint)
             connection_manager = ConnectionManager()
-            schema_discoverer = SchemaDiscoverer()
-            query_executor = QueryExecutor(connection_manager)
             cache_service = CacheService()
+            schema_discoverer = SchemaDiscoverer(cache=cache_service)
+            query_executor = QueryExecutor(connection_manager)
             conversation_manager = ConversationManager()
             sql_validator = SQLSafetyValidator()
 
@@ -262,6 +347,7 @@ async def _handle_chat_message(
                 conversation_provider=conversation_manager,
             )
 
+            timer = StageTimer()
             ai_response = await ai_engine.process_message(
                 user_message=user_text,
                 connection_id=str(connection_id),
@@ -269,6 +355,7 @@ async def _handle_chat_message(
                 db=db,
                 on_stream=on_stream,
                 org_id=str(user.org_id),
+                timer=timer,
             )
 
             # Persist assistant response
@@ -289,14 +376,16 @@ async def _handle_chat_message(
                 token_usage=ai_response.token_usage,
                 context_summary=ai_response.context_summary,
             )
-            db.add(assistant_msg)
-            await db.flush()
-            await db.refresh(assistant_msg)
-            await db.commit()
+            with timer.stage("persist"):
+                db.add(assistant_msg)
+                await db.flush()
+                await db.refresh(assistant_msg)
+                await db.commit()
 
             # Send final complete response
             await websocket.send_json({
                 "type": "chat_response",
+                "request_id": request_id,
                 "session_id": str(session.id),
                 "message_id": str(assistant_msg.id),
                 "content": ai_response.content,
@@ -307,6 +396,7 @@ async def _handle_chat_message(
                 "chart_config": ai_response.chart_config,
                 "execution_time_ms": ai_response.execution_time_ms,
                 "token_usage": ai_response.token_usage,
+                "stage_timings": timer.as_dict(),
                 "error_message": ai_response.error_message,
             })
 
@@ -315,6 +405,7 @@ async def _handle_chat_message(
             await db.rollback()
             await websocket.send_json({
                 "type": "chat_response",
+                "request_id": request_id,
                 "content": f"I encountered an error: {str(e)}",
                 "error_message": str(e),
             })
@@ -38,6 +38,19 @@ class Settings(BaseSettings):
     # Sentry
     SENTRY_DSN: str = ""
 
+    # Approximate token budget for the schema section of SQL-generation prompts
+    SCHEMA_CONTEXT_TOKEN_BUDGET: int = 8000
+
+    # Schema refresh: one Celery task per connection instead of an in-process fan-out
+    SCHEMA_REFRESH_FANOUT: bool = False
+    SCHEMA_REFRESH_INTERVAL_SECONDS: int = 300
+
+    # EXPLAIN pre-flight check for connections without their own policy (extra_config["preflight"])
+    SQL_PREFLIGHT_ENABLED: bool = False
+
+    # Token budget counters live in Redis; how often they are written back to organizations
+    TOKEN_BUDGET_SYNC_INTERVAL_SECONDS: int = 60
+
     # App
     DEBUG: bool = False
 
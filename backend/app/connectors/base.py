@@ -1,7 +1,19 @@
 """Abstract connector interface."""
 
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator, Collection, Iterable, Sequence
 from dataclasses import dataclass
+from typing import Any
+
+from app.connectors.columnar import ColumnarTable, RowView
+from app.core.constants import (
+    MAX_QUERY_ROWS,
+    QUERY_TIMEOUT_SECONDS,
+    SCHEMA_SAMPLE_ROWS,
+    SCHEMA_SAMPLE_TIMEOUT_SECONDS,
+    STREAM_BATCH_ROWS,
+)
+from app.core.exceptions import QueryExecutionError
 
 
 @dataclass
@@ -22,14 +34,65 @@ class ColumnInfo:
     ordinal_position: int
 
 
+@dataclass
+class TableSchema:
+    """A table together with its columns, as returned by bulk introspection."""
+    table: TableInfo
+    columns: list[ColumnInfo]
+
+
+@dataclass
+class ColumnStats:
+    """Cardinality and null fraction of a column (catalog statistics or a sampled scan)."""
+    distinct_count: int | None
+    null_fraction: float | None
+
+
 @dataclass
 class QueryResult:
     columns: list[str]
-    rows: list[list]
+    # Lazy RowView over columnar buffers when built via from_rows()
+    rows: Sequence[Sequence[Any]]
     row_count: int
     execution_time_ms: int
     error: str | None = None
 
+    @classmethod
+    def from_rows(
+        cls, columns: list[str], rows: Iterable[Sequence[Any]], execution_time_ms: int,
+    ) -> "QueryResult":
+        """Build a columnar result directly from driver rows (tuples, Records, sqlite3.Row)."""
+        table = ColumnarTable.from_rows(columns, rows)
+        return cls(columns=columns, rows=table.rows(), row_count=table.num_rows,
+                   execution_time_ms=execution_time_ms)
+
+    @property
+    def table(self) -> ColumnarTable:
+        if isinstance(self.rows, RowView):
+            return self.rows.table
+        return ColumnarTable.from_rows(self.columns, self.rows)
+
+    def slice(self, start: int, stop: int) -> "QueryResult":
+        """Zero-copy window of the result (e.g. a preview)."""
+        rows = self.rows[start:stop]
+        return QueryResult(columns=self.columns, rows=rows, row_count=len(rows),
+                           execution_time_ms=self.execution_time_ms, error=self.error)
+
+
+@dataclass
+class QueryPlan:
+    """Planner estimates for a statement, normalized across databases (see ``explain``)."""
+    estimated_rows: float | None  # Largest row count estimated at any plan step
+    estimated_cost: float | None  # Planner cost units (not comparable across databases)
+    full_scans: list[str]  # Tables read in full, without an index
+
+
+@dataclass
+class RowBatch:
+    """One chunk of a streamed result; every batch carries the column names."""
+    columns: list[str]
+    rows: Sequence[Sequence[Any]]
+
 
 class BaseConnector(ABC):
     """Every data connector must implement these methods."""
@@ -38,16 +101,118 @@ class BaseConnector(ABC):
     async def test_connection(self) -> bool: ...
 
     @abstractmethod
-    async def get_tables(self) -> list[TableInfo]: ...
+    async def get_tables(self, exact: bool = False) -> list[TableInfo]:
+        """List tables/views; row counts are catalog estimates unless *exact*."""
 
     @abstractmethod
     async def get_columns(self, table_name: str) -> list[ColumnInfo]: ...
 
+    async def introspect_schema(self, tables: Collection[str] | None = None) -> list[TableSchema]:
+        """Every table (or just *tables*) with its columns, PK/FK flags and row estimates.
+
+        Drivers override this with a few catalog queries for the whole schema;
+        this fallback issues one ``get_columns`` call per table.
+        """
+        return [
+            TableSchema(table=table, columns=await self.get_columns(table.name))
+            for table in await self.get_tables()
+            if tables is None or table.name in tables
+        ]
+
+    async def schema_fingerprint(self) -> dict[str, str] | None:
+        """Cheap digest of each table's definition (columns, types, keys), by table name.
+
+        Schema refresh compares it with the stored one and rediscovers only
+        tables whose digest changed.  ``None`` means the driver cannot tell,
+        so everything is rediscovered.
+        """
+        return None
+
     @abstractmethod
     async def execute_query(self, sql: str, timeout: int = 30, max_rows: int = 10000) -> QueryResult: ...
 
+    async def stream_query(
+        self, sql: str, batch_size: int = STREAM_BATCH_ROWS, timeout: int = QUERY_TIMEOUT_SECONDS,
+    ) -> AsyncIterator[RowBatch]:
+        """Yield the result of *sql* in batches of at most *batch_size* rows.
+
+        The first batch is always yielded (possibly empty) so callers get the
+        column names up front.  Drivers override this with a server-side
+        cursor; this fallback materializes the result via ``execute_query``.
+        Errors are raised, not returned.
+        """
+        result = await self.execute_query(sql, timeout=timeout, max_rows=MAX_QUERY_ROWS)
+        if result.error:
+            raise QueryExecutionError(result.error)
+        for start in range(0, max(len(result.rows), 1), batch_size):
+            yield RowBatch(columns=result.columns, rows=result.rows[start:start + batch_size])
+
     @abstractmethod
     async def get_sample_values(self, table: str, column: str, limit: int = 10) -> list: ...
 
+    async def get_table_samples(self, table: TableInfo, columns: list[str], limit: int = 10) -> dict[str, list]:
+        """Up to *limit* distinct non-null values for each of *columns*.
+
+        Drivers that provide ``_sample_sql`` read one bounded sample of the
+        table for all columns at once; otherwise this falls back to one
+        ``get_sample_values`` call per column.
+        """
+        sql = self._sample_sql(table, columns)
+        if sql is None:
+            return {column: await self.get_sample_values(table.name, column, limit) for column in columns}
+        result = await self.execute_query(
+            sql, timeout=SCHEMA_SAMPLE_TIMEOUT_SECONDS, max_rows=SCHEMA_SAMPLE_ROWS,
+        )
+        if result.error:
+            raise QueryExecutionError(result.error)
+        return {
+            name: _distinct_values(column, limit)
+            for name, column in zip(result.columns, result.table.columns)
+        }
+
+    async def stream_table_sample(
+        self, table: TableInfo, columns: list[str], rows: int, batch_size: int = STREAM_BATCH_ROWS,
+    ) -> AsyncIterator[RowBatch]:
+        """Stream *columns* of at most *rows* rows of *table* (see ``_sample_sql``)."""
+        sql = self._sample_sql(table, columns, rows)
+        if sql is None:
+            raise QueryExecutionError(f"{type(self).__name__} does not support table sampling")
+        async for batch in self.stream_query(sql, batch_size=batch_size):
+            yield batch
+
+    async def explain(self, sql: str) -> QueryPlan | None:
+        """Plan *sql* without running it.  ``None`` when the driver cannot tell."""
+        return None
+
+    async def get_column_stats(self, table: TableInfo) -> dict[str, ColumnStats]:
+        """Per-column statistics the database already keeps (planner stats, histograms).
+
+        Columns the catalog knows nothing about are absent; the default
+        knows nothing.
+        """
+        return {}
+
+    def _sample_sql(self, table: TableInfo, columns: list[str], rows: int = SCHEMA_SAMPLE_ROWS) -> str | None:
+        """SELECT of *columns* over at most *rows* rows of *table*."""
+        return None
+
     @abstractmethod
     async def close(self) -> None: ...
+
+
+def _distinct_values(values, limit: int) -> list:
+    seen, samples = set(), []
+    for value in values:
+        if value is None:
+            continue
+        try:
+            if value in seen:
+                continue
+            seen.add(value)
+        except TypeError:  # Unhashable (JSON arrays/objects): keep, compare by equality.
+            if value in samples:
+                continue
+        samples.append(value)
+        if len(samples) >= limit:
+            break
+    return samples
@@ -0,0 +1,182 @@
+"""Columnar storage for query results.
+
+Connectors transpose driver rows once into per-column buffers:
+
+- integer / float columns become ``array.array`` ('q' / 'd') -- 8 bytes per
+  value instead of a boxed Python object -- with a ``bytearray`` null mask
+  when the column has NULLs;
+- every other column (text, Decimal, datetime, bool, mixed) keeps the
+  driver's objects as-is in a tuple, with ``None`` in place.
+
+Slicing a ``Column`` or ``ColumnarTable`` is zero-copy (it shares the
+buffers and narrows the window), so previews of a 10k-row result cost
+nothing.  ``RowView`` is a lazy ``Sequence[list]`` over a table for callers
+that still think in rows; a row list is only built when it is accessed.
+"""
+
+import itertools
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, overload
+
+
+class Column:
+    """One column of a result: typed buffer + optional null mask + row window."""
+
+    __slots__ = ("_data", "_nulls", "_start", "_stop")
+
+    def __init__(self, data: "array[Any] | Sequence[Any]", nulls: bytearray | None = None,
+                 start: int = 0, stop: int | None = None):
+        self._data = data
+        self._nulls = nulls
+        self._start = start
+        self._stop = len(data) if stop is None else stop
+
+    @classmethod
+    def from_values(cls, values: Sequence[Any]) -> "Column":
+        """Build a column, choosing a typed buffer when every non-null value allows it."""
+        kinds = {type(v) for v in values}
+        has_nulls = type(None) in kinds
+        kinds.discard(type(None))
+
+        typecode = "q" if kinds == {int} else "d" if kinds == {float} else None
+        if typecode is None:
+            return cls(values)
+
+        nulls = bytearray(v is None for v in values) if has_nulls else None
+        try:
+            data = array(typecode, (0 if v is None else v for v in values) if has_nulls else values)
+        except OverflowError:  # Integers beyond int64 (e.g. NUMERIC ids) stay as objects.
+            return cls(values)
+        return cls(data, nulls)
+
+    @property
+    def is_typed(self) -> bool:
+        return isinstance(self._data, array)
+
+    @property
+    def null_count(self) -> int:
+        if self._nulls is not None:
+            return self._nulls.count(1, self._start, self._stop)
+        if self.is_typed:
+            return 0
+        return sum(1 for v in itertools.islice(self._data, self._start, self._stop) if v is None)
+
+    def values(self) -> memoryview | Sequence[Any]:
+        """Raw values for vectorized work (a zero-copy memoryview for typed columns).
+
+        NULL slots of typed columns hold 0; consult ``is_null`` where it matters.
+        """
+        data = self._data
+        if isinstance(data, array):
+            return memoryview(data)[self._start:self._stop]
+        return data[self._start:self._stop]
+
+    def is_null(self, index: int) -> bool:
+        i = self._start + index
+        if self._nulls is not None:
+            return bool(self._nulls[i])
+        return not self.is_typed and self._data[i] is None
+
+    def slice(self, start: int, stop: int) -> "Column":
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return Column(self._data, self._nulls, self._start + start, self._start + max(start, stop))
+
+    def to_list(self) -> list[Any]:
+        return list(self)
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        i = self._start + index
+        if self._nulls is not None and self._nulls[i]:
+            return None
+        return self._data[i]
+
+    def __iter__(self) -> Iterator[Any]:
+        values = itertools.islice(self._data, self._start, self._stop)
+        if self._nulls is None:
+            return values
+        mask = itertools.islice(self._nulls, self._start, self._stop)
+        return (None if null else v for v, null in zip(values, mask))
+
+
+class ColumnarTable:
+    """Named columns of equal length."""
+
+    __slots__ = ("names", "columns", "num_rows")
+
+    def __init__(self, names: list[str], columns: list[Column], num_rows: int):
+        self.names = names
+        self.columns = columns
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_rows(cls, names: list[str], rows: Iterable[Sequence[Any]]) -> "ColumnarTable":
+        """Transpose driver rows (tuples, Records, sqlite3.Row...) into columns."""
+        rows = rows if isinstance(rows, Sequence) else list(rows)
+        if not rows:
+            return cls(names, [Column([]) for _ in names], 0)
+        transposed = zip(*rows)
+        return cls(names, [Column.from_values(values) for values in transposed], len(rows))
+
+    def column(self, name: str) -> Column:
+        return self.columns[self.names.index(name)]
+
+    def slice(self, start: int, stop: int) -> "ColumnarTable":
+        start, stop, _ = slice(start, stop).indices(self.num_rows)
+        stop = max(start, stop)
+        return ColumnarTable(self.names, [c.slice(start, stop) for c in self.columns], stop - start)
+
+    def row(self, index: int) -> list[Any]:
+        return [c[index] for c in self.columns]
+
+    def rows(self) -> "RowView":
+        return RowView(self)
+
+
+class RowView(Sequence[list[Any]]):
+    """Lazy row-oriented view of a ``ColumnarTable``; each row is a fresh ``list``."""
+
+    __slots__ = ("table",)
+
+    def __init__(self, table: ColumnarTable):
+        self.table = table
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @overload
+    def __getitem__(self, index: int) -> list[Any]: ...
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[list[Any]]: ...
+
+    def __getitem__(self, index: int | slice) -> list[Any] | Sequence[list[Any]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return RowView(self.table.slice(start, stop))
+            return [self.table.row(i) for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("row index out of range")
+        return self.table.row(index)
+
+    def __iter__(self) -> Iterator[list[Any]]:
+        if not self.table.columns:
+            return iter([[] for _ in range(self.table.num_rows)])
+        return (list(values) for values in zip(*self.table.columns))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, RowView | list | tuple):
+            return len(self) == len(other) and all(a == list(b) for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"RowView({self.table.num_rows} rows x {len(self.table.names)} columns)"
@@ -0,0 +1,235 @@
+"""Content-addressed SQLite materialization cache for file-backed connectors.
+
+CSV/Excel sources are loaded into a SQLite file named after the source and a
+key derived from its size + mtime, e.g. ``sales.csv.3f9a1c0e5b7d2a44.db``.
+The file is only (re)built when the source changes; every later connector --
+in this process or any other worker sharing the volume -- reuses it, and a
+rebuild deletes the previous version (with its WAL sidecars).
+
+Builds are serialized with an in-process lock plus an ``flock`` on a sidecar
+lock file, written to a temp file and atomically renamed into place, so
+concurrent first loads never observe a half-written database.
+"""
+
+import asyncio
+import fcntl
+import glob
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Collection
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from loguru import logger
+
+from app.connectors.base import BaseConnector, TableInfo, ColumnInfo, QueryResult, RowBatch, TableSchema, ColumnStats, QueryPlan
+from app.core.constants import QUERY_TIMEOUT_SECONDS, STREAM_BATCH_ROWS
+from app.connectors.sqlite import SQLiteConnector
+
+# Build locks of the materializations this process created; dropped with the file.
+_thread_locks: dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+_KEY_LENGTH = 16
+_SIDECARS = ("-wal", "-shm", ".lock")
+
+
+def source_key(file_path: str) -> str:
+    """Cache key for the current contents of *file_path* (size + mtime)."""
+    st = os.stat(file_path)
+    return hashlib.sha256(f"{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:_KEY_LENGTH]
+
+
+def materialized_path(file_path: str) -> str:
+    """Path of the SQLite materialization for the current contents of *file_path*."""
+    src = os.path.abspath(file_path)
+    return f"{src}.{source_key(src)}.db"
+
+
+def materialize(file_path: str, loader: Callable[[sqlite3.Connection], None]) -> str:
+    """Return a SQLite database for *file_path*, building it with *loader* if stale.
+
+    *loader* receives an open connection to an empty database and must create
+    and populate the tables; it is only called on a cache miss.
+    """
+    db_path = materialized_path(file_path)
+    if os.path.exists(db_path):
+        return db_path
+
+    with _thread_lock(db_path), open(f"{db_path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Another thread or process may have finished the build while we waited.
+            if os.path.exists(db_path):
+                return db_path
+
+            start = time.perf_counter()
+            tmp_path = f"{db_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            try:
+                conn = sqlite3.connect(tmp_path)
+                try:
+                    loader(conn)
+                    # Row counts for get_tables() come from sqlite_stat1.
+                    conn.execute("ANALYZE")
+                    conn.commit()
+                    # Readers open the file read-only; WAL keeps them lock-free.
+                    conn.execute("PRAGMA journal_mode=WAL")
+                finally:
+                    conn.close()
+                os.replace(tmp_path, db_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            elapsed = int((time.perf_counter() - start) * 1000)
+            logger.info(f"Materialized {file_path} -> {db_path} in {elapsed}ms")
+            _remove_stale(file_path, keep=db_path)
+            return db_path
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _thread_lock(db_path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(db_path, threading.Lock())
+
+
+def _remove_stale(file_path: str, keep: str) -> None:
+    """Delete materializations of earlier versions of the same source file.
+
+    Only ``{source}.{key}.db`` names match, so ``sales.csv`` never touches
+    the files of ``sales.csv.bak.csv``.
+    """
+    src = os.path.abspath(file_path)
+    own = re.compile(re.escape(src) + rf"\.[0-9a-f]{{{_KEY_LENGTH}}}\.db")
+    for path in glob.glob(f"{glob.escape(src)}.*.db"):
+        if path == keep or not own.fullmatch(path):
+            continue
+        try:
+            os.remove(path)
+            for sidecar in _SIDECARS:
+                if os.path.exists(path + sidecar):
+                    os.remove(path + sidecar)
+        except OSError as e:
+            logger.debug(f"Could not remove stale materialization {path}: {e}")
+        with _thread_locks_guard:
+            _thread_locks.pop(path, None)
+
+
+class MaterializedFileConnector(BaseConnector):
+    """Base for file connectors served from a cached SQLite materialization.
+
+    Subclasses implement ``_load``.  Each call checks the source's size/mtime
+    (one ``stat``) and transparently switches to a fresh materialization if
+    the file was replaced while the connector was pooled.  The superseded
+    connector is closed as soon as its last in-flight call finishes.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._sqlite = SQLiteConnector(materialize(file_path, self._load))
+        # Calls running per connector; superseded ones wait in _retired until idle.
+        self._in_flight: dict[SQLiteConnector, int] = {}
+        self._retired: set[SQLiteConnector] = set()
+
+    def _load(self, conn: sqlite3.Connection) -> None:
+        raise NotImplementedError
+
+    async def _current(self) -> SQLiteConnector:
+        try:
+            expected = materialized_path(self.file_path)
+        except FileNotFoundError:
+            return self._sqlite  # Source removed; keep serving the last good copy.
+        if expected != self._sqlite.file_path:
+            db_path = await asyncio.to_thread(materialize, self.file_path, self._load)
+            if db_path != self._sqlite.file_path:
+                previous, self._sqlite = self._sqlite, SQLiteConnector(db_path)
+                if self._in_flight.get(previous):
+                    self._retired.add(previous)
+                else:
+                    await previous.close()
+        return self._sqlite
+
+    @asynccontextmanager
+    async def _use(self) -> AsyncIterator[SQLiteConnector]:
+        """The current materialization, held open for the duration of one call."""
+        connector = await self._current()
+        self._in_flight[connector] = self._in_flight.get(connector, 0) + 1
+        try:
+            yield connector
+        finally:
+            self._in_flight[connector] -= 1
+            if not self._in_flight[connector]:
+                del self._in_flight[connector]
+                if connector in self._retired:
+                    self._retired.discard(connector)
+                    await connector.close()
+
+    async def test_connection(self) -> bool:
+        async with self._use() as sqlite:
+            return await sqlite.test_connection()
+
+    async def get_tables(self, exact: bool = False) -> list[TableInfo]:
+        async with self._use() as sqlite:
+            return await sqlite.get_tables(exact)
+
+    async def get_columns(self, table_name: str) -> list[ColumnInfo]:
+        async with self._use() as sqlite:
+            return await sqlite.get_columns(table_name)
+
+    async def introspect_schema(self, tables: Collection[str] | None = None) -> list[TableSchema]:
+        async with self._use() as sqlite:
+            return await sqlite.introspect_schema(tables)
+
+    async def schema_fingerprint(self) -> dict[str, str]:
+        # The materialization's name carries the source's size/mtime key, so a
+        # replaced file changes every digest (row counts and inferred types may differ).
+        async with self._use() as sqlite:
+            version = os.path.basename(sqlite.file_path)
+            return {
+                table: hashlib.sha256(f"{version}:{digest}".encode()).hexdigest()
+                for table, digest in (await sqlite.schema_fingerprint()).items()
+            }
+
+    async def execute_query(self, sql: str, timeout: int = 30, max_rows: int = 10000) -> QueryResult:
+        async with self._use() as sqlite:
+            return await sqlite.execute_query(sql, timeout, max_rows)
+
+    async def stream_query(
+        self, sql: str, batch_size: int = STREAM_BATCH_ROWS, timeout: int = QUERY_TIMEOUT_SECONDS,
+    ) -> AsyncIterator[RowBatch]:
+        async with self._use() as sqlite:
+            async for batch in sqlite.stream_query(sql, batch_size, timeout):
+                yield batch
+
+    async def get_table_samples(self, table: TableInfo, columns: list[str], limit: int = 10) -> dict[str, list]:
+        async with self._use() as sqlite:
+            return await sqlite.get_table_samples(table, columns, limit)
+
+    async def stream_table_sample(
+        self, table: TableInfo, columns: list[str], rows: int, batch_size: int = STREAM_BATCH_ROWS,
+    ) -> AsyncIterator[RowBatch]:
+        async with self._use() as sqlite:
+            async for batch in sqlite.stream_table_sample(table, columns, rows, batch_size):
+                yield batch
+
+    async def explain(self, sql: str) -> QueryPlan:
+        async with self._use() as sqlite:
+            return await sqlite.explain(sql)
+
+    async def get_column_stats(self, table: TableInfo) -> dict[str, ColumnStats]:
+        async with self._use() as sqlite:
+            return await sqlite.get_column_stats(table)
+
+    async def get_sample_values(self, table: str, column: str, limit: int = 10) -> list:
+        async with self._use() as sqlite:
+            return await sqlite.get_sample_values(table, column, limit)
+
+    async def close(self) -> None:
+        for connector in (*self._retired, self._sqlite):
+            await connector.close()
+        self._retired.clear()
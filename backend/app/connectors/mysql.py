@@ -1,10 +1,69 @@
 """MySQL connector using aiomysql."""
 
+import asyncio
+import json
 import time
+from collections.abc import AsyncIterator, Collection
+from contextlib import asynccontextmanager
+from typing import Any
+
 import aiomysql
-from app.connectors.base import BaseConnector, TableInfo, ColumnInfo, QueryResult
 from loguru import logger
 
+from app.connectors.base import (
+    BaseConnector,
+    ColumnInfo,
+    ColumnStats,
+    QueryPlan,
+    QueryResult,
+    RowBatch,
+    TableInfo,
+    TableSchema,
+)
+from app.core.constants import (
+    PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS,
+    QUERY_TIMEOUT_SECONDS,
+    SCHEMA_SAMPLE_ROWS,
+    STREAM_BATCH_ROWS,
+)
+from app.core.exceptions import QueryExecutionError
+
+# Every table/view of the database with its columns, in one round trip.
+_INTROSPECT_COLUMNS_SQL = """
+    SELECT t.TABLE_NAME, t.TABLE_TYPE, t.TABLE_ROWS,
+           c.COLUMN_NAME, c.DATA_TYPE, c.IS_NULLABLE, c.ORDINAL_POSITION, c.COLUMN_KEY
+    FROM information_schema.TABLES t
+    LEFT JOIN information_schema.COLUMNS c
+           ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+    WHERE t.TABLE_SCHEMA = %s {table_filter}
+    ORDER BY t.TABLE_NAME, c.ORDINAL_POSITION
+"""
+
+# Foreign-key columns and the column each one references.
+_FOREIGN_KEYS_SQL = """
+    SELECT k.TABLE_NAME, k.COLUMN_NAME, k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME
+    FROM information_schema.KEY_COLUMN_USAGE k
+    JOIN information_schema.REFERENTIAL_CONSTRAINTS r
+      ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME
+     AND r.TABLE_NAME = k.TABLE_NAME
+    WHERE k.TABLE_SCHEMA = %s
+"""
+
+# One digest per table over its column definitions (GROUP_CONCAT needs a raised
+# group_concat_max_len for wide tables).
+_FINGERPRINT_SQL = """
+    SELECT t.TABLE_NAME,
+           MD5(CONCAT_WS('|', t.TABLE_TYPE, t.CREATE_TIME, GROUP_CONCAT(
+               CONCAT_WS(':', c.COLUMN_NAME, c.COLUMN_TYPE, c.IS_NULLABLE, c.COLUMN_KEY)
+               ORDER BY c.ORDINAL_POSITION SEPARATOR ','
+           ))) AS digest
+    FROM information_schema.TABLES t
+    LEFT JOIN information_schema.COLUMNS c
+           ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME
+    WHERE t.TABLE_SCHEMA = %s
+    GROUP BY t.TABLE_NAME, t.TABLE_TYPE, t.CREATE_TIME
+"""
+
 
 class MySQLConnector(BaseConnector):
     def __init__(self, host: str, port: int, database: str, username: str, password: str):
@@ -39,18 +98,19 @@ class MySQLConnector(BaseConnector):
             logger.error(f"MySQL connection test failed: {e}")
             return False
 
-    async def get_tables(self) -> list[TableInfo]:
+    async def get_tables(self, exact: bool = False) -> list[TableInfo]:
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
                 await cur.execute("""
-                    SELECT TABLE_NAME as table_name, TABLE_TYPE as table_type, TABLE_ROWS as row_count
+                    SELECT TABLE_NAME as table_name, TABLE_TYPE as table_type,
+                           TABLE_ROWS as row_count
                     FROM information_schema.TABLES
                     WHERE TABLE_SCHEMA = %s
                     ORDER BY TABLE_NAME
                 """, (self.database,))
                 rows = await cur.fetchall()
-                return [
+                tables = [
                     TableInfo(
                         name=row["table_name"],
                         table_type="view" if "VIEW" in row["table_type"] else "table",
@@ -58,6 +118,12 @@ class MySQLConnector(BaseConnector):
                     )
                     for row in rows
                 ]
+                if exact:
+                    for table in tables:
+                        escaped = table.name.replace("`", "``")
+                        await cur.execute(f"SELECT COUNT(*) AS n FROM `{escaped}`")
+                        table.row_count = (await cur.fetchone())["n"]
+                return tables
 
     async def get_columns(self, table_name: str) -> list[ColumnInfo]:
         pool = await self._get_pool()
@@ -70,39 +136,209 @@ class MySQLConnector(BaseConnector):
                     ORDER BY ORDINAL_POSITION
                 """, (self.database, table_name))
                 rows = await cur.fetchall()
+                foreign_keys = await self._foreign_keys(cur, table_name)
                 return [
-                    ColumnInfo(
-                        name=row["COLUMN_NAME"],
-                        data_type=row["DATA_TYPE"],
-                        is_nullable=row["IS_NULLABLE"] == "YES",
-                        is_primary_key=row["COLUMN_KEY"] == "PRI",
-                        is_foreign_key=row["COLUMN_KEY"] == "MUL",
-                        fk_references=None,
-                        ordinal_position=row["ORDINAL_POSITION"],
-                    )
-                    for row in rows
+                    self._column_info(row, foreign_keys.get(row["COLUMN_NAME"])) for row in rows
                 ]
 
-    async def execute_query(self, sql: str, timeout: int = 30, max_rows: int = 10000) -> QueryResult:
+    async def introspect_schema(self, tables: Collection[str] | None = None) -> list[TableSchema]:
+        table_filter, params = "", [self.database]
+        if tables is not None:
+            if not tables:
+                return []
+            table_filter = f"AND t.TABLE_NAME IN ({', '.join(['%s'] * len(tables))})"
+            params += list(tables)
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(_INTROSPECT_COLUMNS_SQL.format(table_filter=table_filter), params)
+                rows = await cur.fetchall()
+                foreign_keys = await self._foreign_keys(cur)
+
+        schemas: dict[str, TableSchema] = {}
+        for row in rows:
+            name = row["TABLE_NAME"]
+            schema = schemas.get(name)
+            if schema is None:
+                schema = schemas[name] = TableSchema(
+                    table=TableInfo(
+                        name=name,
+                        table_type="view" if "VIEW" in row["TABLE_TYPE"] else "table",
+                        row_count=row["TABLE_ROWS"],
+                    ),
+                    columns=[],
+                )
+            if row["COLUMN_NAME"] is not None:
+                schema.columns.append(
+                    self._column_info(row, foreign_keys.get((name, row["COLUMN_NAME"])))
+                )
+        return list(schemas.values())
+
+    async def schema_fingerprint(self) -> dict[str, str]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SET SESSION group_concat_max_len = 16777216")
+                await cur.execute(_FINGERPRINT_SQL, (self.database,))
+                return {table: digest for table, digest in await cur.fetchall()}
+
+    async def _foreign_keys(
+        self, cur: Any, table_name: str | None = None,
+    ) -> dict[str | tuple[str, str], str]:
+        """FK column -> ``"table.column"`` it references.
+
+        Keyed by column name for a single table, else by ``(table, column)``.
+        """
+        sql, params = _FOREIGN_KEYS_SQL, [self.database]
+        if table_name is not None:
+            sql += " AND k.TABLE_NAME = %s"
+            params.append(table_name)
+        await cur.execute(sql, params)
+        foreign_keys: dict[str | tuple[str, str], str] = {}
+        for row in await cur.fetchall():
+            key: str | tuple[str, str] = row["COLUMN_NAME"]
+            if table_name is None:
+                key = (row["TABLE_NAME"], row["COLUMN_NAME"])
+            references = f"{row['REFERENCED_TABLE_NAME']}.{row['REFERENCED_COLUMN_NAME']}"
+            foreign_keys.setdefault(key, references)
+        return foreign_keys
+
+    @staticmethod
+    def _column_info(row: dict[str, Any], fk_references: str | None) -> ColumnInfo:
+        return ColumnInfo(
+            name=row["COLUMN_NAME"],
+            data_type=row["DATA_TYPE"],
+            is_nullable=row["IS_NULLABLE"] == "YES",
+            is_primary_key=row["COLUMN_KEY"] == "PRI",
+            is_foreign_key=fk_references is not None,
+            fk_references=fk_references,
+            ordinal_position=row["ORDINAL_POSITION"],
+        )
+
+    async def execute_query(
+        self, sql: str, timeout: int = 30, max_rows: int = 10000,
+    ) -> QueryResult:
         start = time.perf_counter()
         pool = await self._get_pool()
         try:
             async with pool.acquire() as conn:
-                async with conn.cursor(aiomysql.DictCursor) as cur:
+                # Plain tuple cursor: rows are transposed straight into columns.
+                async with self._cursor(conn) as cur:
                     await cur.execute(f"SET SESSION MAX_EXECUTION_TIME = {timeout * 1000}")
                     await cur.execute(sql)
                     rows = await cur.fetchmany(max_rows)
                     elapsed = int((time.perf_counter() - start) * 1000)
 
                     if not rows:
-                        return QueryResult(columns=[], rows=[], row_count=0, execution_time_ms=elapsed)
+                        return QueryResult(
+                            columns=[], rows=[], row_count=0, execution_time_ms=elapsed,
+                        )
 
-                    columns = list(rows[0].keys())
-                    data = [list(row.values()) for row in rows]
-                    return QueryResult(columns=columns, rows=data, row_count=len(data), execution_time_ms=elapsed)
+                    columns = [desc[0] for desc in cur.description]
+                    return QueryResult.from_rows(columns, rows, elapsed)
         except Exception as e:
             elapsed = int((time.perf_counter() - start) * 1000)
-            return QueryResult(columns=[], rows=[], row_count=0, execution_time_ms=elapsed, error=str(e))
+            return QueryResult(
+                columns=[], rows=[], row_count=0, execution_time_ms=elapsed, error=str(e),
+            )
+
+    async def stream_query(
+        self, sql: str, batch_size: int = STREAM_BATCH_ROWS, timeout: int = QUERY_TIMEOUT_SECONDS,
+    ) -> AsyncIterator[RowBatch]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            # SSCursor streams rows from the server instead of buffering the whole result.
+            async with self._cursor(conn, aiomysql.SSCursor) as cur:
+                await cur.execute(f"SET SESSION MAX_EXECUTION_TIME = {timeout * 1000}")
+                await cur.execute(sql)
+                columns = [desc[0] for desc in cur.description or ()]
+                first = True
+                while True:
+                    rows = await cur.fetchmany(batch_size)
+                    if rows or first:
+                        yield RowBatch(columns=columns, rows=[list(row) for row in rows])
+                    first = False
+                    if len(rows) < batch_size:
+                        break
+
+    async def explain(self, sql: str) -> QueryPlan:
+        result = await self.execute_query(
+            f"EXPLAIN FORMAT=JSON {sql}", timeout=PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS, max_rows=1,
+        )
+        if result.error:
+            raise QueryExecutionError(result.error)
+        document = json.loads(result.rows[0][0])
+        # Rows are what the query returns or its joins produce, not what a scan
+        # reads.  Classic format: query_block with "table" objects (access_type
+        # ALL = full scan); a join is a nested_loop whose last table's
+        # rows_produced_per_join is its output.  Format version 2 (8.3+): a tree
+        # of operations with estimated_rows / estimated_total_cost.
+        cost = document.get("estimated_total_cost")
+        if cost is None:
+            cost = document.get("query_block", {}).get("cost_info", {}).get("query_cost")
+        estimated_rows = document.get("estimated_rows")
+        full_scans, stack = [], [document]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+                continue
+            if not isinstance(node, dict):
+                continue
+            joined = None
+            if node.get("nested_loop"):
+                joined = node["nested_loop"][-1].get("table", {}).get("rows_produced_per_join")
+            elif "join" in str(node.get("operation", "")).lower():  # "Nested loop inner join"...
+                joined = node.get("estimated_rows")
+            if joined is not None:
+                estimated_rows = max(float(estimated_rows or 0), float(joined))
+            if node.get("table_name") and (
+                node.get("access_type") == "ALL"
+                or str(node.get("operation", "")).startswith("Table scan")
+            ):
+                full_scans.append(node["table_name"])
+            stack.extend(value for value in node.values() if isinstance(value, dict | list))
+        return QueryPlan(
+            estimated_rows=float(estimated_rows) if estimated_rows is not None else None,
+            estimated_cost=float(cost) if cost is not None else None,
+            full_scans=sorted(set(full_scans)),
+        )
+
+    async def get_column_stats(self, table: TableInfo) -> dict[str, ColumnStats]:
+        """Histogram statistics (MySQL 8.0+, ``ANALYZE TABLE ... UPDATE HISTOGRAM``)."""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                try:
+                    await cur.execute(
+                        "SELECT COLUMN_NAME, HISTOGRAM FROM information_schema.COLUMN_STATISTICS "
+                        "WHERE SCHEMA_NAME = %s AND TABLE_NAME = %s",
+                        (self.database, table.name),
+                    )
+                except aiomysql.Error:
+                    return {}  # No COLUMN_STATISTICS before 8.0.
+                rows = await cur.fetchall()
+        stats = {}
+        for column, histogram in rows:
+            if isinstance(histogram, str | bytes):
+                histogram = json.loads(histogram)
+            buckets = histogram.get("buckets", [])
+            if histogram.get("histogram-type") == "singleton":
+                distinct = len(buckets)  # One bucket per value.
+            else:
+                # Buckets are [lower, upper, cumulative frequency, distinct values]
+                distinct = sum(bucket[3] for bucket in buckets)
+            stats[column] = ColumnStats(
+                distinct_count=distinct, null_fraction=histogram.get("null-values"),
+            )
+        return stats
+
+    def _sample_sql(
+        self, table: TableInfo, columns: list[str], rows: int = SCHEMA_SAMPLE_ROWS,
+    ) -> str:
+        select_list = ", ".join("`{}`".format(column.replace("`", "``")) for column in columns)
+        escaped_table = table.name.replace("`", "``")
+        return f"SELECT {select_list} FROM `{escaped_table}` LIMIT {rows}"
 
     async def get_sample_values(self, table: str, column: str, limit: int = 10) -> list:
         escaped_column = column.replace('`', '``')
@@ -111,12 +347,51 @@ class MySQLConnector(BaseConnector):
         async with pool.acquire() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
-                    f"SELECT DISTINCT `{escaped_column}` FROM `{escaped_table}` WHERE `{escaped_column}` IS NOT NULL LIMIT %s",
+                    f"SELECT DISTINCT `{escaped_column}` FROM `{escaped_table}` "
+                    f"WHERE `{escaped_column}` IS NOT NULL LIMIT %s",
                     (limit,),
                 )
                 rows = await cur.fetchall()
                 return [row[0] for row in rows]
 
+    @asynccontextmanager
+    async def _cursor(
+        self, conn: Any, cursor_class: type = aiomysql.Cursor,
+    ) -> AsyncIterator[Any]:
+        """Cursor whose statement is killed server-side if the caller is cancelled.
+
+        Cancelling the awaiting coroutine alone leaves the query running on the
+        server and the connection mid-result, so the statement is stopped with
+        ``KILL QUERY`` from a side connection and the connection is dropped.
+        """
+        cur = await conn.cursor(cursor_class)
+        try:
+            yield cur
+        except (asyncio.CancelledError, GeneratorExit):
+            await asyncio.shield(self._kill_query(conn))
+            raise
+        finally:
+            if not conn.closed:
+                await cur.close()
+
+    async def _kill_query(self, conn: Any) -> None:
+        thread_id = conn.thread_id()
+        try:
+            side = await aiomysql.connect(
+                host=self.host, port=self.port, db=self.database,
+                user=self.username, password=self.password,
+            )
+            try:
+                async with side.cursor() as cur:
+                    await cur.execute(f"KILL QUERY {int(thread_id)}")
+            finally:
+                side.close()
+            logger.info(f"Killed MySQL query on thread {thread_id}")
+        except Exception as e:
+            logger.warning(f"Failed to kill MySQL query on thread {thread_id}: {e}")
+        finally:
+            conn.close()
+
     async def close(self) -> None:
         if self._pool:
             self._pool.close()
@@ -1,10 +1,101 @@
 """PostgreSQL connector using asyncpg."""
 
+import json
 import time
+from collections.abc import Collection
+from typing import AsyncIterator
 import asyncpg
-from app.connectors.base import BaseConnector, TableInfo, ColumnInfo, QueryResult
+from app.connectors.base import (
+    BaseConnector, TableInfo, ColumnInfo, QueryResult, RowBatch, TableSchema, ColumnStats, QueryPlan,
+)
+from app.core.constants import (
+    PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS,
+    QUERY_TIMEOUT_SECONDS,
+    SCHEMA_SAMPLE_ROWS,
+    STREAM_BATCH_ROWS,
+)
+from app.core.exceptions import QueryExecutionError
 from loguru import logger
 
+# Tables/views with their columns, straight from pg_catalog (no per-column subqueries).
+_INTROSPECT_COLUMNS_SQL = """
+    SELECT c.relname AS table_name,
+           c.relkind,
+           c.reltuples::bigint AS row_count,
+           a.attname AS column_name,
+           format_type(a.atttypid, NULL) AS data_type,
+           NOT a.attnotnull AS is_nullable,
+           a.attnum AS ordinal_position
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_attribute a
+           ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = 'public'
+      AND c.relkind IN ('r', 'p', 'f', 'v')
+      AND ($1::text[] IS NULL OR c.relname = ANY($1::text[]))
+    ORDER BY c.relname, a.attnum
+"""
+
+# Primary-key and foreign-key columns, one row per (constraint, column) pair.
+_INTROSPECT_CONSTRAINTS_SQL = """
+    SELECT con.contype,
+           src.relname AS table_name,
+           sa.attname AS column_name,
+           tgt.relname AS ref_table,
+           ta.attname AS ref_column
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_class src ON src.oid = con.conrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = src.relnamespace
+    CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(src_attnum, ref_attnum)
+    JOIN pg_catalog.pg_attribute sa ON sa.attrelid = con.conrelid AND sa.attnum = k.src_attnum
+    LEFT JOIN pg_catalog.pg_class tgt ON tgt.oid = con.confrelid
+    LEFT JOIN pg_catalog.pg_attribute ta ON ta.attrelid = con.confrelid AND ta.attnum = k.ref_attnum
+    WHERE n.nspname = 'public'
+      AND con.contype IN ('p', 'f')
+      AND ($1::text[] IS NULL OR src.relname = ANY($1::text[]))
+"""
+
+# Planner statistics (populated by ANALYZE/autovacuum); parent stats first for partitioned tables.
+_COLUMN_STATS_SQL = """
+    SELECT DISTINCT ON (s.attname) s.attname, s.null_frac, s.n_distinct, c.reltuples
+    FROM pg_catalog.pg_stats s
+    JOIN pg_catalog.pg_namespace n ON n.nspname = s.schemaname
+    JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid AND c.relname = s.tablename
+    WHERE s.schemaname = 'public' AND s.tablename = $1
+    ORDER BY s.attname, s.inherited DESC
+"""
+
+# One digest per relation over its column definitions and key constraints.
+_FINGERPRINT_SQL = """
+    SELECT c.relname AS table_name,
+           md5(
+               c.relkind::text || '|' ||
+               coalesce(string_agg(
+                   a.attname || ':' || format_type(a.atttypid, a.atttypmod) || ':' || a.attnotnull::text,
+                   ',' ORDER BY a.attnum
+               ), '') || '|' ||
+               coalesce((
+                   SELECT string_agg(
+                       con.contype::text || con.conkey::text || coalesce(con.confrelid::regclass::text, '')
+                           || coalesce(con.confkey::text, ''),
+                       ',' ORDER BY con.conname
+                   )
+                   FROM pg_catalog.pg_constraint con
+                   WHERE con.conrelid = c.oid AND con.contype IN ('p', 'f')
+               ), '')
+           ) AS digest
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_catalog.pg_attribute a
+           ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    WHERE n.nspname = 'public'
+      AND c.relkind IN ('r', 'p', 'f', 'v')
+    GROUP BY c.oid, c.relname, c.relkind
+"""
+
+# EXPLAIN plan nodes whose "Plan Rows" are a join's output (see ``explain``).
+_JOIN_NODES = {"Nested Loop", "Hash Join", "Merge Join"}
+
 
 class PostgreSQLConnector(BaseConnector):
     def __init__(self, host: str, port: int, database: str, username: str, password: str, ssl_mode: str = "prefer"):
@@ -53,7 +144,7 @@ class PostgreSQLConnector(BaseConnector):
             logger.error(f"PostgreSQL connection test failed: {e}")
             return False
 
-    async def get_tables(self) -> list[TableInfo]:
+    async def get_tables(self, exact: bool = False) -> list[TableInfo]:
         pool = await self._get_pool()
         async with pool.acquire() as conn:
             rows = await conn.fetch("""
@@ -64,7 +155,7 @@ class PostgreSQLConnector(BaseConnector):
                   AND t.table_type IN ('BASE TABLE', 'VIEW')
                 ORDER BY t.table_name
             """)
-            return [
+            tables = [
                 TableInfo(
                     name=row["table_name"],
                     table_type="view" if row["table_type"] == "VIEW" else "table",
@@ -72,6 +163,12 @@ class PostgreSQLConnector(BaseConnector):
                 )
                 for row in rows
             ]
+            if exact:
+                for table in tables:
+                    table.row_count = await conn.fetchval(
+                        f"SELECT COUNT(*) FROM {self._quote_ident(table.name)}"
+                    )
+            return tables
 
     async def get_columns(self, table_name: str) -> list[ColumnInfo]:
         pool = await self._get_pool()
@@ -121,30 +218,149 @@ class PostgreSQLConnector(BaseConnector):
                 for row in rows
             ]
 
+    async def introspect_schema(self, tables: Collection[str] | None = None) -> list[TableSchema]:
+        names = None if tables is None else list(tables)
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            column_rows = await conn.fetch(_INTROSPECT_COLUMNS_SQL, names)
+            constraint_rows = await conn.fetch(_INTROSPECT_CONSTRAINTS_SQL, names)
+
+        primary_keys: set[tuple[str, str]] = set()
+        foreign_keys: dict[tuple[str, str], str] = {}
+        for row in constraint_rows:
+            key = (row["table_name"], row["column_name"])
+            if row["contype"] == "p":
+                primary_keys.add(key)
+            else:
+                foreign_keys.setdefault(key, f"{row['ref_table']}.{row['ref_column']}")
+
+        schemas: dict[str, TableSchema] = {}
+        for row in column_rows:
+            name = row["table_name"]
+            schema = schemas.get(name)
+            if schema is None:
+                # reltuples is -1 (PG14+) or 0 for tables that were never analyzed.
+                estimate = row["row_count"]
+                schema = schemas[name] = TableSchema(
+                    table=TableInfo(
+                        name=name,
+                        table_type="view" if row["relkind"] == "v" else "table",
+                        row_count=estimate if estimate is not None and estimate >= 0 else None,
+                    ),
+                    columns=[],
+                )
+            if row["column_name"] is None:
+                continue  # Table without columns.
+            key = (name, row["column_name"])
+            schema.columns.append(ColumnInfo(
+                name=row["column_name"],
+                data_type=row["data_type"],
+                is_nullable=row["is_nullable"],
+                is_primary_key=key in primary_keys,
+                is_foreign_key=key in foreign_keys,
+                fk_references=foreign_keys.get(key),
+                ordinal_position=row["ordinal_position"],
+            ))
+        return list(schemas.values())
+
     async def execute_query(self, sql: str, timeout: int = 30, max_rows: int = 10000) -> QueryResult:
         start = time.perf_counter()
         pool = await self._get_pool()
         try:
+            # Task cancellation is handled natively: asyncpg sends a cancel
+            # request for the in-flight statement and resets the connection.
             async with pool.acquire() as conn:
                 await conn.execute(f"SET statement_timeout = '{timeout * 1000}'")
-                rows = await conn.fetch(sql)
+                # A portal fetch: at most max_rows leave the server, LIMIT or not.
+                async with conn.transaction(readonly=True):
+                    cursor = await conn.cursor(sql)
+                    rows = await cursor.fetch(max_rows)
                 elapsed = int((time.perf_counter() - start) * 1000)
 
                 if not rows:
                     return QueryResult(columns=[], rows=[], row_count=0, execution_time_ms=elapsed)
 
-                columns = list(rows[0].keys())
-                data = [list(row.values()) for row in rows[:max_rows]]
-                return QueryResult(
-                    columns=columns,
-                    rows=data,
-                    row_count=len(data),
-                    execution_time_ms=elapsed,
-                )
+                return QueryResult.from_rows(list(rows[0].keys()), rows, elapsed)
         except Exception as e:
             elapsed = int((time.perf_counter() - start) * 1000)
             return QueryResult(columns=[], rows=[], row_count=0, execution_time_ms=elapsed, error=str(e))
 
+    async def stream_query(
+        self, sql: str, batch_size: int = STREAM_BATCH_ROWS, timeout: int = QUERY_TIMEOUT_SECONDS,
+    ) -> AsyncIterator[RowBatch]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            # Server-side cursors only live inside a transaction.
+            async with conn.transaction(readonly=True):
+                await conn.execute(f"SET LOCAL statement_timeout = '{timeout * 1000}'")
+                stmt = await conn.prepare(sql)
+                columns = [attr.name for attr in stmt.get_attributes()]
+                cursor = await stmt.cursor()
+                first = True
+                while True:
+                    rows = await cursor.fetch(batch_size)
+                    if rows or first:
+                        yield RowBatch(columns=columns, rows=[list(row.values()) for row in rows])
+                    first = False
+                    if len(rows) < batch_size:
+                        break
+
+    async def explain(self, sql: str) -> QueryPlan:
+        result = await self.execute_query(
+            f"EXPLAIN (FORMAT JSON) {sql}", timeout=PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS, max_rows=1,
+        )
+        if result.error:
+            raise QueryExecutionError(result.error)
+        document = result.rows[0][0]
+        if isinstance(document, str):  # asyncpg hands json columns over undecoded
+            document = json.loads(document)
+        root = document[0]["Plan"]
+        # Rows are what the query returns or its joins produce; a big table read
+        # to compute an aggregate only shows up in full_scans and the cost.
+        estimated_rows, full_scans, stack = float(root.get("Plan Rows", 0)), [], [root]
+        while stack:
+            node = stack.pop()
+            if node.get("Node Type") in _JOIN_NODES:
+                estimated_rows = max(estimated_rows, float(node.get("Plan Rows", 0)))
+            if node.get("Node Type") == "Seq Scan" and node.get("Relation Name"):
+                full_scans.append(node["Relation Name"])
+            stack.extend(node.get("Plans", ()))
+        return QueryPlan(
+            estimated_rows=estimated_rows, estimated_cost=float(root.get("Total Cost", 0)),
+            full_scans=sorted(set(full_scans)),
+        )
+
+    async def schema_fingerprint(self) -> dict[str, str]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(_FINGERPRINT_SQL)
+        return {row["table_name"]: row["digest"] for row in rows}
+
+    async def get_column_stats(self, table: TableInfo) -> dict[str, ColumnStats]:
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(_COLUMN_STATS_SQL, table.name)
+        stats = {}
+        for row in rows:
+            n_distinct, reltuples = row["n_distinct"], row["reltuples"]
+            if n_distinct < 0:
+                # Negative: a fraction of the row count (the column scales with the table).
+                distinct = round(-n_distinct * reltuples) if reltuples > 0 else None
+            else:
+                distinct = round(n_distinct)
+            stats[row["attname"]] = ColumnStats(distinct_count=distinct, null_fraction=row["null_frac"])
+        return stats
+
+    def _sample_sql(self, table: TableInfo, columns: list[str], rows: int = SCHEMA_SAMPLE_ROWS) -> str:
+        sample = ""
+        if table.table_type == "table" and table.row_count and table.row_count > rows:
+            # Block sampling reads only a fraction of the pages; oversample 2x
+            # because rows are not spread evenly across pages.
+            percent = min(100.0, 200.0 * rows / table.row_count)
+            sample = f" TABLESAMPLE SYSTEM ({percent:.6f})"
+        select_list = ", ".join(self._quote_ident(column) for column in columns)
+        return f"SELECT {select_list} FROM {self._quote_ident(table.name)}{sample} LIMIT {rows}"
+
     async def get_sample_values(self, table: str, column: str, limit: int = 10) -> list:
         pool = await self._get_pool()
         async with pool.acquire() as conn:
@@ -1,50 +1,186 @@
-"""SQLite connector using aiosqlite."""
+"""SQLite connector using aiosqlite.
 
+Queries run on a small pool of read-only (``mode=ro``) connections, each with
+its own aiosqlite thread, so dashboards and chat hitting the same file run
+concurrently instead of queueing behind one connection.  A progress handler
+enforces ``timeout``: a statement past its deadline is aborted by SQLite.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
 import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
 import aiosqlite
-from app.connectors.base import BaseConnector, TableInfo, ColumnInfo, QueryResult
+import sqlglot
+from sqlglot import exp
+from app.connectors.base import BaseConnector, TableInfo, ColumnInfo, QueryResult, RowBatch, QueryPlan
+from app.core.constants import (
+    PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS,
+    QUERY_TIMEOUT_SECONDS,
+    SCHEMA_SAMPLE_ROWS,
+    SQLITE_CACHE_SIZE_KIB,
+    SQLITE_MMAP_SIZE_BYTES,
+    SQLITE_POOL_SIZE,
+    SQLITE_PROGRESS_INTERVAL_OPS,
+    STREAM_BATCH_ROWS,
+)
+from app.core.exceptions import QueryExecutionError
 from loguru import logger
 
+# "SCAN orders", "SCAN o" (alias, 3.36+) or "SCAN TABLE orders AS o" (older).
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\S+)")
+
+
+class _PooledConnection:
+    """An aiosqlite connection plus the deadline its progress handler enforces."""
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self.conn = conn
+        self.deadline: float | None = None
+
+    def past_deadline(self) -> int:
+        # Runs on the aiosqlite thread every SQLITE_PROGRESS_INTERVAL_OPS VM steps;
+        # a non-zero return aborts the statement with "interrupted".
+        return int(self.deadline is not None and time.monotonic() > self.deadline)
+
 
 class SQLiteConnector(BaseConnector):
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, pool_size: int = SQLITE_POOL_SIZE):
         self.file_path = file_path
-        self._conn = None
+        self.pool_size = pool_size
+        self._idle: list[_PooledConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+        self._closed = False
+        # (file version, {table: exact row count}) for files without sqlite_stat1;
+        # only the current version's counts are kept.
+        self._row_counts: tuple[tuple, dict[str, int]] = ((), {})
+
+    async def _open(self) -> _PooledConnection:
+        uri = f"{Path(os.path.abspath(self.file_path)).as_uri()}?mode=ro"
+        conn = await aiosqlite.connect(uri, uri=True)
+        conn.row_factory = aiosqlite.Row
+        pooled = _PooledConnection(conn)
+        await conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+        await conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+        await conn.execute("PRAGMA temp_store=MEMORY")
+        await conn.set_progress_handler(pooled.past_deadline, SQLITE_PROGRESS_INTERVAL_OPS)
+        return pooled
 
-    async def _get_conn(self):
-        if self._conn is None:
-            self._conn = await aiosqlite.connect(self.file_path)
-            self._conn.row_factory = aiosqlite.Row
-        return self._conn
+    @asynccontextmanager
+    async def _acquire(self) -> AsyncIterator[_PooledConnection]:
+        async with self._slots:
+            pooled = self._idle.pop() if self._idle else await self._open()
+            try:
+                yield pooled
+            except asyncio.CancelledError:
+                # The statement keeps running in aiosqlite's thread unless interrupted.
+                await pooled.conn.interrupt()
+                raise
+            finally:
+                pooled.deadline = None
+                if self._closed:
+                    await pooled.conn.close()
+                else:
+                    self._idle.append(pooled)
+
+    @staticmethod
+    def _arm(pooled: _PooledConnection, timeout: int | None) -> None:
+        pooled.deadline = time.monotonic() + timeout if timeout else None
+
+    @staticmethod
+    def _check_timeout(pooled: _PooledConnection, error: Exception, timeout: int) -> None:
+        if isinstance(error, sqlite3.OperationalError) and pooled.deadline is not None \
+                and time.monotonic() > pooled.deadline:
+            raise QueryExecutionError(f"Query exceeded the {timeout}s timeout") from error
 
     async def test_connection(self) -> bool:
         try:
-            conn = await self._get_conn()
-            await conn.execute("SELECT 1")
+            async with self._acquire() as pooled:
+                await pooled.conn.execute("SELECT 1")
             return True
         except Exception as e:
             logger.error(f"SQLite connection test failed: {e}")
             return False
 
-    async def get_tables(self) -> list[TableInfo]:
-        conn = await self._get_conn()
-        cursor = await conn.execute(
-            "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
-        )
-        rows = await cursor.fetchall()
-        tables = []
-        for row in rows:
-            escaped_name = row[0].replace('"', '""')
-            count_cursor = await conn.execute(f'SELECT COUNT(*) FROM "{escaped_name}"')
-            count = await count_cursor.fetchone()
-            tables.append(TableInfo(name=row[0], table_type=row[1], row_count=count[0] if count else 0))
-        return tables
+    async def get_tables(self, exact: bool = False) -> list[TableInfo]:
+        """List tables and views without scanning them.
+
+        Row counts come from ``sqlite_stat1`` (our writers run ``ANALYZE``),
+        else from this connector's cache for the file's current mtime/size, and
+        only then from ``COUNT(*)``.  Views report no count unless *exact*.
+        """
+        async with self._acquire() as pooled:
+            conn = pooled.conn
+            cursor = await conn.execute(
+                "SELECT name, type FROM sqlite_master "
+                "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )
+            rows = await cursor.fetchall()
+            stats = {} if exact else await self._stat1_counts(conn)
+            tables = []
+            for name, table_type in rows:
+                if name in stats:
+                    count = stats[name]
+                elif table_type == "view" and not exact:
+                    count = None
+                else:
+                    count = await self._count_rows(conn, name, exact)
+                tables.append(TableInfo(name=name, table_type=table_type, row_count=count))
+            return tables
+
+    @staticmethod
+    async def _stat1_counts(conn: aiosqlite.Connection) -> dict[str, int]:
+        try:
+            cursor = await conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1")
+        except sqlite3.OperationalError:
+            return {}  # Never analyzed.
+        # A row per index, led by its entry count -- short of the table's rows
+        # for a partial index -- or one idx-less row for a table without indexes.
+        counts, exact = {}, set()
+        for tbl, idx, stat in await cursor.fetchall():
+            if not stat or tbl in exact:
+                continue
+            rows = int(stat.split()[0])
+            if idx is None:
+                counts[tbl] = rows
+                exact.add(tbl)
+            else:
+                counts[tbl] = max(counts.get(tbl, 0), rows)
+        return counts
+
+    async def _count_rows(self, conn: aiosqlite.Connection, table: str, exact: bool) -> int:
+        version = self._file_version()
+        if self._row_counts[0] != version:
+            self._row_counts = (version, {})  # Counts for earlier versions are dropped
+        counts = self._row_counts[1]
+        if exact or table not in counts:
+            escaped_name = table.replace('"', '""')
+            cursor = await conn.execute(f'SELECT COUNT(*) FROM "{escaped_name}"')
+            row = await cursor.fetchone()
+            counts[table] = row[0] if row else 0
+        return counts[table]
+
+    def _file_version(self) -> tuple:
+        # A WAL write may leave the main file untouched until checkpoint.
+        version = []
+        for path in (self.file_path, f"{self.file_path}-wal"):
+            try:
+                st = os.stat(path)
+                version += [st.st_mtime_ns, st.st_size]
+            except OSError:
+                version += [None, None]
+        return tuple(version)
 
     async def get_columns(self, table_name: str) -> list[ColumnInfo]:
-        conn = await self._get_conn()
         escaped_table = table_name.replace('"', '""')
-        cursor = await conn.execute(f'PRAGMA table_info("{escaped_table}")')
-        rows = await cursor.fetchall()
+        async with self._acquire() as pooled:
+            cursor = await pooled.conn.execute(f'PRAGMA table_info("{escaped_table}")')
+            rows = await cursor.fetchall()
         return [
             ColumnInfo(
                 name=row[1],
@@ -58,35 +194,132 @@ class SQLiteConnector(BaseConnector):
             for row in rows
         ]
 
+    async def schema_fingerprint(self) -> dict[str, str]:
+        # sqlite_master keeps each table's CREATE statement verbatim.
+        async with self._acquire() as pooled:
+            cursor = await pooled.conn.execute(
+                "SELECT name, sql FROM sqlite_master "
+                "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+            )
+            rows = await cursor.fetchall()
+        return {name: hashlib.sha256((sql or "").encode()).hexdigest() for name, sql in rows}
+
     async def execute_query(self, sql: str, timeout: int = 30, max_rows: int = 10000) -> QueryResult:
         start = time.perf_counter()
-        conn = await self._get_conn()
         try:
-            cursor = await conn.execute(sql)
-            rows = await cursor.fetchmany(max_rows)
+            async with self._acquire() as pooled:
+                self._arm(pooled, timeout)
+                try:
+                    cursor = await pooled.conn.execute(sql)
+                    rows = await cursor.fetchmany(max_rows)
+                except Exception as e:
+                    self._check_timeout(pooled, e, timeout)
+                    raise
             elapsed = int((time.perf_counter() - start) * 1000)
 
             if not rows or cursor.description is None:
                 return QueryResult(columns=[], rows=[], row_count=0, execution_time_ms=elapsed)
 
             columns = [desc[0] for desc in cursor.description]
-            data = [list(row) for row in rows]
-            return QueryResult(columns=columns, rows=data, row_count=len(data), execution_time_ms=elapsed)
+            return QueryResult.from_rows(columns, rows, elapsed)
         except Exception as e:
             elapsed = int((time.perf_counter() - start) * 1000)
             return QueryResult(columns=[], rows=[], row_count=0, execution_time_ms=elapsed, error=str(e))
 
+    async def stream_query(
+        self, sql: str, batch_size: int = STREAM_BATCH_ROWS, timeout: int = QUERY_TIMEOUT_SECONDS,
+    ) -> AsyncIterator[RowBatch]:
+        async with self._acquire() as pooled:
+            try:
+                # Like a statement timeout, the deadline applies to each round trip.
+                self._arm(pooled, timeout)
+                async with pooled.conn.execute(sql) as cursor:
+                    columns = [desc[0] for desc in cursor.description or ()]
+                    first = True
+                    while True:
+                        self._arm(pooled, timeout)
+                        rows = await cursor.fetchmany(batch_size)
+                        pooled.deadline = None
+                        if rows or first:
+                            yield RowBatch(columns=columns, rows=[list(row) for row in rows])
+                        first = False
+                        if len(rows) < batch_size:
+                            break
+            except Exception as e:
+                self._check_timeout(pooled, e, timeout)
+                raise
+
+    async def explain(self, sql: str) -> QueryPlan:
+        """``EXPLAIN QUERY PLAN`` has no row estimates, only scan vs. index
+        search; rows are bounded by the product of the fully scanned tables'
+        row counts (nested loops).  Only those tables are counted, within the
+        plan's deadline; if the counts don't finish, rows are unknown."""
+        try:
+            aliases = {
+                table.alias_or_name: table.name
+                for table in sqlglot.parse_one(sql, read="sqlite").find_all(exp.Table)
+            }
+        except sqlglot.errors.SqlglotError:
+            aliases = {}
+        async with self._acquire() as pooled:
+            self._arm(pooled, PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS)
+            conn = pooled.conn
+            cursor = await conn.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[3] for row in await cursor.fetchall()]
+            cursor = await conn.execute(
+                "SELECT name, type FROM sqlite_master "
+                "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+            )
+            table_types = dict(await cursor.fetchall())
+
+            full_scans = []
+            for detail in details:
+                match = _FULL_SCAN.match(detail)
+                if match:
+                    name = aliases.get(match.group(1), match.group(1))
+                    if name in table_types:  # Not a subquery or constant row
+                        full_scans.append(name)
+            if not full_scans:
+                return QueryPlan(estimated_rows=None, estimated_cost=None, full_scans=[])
+
+            estimated_rows: float | None = 1.0
+            try:
+                stats = await self._stat1_counts(conn)
+                for name in full_scans:
+                    if name in stats:
+                        count = stats[name]
+                    elif table_types[name] == "table":
+                        count = await self._count_rows(conn, name, exact=False)
+                    else:
+                        count = None  # A view; counting it means running it.
+                    estimated_rows *= max(count or 0, 1)
+            except sqlite3.OperationalError:
+                if not pooled.past_deadline():
+                    raise
+                logger.info(f"Pre-flight row counts for {self.file_path} ran past the deadline")
+                estimated_rows = None
+        return QueryPlan(
+            estimated_rows=estimated_rows, estimated_cost=None, full_scans=sorted(set(full_scans)),
+        )
+
+    def _sample_sql(self, table: TableInfo, columns: list[str], rows: int = SCHEMA_SAMPLE_ROWS) -> str:
+        select_list = ", ".join('"{}"'.format(column.replace('"', '""')) for column in columns)
+        escaped_table = table.name.replace('"', '""')
+        return f'SELECT {select_list} FROM "{escaped_table}" LIMIT {rows}'
+
     async def get_sample_values(self, table: str, column: str, limit: int = 10) -> list:
-        conn = await self._get_conn()
         escaped_column = column.replace('"', '""')
         escaped_table = table.replace('"', '""')
-        cursor = await conn.execute(
-            f'SELECT DISTINCT "{escaped_column}" FROM "{escaped_table}" WHERE "{escaped_column}" IS NOT NULL LIMIT ?',
-            (limit,),
-        )
-        rows = await cursor.fetchall()
+        async with self._acquire() as pooled:
+            cursor = await pooled.conn.execute(
+                f'SELECT DISTINCT "{escaped_column}" FROM "{escaped_table}" WHERE "{escaped_column}" IS NOT NULL LIMIT ?',
+                (limit,),
+            )
+            rows = await cursor.fetchall()
         return [row[0] for row in rows]
 
     async def close(self) -> None:
-        if self._conn:
-            await self._conn.close()
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await pooled.conn.close()
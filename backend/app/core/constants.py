@@ -33,3 +33,60 @@ RESULT_PREVIEW_ROWS = 100
 
 # Cache
 DEFAULT_CACHE_TTL_SECONDS = 300
+
+# Connector pooling (per replica)
+CONNECTOR_POOL_MAX_SIZE = 50
+CONNECTOR_IDLE_TTL_SECONDS = 300
+CONNECTION_SPEC_TTL_SECONDS = 60
+
+# File uploads
+MAX_UPLOAD_BYTES = 2 * 1024 ** 3
+UPLOAD_MULTIPART_OVERHEAD_BYTES = 1024 ** 2
+INGEST_SAMPLE_ROWS = 1000
+INGEST_BATCH_ROWS = 50_000
+
+# Streaming reads
+STREAM_BATCH_ROWS = 1000
+
+# Result cache encoding
+CACHE_COMPRESS_THRESHOLD_BYTES = 16 * 1024
+CACHE_COMPRESS_LEVEL = 1
+
+# SQLite / file-backed connections (per connector)
+SQLITE_POOL_SIZE = 4
+SQLITE_MMAP_SIZE_BYTES = 256 * 1024 ** 2
+SQLITE_CACHE_SIZE_KIB = 16 * 1024
+SQLITE_PROGRESS_INTERVAL_OPS = 10_000
+
+# Schema discovery
+SCHEMA_UPSERT_BATCH_ROWS = 1000
+SCHEMA_SAMPLE_ROWS = 1000
+SCHEMA_SAMPLE_CONCURRENCY = 4
+SCHEMA_SAMPLE_TIMEOUT_SECONDS = 10
+SCHEMA_PROFILE_ROWS = 20_000
+SCHEMA_PROFILE_TIMEOUT_SECONDS = 30
+# A table whose profiling failed is retried after this long, doubling per failure up to the max
+SCHEMA_PROFILE_RETRY_SECONDS = 3600
+SCHEMA_PROFILE_RETRY_MAX_SECONDS = 7 * 24 * 3600
+LOW_CARDINALITY_MAX_DISTINCT = 50
+SCHEMA_REFRESH_CONCURRENCY = 8
+SCHEMA_REFRESH_TIMEOUT_SECONDS = 600
+# Outlives the refresh timeout so a running refresh keeps its lock until it gives up
+SCHEMA_REFRESH_LOCK_SECONDS = SCHEMA_REFRESH_TIMEOUT_SECONDS + 60
+
+# Rendered schema context for AI prompts
+SCHEMA_CONTEXT_CACHE_TTL_SECONDS = 24 * 3600
+SCHEMA_CONTEXT_LOCAL_CACHE_SIZE = 128
+
+# Local (no-LLM) analysis of trivial results
+LOCAL_ANALYSIS_MAX_ROWS = 1000
+
+# Token budget: reserved per chat message before any LLM call, settled afterwards
+TOKEN_BUDGET_RESERVE_TOKENS = 10_000
+TOKEN_BUDGET_SYNC_BATCH = 500
+
+# Pre-flight EXPLAIN guardrail (per-connection policy in extra_config["preflight"])
+PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS = 5
+PREFLIGHT_PLAN_CACHE_TTL_SECONDS = 3600
+PREFLIGHT_DEFAULT_MAX_ROWS = 100_000_000
+PREFLIGHT_MIN_SAMPLE_PERCENT = 0.01
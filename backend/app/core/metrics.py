@@ -0,0 +1,72 @@
+"""Lightweight in-process metrics (per worker).
+
+Counters and value summaries (count / total / max) kept in memory and exposed
+through ``GET /health/metrics``.  Good enough to compare before/after numbers
+on a replica without pulling in a metrics backend.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = defaultdict(int)
+        self._summaries: dict[str, list[float]] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._summaries.setdefault(name, [0, 0.0, value])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {
+                    name: {"count": count, "total": total, "max": peak, "avg": total / count}
+                    for name, (count, total, peak) in self._summaries.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = Metrics()
+
+
+class StageTimer:
+    """Wall-clock milliseconds per pipeline stage for one request.
+
+    A stage entered more than once (a retried generation, say) accumulates.
+    Each pass is also observed as ``{prefix}.{stage}_ms`` when it ends.
+    """
+
+    def __init__(self, prefix: str = "chat.stage"):
+        self.prefix = prefix
+        self._timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self._timings[name] = self._timings.get(name, 0.0) + elapsed
+            metrics.observe(f"{self.prefix}.{name}_ms", elapsed)
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: round(ms, 1) for name, ms in self._timings.items()}
@@ -1,10 +1,13 @@
-"""Custom middleware: request ID, request logging, Redis-backed rate limiting."""
+"""Custom middleware: request ID, request logging, Redis-backed rate limiting,
+upload size limits."""
 
 import time
 import uuid
+from fastapi import HTTPException, status
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from loguru import logger
 
 import redis.asyncio as aioredis
@@ -155,3 +158,47 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             # Fail-open: any Redis error should not block requests
             logger.warning(f"Rate limiter error (allowing request): {e}")
             return await call_next(request)
+
+
+class UploadSizeLimitMiddleware:
+    """Refuse request bodies over *max_bytes* under *path_prefix* before they are parsed.
+
+    Multipart forms are spooled to disk while FastAPI parses them, ahead of
+    the endpoint, so the limit has to sit in front: an oversized
+    ``Content-Length`` is rejected up front and a chunked body is cut off as
+    soon as it passes the limit.  (Pure ASGI: ``BaseHTTPMiddleware`` would
+    buffer the stream.)
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_prefix: str = "/api/v1/upload"):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse(status_code=413, content={"detail": self._detail()})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # HTTPException passes through FastAPI's body parsing unchanged
+                    raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"Request exceeds the {self.max_bytes // 1024 ** 2} MB upload limit"
@@ -23,18 +23,19 @@ class SQLSafetyValidator:
 
     def validate(self, sql: str) -> dict:
         if not sql or not sql.strip():
-            return {"is_safe": False, "reason": "Empty SQL", "parsed_sql": None}
+            return {"is_safe": False, "reason": "Empty SQL", "parsed_sql": None, "expression": None}
 
         try:
             statements = sqlglot.parse(sql)
         except sqlglot.errors.ParseError as e:
-            return {"is_safe": False, "reason": f"SQL parse error: {e}", "parsed_sql": None}
+            return {"is_safe": False, "reason": f"SQL parse error: {e}", "parsed_sql": None, "expression": None}
 
         if len(statements) != 1:
             return {
                 "is_safe": False,
                 "reason": f"Expected 1 statement, got {len(statements)}. Multi-statement queries are not allowed.",
                 "parsed_sql": None,
+                "expression": None,
             }
 
         statement = statements[0]
@@ -44,6 +45,7 @@ class SQLSafetyValidator:
                 "is_safe": False,
                 "reason": f"Only SELECT statements are allowed. Got: {type(statement).__name__}",
                 "parsed_sql": None,
+                "expression": None,
             }
 
         for node in statement.walk():
@@ -52,7 +54,25 @@ class SQLSafetyValidator:
                     "is_safe": False,
                     "reason": f"Query contains forbidden operation: {type(node).__name__}",
                     "parsed_sql": None,
+                    "expression": None,
                 }
 
         normalized = statement.sql(dialect="postgres", pretty=True)
-        return {"is_safe": True, "reason": None, "parsed_sql": normalized}
+        return {"is_safe": True, "reason": None, "parsed_sql": normalized, "expression": statement}
+
+
+def apply_row_limit(expression: exp.Expression, limit: int) -> exp.Expression:
+    """Return a copy of *expression* that yields at most *limit* rows.
+
+    A SELECT gets its own LIMIT set (or lowered), which keeps ORDER BY
+    semantics intact; an existing literal LIMIT that is already tighter is
+    left alone.  Anything else is wrapped as ``SELECT * FROM (...) LIMIT n``.
+    """
+    if isinstance(expression, exp.Select):
+        current = expression.args.get("limit")
+        if isinstance(current, exp.Limit):
+            value = current.expression
+            if isinstance(value, exp.Literal) and value.is_int and int(value.this) <= limit:
+                return expression.copy()
+        return expression.limit(limit)
+    return exp.select("*").from_(expression.subquery("_limited")).limit(limit)
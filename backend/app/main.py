@@ -7,10 +7,17 @@ from starlette.responses import JSONResponse
 from app.api.router import api_router
 from app.api.websocket import websocket_router, ws_manager
 from app.core.database import engine
-from app.core.middleware import RequestIDMiddleware, RequestLoggingMiddleware, RateLimitMiddleware
+from app.services.connection_manager import ConnectionManager
+from app.core.middleware import (
+    RateLimitMiddleware,
+    RequestIDMiddleware,
+    RequestLoggingMiddleware,
+    UploadSizeLimitMiddleware,
+)
 from app.core.logging_config import configure_logging
 from app.core.exceptions import DataMindException, AuthenticationError, AuthorizationError, NotFoundError
 from app.config import settings
+from app.core.constants import MAX_UPLOAD_BYTES, UPLOAD_MULTIPART_OVERHEAD_BYTES
 from loguru import logger
 
 
@@ -21,6 +28,7 @@ async def lifespan(app: FastAPI):
     yield
     logger.info("Shutting down DataMind API...")
     await ws_manager.shutdown()
+    await ConnectionManager().close_all()
     await engine.dispose()
 
 
@@ -52,6 +60,10 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    # Multipart overhead (boundaries, part headers) on top of the file itself
+    app.add_middleware(
+        UploadSizeLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES + UPLOAD_MULTIPART_OVERHEAD_BYTES,
+    )
     app.add_middleware(RequestLoggingMiddleware)
     app.add_middleware(RequestIDMiddleware)
     app.add_middleware(RateLimitMiddleware, redis_url=settings.REDIS_URL)
@@ -37,6 +37,7 @@ class Connection(BaseModel):
     # Status
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     last_synced_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    schema_fingerprint: Mapped[dict | None] = mapped_column(JSONB, nullable=True)  # table -> definition digest
 
     # Relationships
     organization = relationship("Organization", back_populates="connections")
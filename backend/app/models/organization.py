@@ -14,6 +14,11 @@ PLAN_TOKEN_BUDGETS = {
     "enterprise": 50_000_000,
 }
 
+# How chat results are analyzed: "auto" answers trivial results (empty, single
+# value, simple time series) locally and only calls the LLM for the rest;
+# "llm" always calls the LLM.
+ANALYSIS_MODES = ("auto", "llm")
+
 
 class Organization(BaseModel):
     __tablename__ = "organizations"
@@ -39,6 +44,8 @@ class Organization(BaseModel):
         nullable=False,
     )
 
+    analysis_mode: Mapped[str] = mapped_column(String(20), default="auto", server_default="auto")
+
     # Relationships
     users = relationship("User", back_populates="organization", cascade="all, delete-orphan")
     connections = relationship("Connection", back_populates="organization", cascade="all, delete-orphan")
@@ -1,7 +1,8 @@
 """Schema table metadata — normalized from old schema_cache."""
 
 import uuid
-from sqlalchemy import String, BigInteger, Text, ForeignKey, UniqueConstraint
+from datetime import datetime
+from sqlalchemy import String, BigInteger, Integer, Text, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -22,6 +23,14 @@ class SchemaTable(BaseModel):
     row_count: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     ai_description: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    # Column profiling: last attempt, consecutive failures (timeouts, errors)
+    # and, after a failure, when to try again (see SchemaDiscoverer).
+    profiled_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    profile_failures: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    profile_retry_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True,
+    )
+
     # Relationships
     connection = relationship("Connection", back_populates="schema_tables")
     columns = relationship(
@@ -47,6 +47,7 @@ class ChatResponse(BaseModel):
     chart_config: Optional[dict] = None
     execution_time_ms: Optional[int] = None
     token_usage: Optional[dict] = None
+    stage_timings: Optional[dict] = None  # Milliseconds per pipeline stage
     error_message: Optional[str] = None
     session_id: Optional[uuid.UUID] = None
     message_id: Optional[uuid.UUID] = None
@@ -2,10 +2,20 @@
 
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
+from app.core.constants import PREFLIGHT_DEFAULT_MAX_ROWS
+
+
+class PreflightConfig(BaseModel):
+    """EXPLAIN pre-flight policy for a connection (see ``app.services.query_guard``)."""
+    enabled: bool = True
+    max_estimated_rows: Optional[float] = Field(PREFLIGHT_DEFAULT_MAX_ROWS, gt=0)
+    max_estimated_cost: Optional[float] = Field(None, gt=0)
+    action: Literal["reject", "revise", "sample"] = "revise"
+
 
 class ConnectionCreate(BaseModel):
     name: str = Field(..., max_length=255)
@@ -17,6 +27,7 @@ class ConnectionCreate(BaseModel):
     password: Optional[str] = None
     ssl_mode: str = "prefer"
     file_path: Optional[str] = None
+    preflight: Optional[PreflightConfig] = None
 
 
 class ConnectionResponse(BaseModel):
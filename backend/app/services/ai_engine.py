@@ -1,42 +1,65 @@
 """
 DataMind AI Engine
 ==================
-Orchestrates: User Question -> Schema Context -> Claude (NL->SQL) -> Execute -> Claude (Analyze+Visualize) -> Response
+Orchestrates: User Question -> Schema Context -> Claude (NL->SQL) -> Execute
+              -> Claude (Analyze+Visualize) -> Response
 
 DESIGN DECISIONS (v2):
   - Dependencies are INJECTED, not instantiated internally (testability)
-  - Insight + chart recommendation MERGED into one API call (latency)
+  - Insight + chart recommendation MERGED into one API call (latency), and
+    skipped entirely for trivial results (app.ai.chart_recommender)
   - Conversation context is CONDENSED (token efficiency)
   - SQL validation uses sqlglot PARSER, not regex (security)
   - Query results are CACHED in Redis (performance)
+  - Budget, history and schema loads run CONCURRENTLY; every stage is timed
 """
 
+import asyncio
 import hashlib
-from typing import Optional, Protocol
+from collections.abc import Callable
+from typing import Protocol
 
 from anthropic import AsyncAnthropic
-from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.ai.sql_generator import SQLGenerator
 from app.ai.analyze_and_visualize import AnalyzeAndVisualize
+from app.ai.chart_recommender import analyze_locally
 from app.ai.conversation import ConversationManager
+from app.ai.schema_retriever import SchemaIndex
+from app.ai.sql_generator import SQLGenerator
+from app.core.database import async_session_factory
+from app.core.metrics import StageTimer, metrics
 from app.core.sql_validator import SQLSafetyValidator
+from app.models.organization import ANALYSIS_MODES
 from app.schemas.chat import ChatResponse
-from app.services.token_budget_service import TokenBudgetService, TokenBudgetExceeded
-from loguru import logger
+from app.services.token_budget_service import (
+    BudgetReservation,
+    TokenBudgetExceeded,
+    TokenBudgetService,
+)
+
+DEFAULT_ANALYSIS_MODE = ANALYSIS_MODES[0]
 
 
 class SchemaProvider(Protocol):
-    async def get_schema_context(self, connection_id: str, db: AsyncSession) -> str: ...
+    async def get_schema_index(
+        self, connection_id: str, db: AsyncSession,
+    ) -> SchemaIndex | None: ...
+    def render_schema_context(
+        self, index: SchemaIndex | None, question: str | None = None,
+    ) -> str: ...
+    def is_full_schema(self, index: SchemaIndex | None) -> bool: ...
 
 
 class QueryRunner(Protocol):
     async def execute(self, connection_id: str, sql: str, db: AsyncSession,
-                      timeout_seconds: int, max_rows: int, skip_validation: bool = False) -> dict: ...
+                      timeout_seconds: int, max_rows: int,
+                      skip_validation: bool = False) -> dict: ...
 
 
 class CacheProvider(Protocol):
-    async def get(self, key: str) -> Optional[dict]: ...
+    async def get(self, key: str) -> dict | None: ...
     async def set(self, key: str, value: dict, ttl_seconds: int) -> None: ...
 
 
@@ -50,8 +73,10 @@ class AIEngine:
         sql_validator: SQLSafetyValidator,
         cache_provider: CacheProvider,
         conversation_provider: ConversationManager,
-        anthropic_client: Optional[AsyncAnthropic] = None,
+        anthropic_client: AsyncAnthropic | None = None,
         model: str = "claude-sonnet-4-20250514",
+        session_factory: async_sessionmaker | None = None,
+        budget_service: TokenBudgetService | None = None,
     ):
         self.client = anthropic_client or AsyncAnthropic()
         self.model = model
@@ -60,6 +85,9 @@ class AIEngine:
         self.sql_validator = sql_validator
         self.cache = cache_provider
         self.conversation = conversation_provider
+        # Independent sessions for the pre-LLM reads that run alongside the request's own
+        self.session_factory = session_factory or async_session_factory
+        self.budget_service = budget_service or TokenBudgetService()
         self.sql_generator = SQLGenerator(self.client, model)
         self.analyzer = AnalyzeAndVisualize(self.client, model)
 
@@ -69,124 +97,190 @@ class AIEngine:
         connection_id: str,
         session_id: str,
         db: AsyncSession,
-        on_stream: Optional[callable] = None,
-        org_id: Optional[str] = None,
+        on_stream: Callable | None = None,
+        org_id: str | None = None,
+        timer: StageTimer | None = None,
     ) -> ChatResponse:
         """
         Full pipeline:
-            0. Check token budget (if org_id provided)
-            1. Load schema context
-            2. Load condensed conversation history
+            0-2. Concurrently: reserve tokens against the org budget (if org_id
+                 provided), load condensed conversation history, load the schema index
+            2b. Select the schema context relevant to the question
             3. Generate SQL via Claude
             4. Validate SQL via sqlglot parser
             5. Check cache -> execute if miss
-            6. Analyze results + recommend chart (single Claude call)
-            7. Record token usage & return response
+            5b. Stream the result preview to the client (``query_result`` event)
+            6. Analyze results + recommend chart (local rules for trivial
+               results when the org's analysis_mode is "auto", else one Claude call),
+               then stream the chart (``chart_config`` event)
+            7. Settle the reservation with the tokens used & return response
+
+        *on_stream* receives text chunks (``{"phase", "chunk"}``) and, once
+        the data and the chart are ready, ``{"type": "query_result", ...}`` and
+        ``{"type": "chart_config", ...}`` events.
+
+        Each stage's wall time is recorded on *timer* (pass one in to add the
+        caller's own stages, e.g. persisting the reply) and returned in
+        ``ChatResponse.stage_timings``.
         """
+        timer = timer or StageTimer()
 
-        # Step 0: Token Budget Check
-        budget_service = TokenBudgetService()
-        if org_id:
-            try:
-                await budget_service.check_budget(org_id, db)
-            except TokenBudgetExceeded as exc:
-                return ChatResponse(
-                    content=(
-                        "Your organization has reached its monthly AI token budget. "
-                        "Please contact your administrator to upgrade the plan or "
-                        "wait for the budget to reset."
-                    ),
-                    error_message=str(exc),
-                )
+        # Steps 0-2: independent reads, run concurrently.  History stays on the
+        # request session (it must see the just-flushed user message); the
+        # others get their own sessions since one AsyncSession is not concurrency-safe.
+        # The reservation runs as its own, shielded task: cancelling this
+        # coroutine mid-gather (stop button, disconnect) must not cancel it after
+        # Redis has taken the tokens, so ``finally`` waits for it and settles.
+        reserve = asyncio.ensure_future(self._reserve_budget(org_id, timer))
+        response = None
+        try:
+            results = await asyncio.gather(
+                asyncio.shield(reserve),
+                self._load_history(session_id, db, timer),
+                self._load_schema_index(connection_id, timer),
+                return_exceptions=True,
+            )
+            _raise_first(results)
+            reservation, history, schema_index = results
+            response = await self._answer(
+                user_message, connection_id, db, on_stream, history, schema_index,
+                analysis_mode=(reservation and reservation.analysis_mode) or DEFAULT_ANALYSIS_MODE,
+                timer=timer,
+            )
+        except TokenBudgetExceeded as exc:
+            response = ChatResponse(
+                content=(
+                    "Your organization has reached its monthly AI token budget. "
+                    "Please contact your administrator to upgrade the plan or "
+                    "wait for the budget to reset."
+                ),
+                error_message=str(exc),
+            )
+        finally:
+            # Step 7: Settle the reservation with the tokens actually used (also on
+            # failure or cancellation)
+            if not reserve.done():
+                await asyncio.wait({reserve})
+            reservation = _completed_result(reserve)
+            if reservation is not None:
+                await self._settle_budget(reservation, response, timer)
 
-        # Step 1: Schema Context
-        schema_context = await self.schema_provider.get_schema_context(
-            connection_id=connection_id, db=db,
-        )
+        response.stage_timings = timer.as_dict()
+        return response
 
-        # Step 2: Condensed Conversation History
-        history = await self.conversation.get_condensed_history(
-            session_id=session_id, db=db, max_turns=10,
-        )
+    async def _answer(
+        self,
+        user_message: str,
+        connection_id: str,
+        db: AsyncSession,
+        on_stream: Callable | None,
+        history: list[dict],
+        schema_index: SchemaIndex | None,
+        analysis_mode: str,
+        timer: StageTimer,
+    ) -> ChatResponse:
+        """Steps 2b-6, once the budget is reserved and history and schema are loaded."""
+        # Step 2b: Schema Context -- only the tables relevant to this question
+        # (recent turns included, so follow-ups like "and by region?" still match)
+        with timer.stage("schema"):
+            retrieval_query = " ".join([*(turn["content"] for turn in history[-4:]), user_message])
+            schema_context = self.schema_provider.render_schema_context(
+                schema_index, retrieval_query,
+            )
+            # Only the full schema (it fit the budget) is the same for every question;
+            # cache just that.
+            cache_schema = self.schema_provider.is_full_schema(schema_index)
 
         # Step 3: Generate SQL
-        sql_response = await self.sql_generator.generate(
-            user_message=user_message,
-            schema_context=schema_context,
-            conversation_history=history,
-            on_stream=on_stream,
-        )
+        with timer.stage("generate"):
+            sql_response = await self.sql_generator.generate(
+                user_message=user_message,
+                schema_context=schema_context,
+                conversation_history=history,
+                on_stream=on_stream,
+                cache_schema=cache_schema,
+            )
         generated_sql = sql_response["sql"]
 
         # Handle non-data queries
         if generated_sql in ("CANNOT_ANSWER", "NOT_DATA_QUERY"):
             return ChatResponse(
-                content=sql_response.get("reasoning", "I can only answer questions about your data."),
+                content=sql_response.get(
+                    "reasoning", "I can only answer questions about your data.",
+                ),
                 generated_sql=None,
                 token_usage=sql_response.get("token_usage"),
             )
 
         # Step 4: Validate SQL (sqlglot parser -- NOT regex)
-        validation = self.sql_validator.validate(generated_sql)
+        with timer.stage("validate"):
+            validation = self.sql_validator.validate(generated_sql)
         if not validation["is_safe"]:
             return ChatResponse(
-                content=f"I generated a query but it was blocked for safety: {validation['reason']}. "
+                content=f"I generated a query but it was blocked for safety: "
+                        f"{validation['reason']}. "
                         f"I can only run read-only queries. Could you rephrase?",
                 generated_sql=generated_sql,
                 error_message=validation["reason"],
+                token_usage=sql_response.get("token_usage"),
             )
 
         # Step 5: Check Cache -> Execute
         cache_key = hashlib.sha256(f"{connection_id}:{generated_sql}".encode()).hexdigest()
-        cached = await self.cache.get(cache_key)
+        with timer.stage("cache"):
+            cached = await self.cache.get(cache_key)
 
         if cached:
             execution_result = cached
             logger.info(f"Cache hit for query: {cache_key[:16]}...")
         else:
-            execution_result = await self.query_runner.execute(
-                connection_id=connection_id,
-                sql=generated_sql,
-                db=db,
-                timeout_seconds=30,
-                max_rows=10000,
-                skip_validation=True,
-            )
+            with timer.stage("execute"):
+                execution_result = await self.query_runner.execute(
+                    connection_id=connection_id,
+                    sql=generated_sql,
+                    db=db,
+                    timeout_seconds=30,
+                    max_rows=10000,
+                    skip_validation=True,
+                )
 
             # Retry logic: if SQL execution failed, retry once with error context
-            if execution_result.get("error"):
+            # (including a pre-flight "revise" verdict; a "reject" is final)
+            preflight = execution_result.get("preflight") or {}
+            if execution_result.get("error") and preflight.get("action") != "reject":
                 retry_prompt = (
                     f"The SQL query failed with error: {execution_result['error']}. "
                     f"Original question: {user_message}\n"
                     f"Please fix the SQL and try again."
                 )
-                retry_response = await self.sql_generator.generate(
-                    user_message=retry_prompt,
-                    schema_context=schema_context,
-                    conversation_history=history,
-                    on_stream=on_stream,
+                with timer.stage("generate"):
+                    retry_response = await self.sql_generator.generate(
+                        user_message=retry_prompt,
+                        schema_context=schema_context,
+                        conversation_history=history,
+                        on_stream=on_stream,
+                        cache_schema=cache_schema,
+                    )
+                # Merge token usage from retry attempt
+                sql_response["token_usage"] = _merge_usage(
+                    sql_response.get("token_usage", {}), retry_response.get("token_usage", {}),
                 )
                 retry_sql = retry_response.get("sql")
                 if retry_sql and retry_sql not in ("CANNOT_ANSWER", "NOT_DATA_QUERY"):
                     # Validate the retry SQL
-                    retry_validation = self.sql_validator.validate(retry_sql)
+                    with timer.stage("validate"):
+                        retry_validation = self.sql_validator.validate(retry_sql)
                     if retry_validation["is_safe"]:
-                        # Merge token usage from retry attempt
-                        sql_response_tokens = sql_response.get("token_usage", {})
-                        retry_tokens = retry_response.get("token_usage", {})
-                        sql_response["token_usage"] = {
-                            "input_tokens": sql_response_tokens.get("input_tokens", 0) + retry_tokens.get("input_tokens", 0),
-                            "output_tokens": sql_response_tokens.get("output_tokens", 0) + retry_tokens.get("output_tokens", 0),
-                        }
                         generated_sql = retry_sql
-                        execution_result = await self.query_runner.execute(
-                            connection_id=connection_id,
-                            sql=retry_sql,
-                            db=db,
-                            timeout_seconds=30,
-                            max_rows=10000,
-                            skip_validation=True,
-                        )
+                        with timer.stage("execute"):
+                            execution_result = await self.query_runner.execute(
+                                connection_id=connection_id,
+                                sql=retry_sql,
+                                db=db,
+                                timeout_seconds=30,
+                                max_rows=10000,
+                                skip_validation=True,
+                            )
 
             # If still an error after retry, return it to the user
             if execution_result.get("error"):
@@ -195,52 +289,146 @@ class AIEngine:
                             f"Could you try rephrasing?",
                     generated_sql=generated_sql,
                     error_message=execution_result["error"],
+                    token_usage=sql_response.get("token_usage"),
                 )
 
-            await self.cache.set(cache_key, execution_result, ttl_seconds=300)
+            with timer.stage("cache"):
+                await self.cache.set(cache_key, execution_result, ttl_seconds=300)
 
-        # Step 6: Analyze + Visualize (SINGLE Claude call)
-        analysis = await self.analyzer.analyze(
-            user_message=user_message,
-            sql=generated_sql,
-            result_data=execution_result["data"],
-            on_stream=on_stream,
-        )
+        # The data is final: send it now so the table shows while the analysis runs
+        result_preview = self._truncate_result(execution_result["data"], max_rows=100)
+        if on_stream:
+            await on_stream({
+                "type": "query_result",
+                "generated_sql": generated_sql,
+                "query_result_preview": result_preview,
+                "full_result_row_count": execution_result["data"].get("row_count", 0),
+                "execution_time_ms": execution_result.get("execution_time_ms"),
+            })
 
-        # Merge token usage from both steps
-        sql_tokens = sql_response.get("token_usage", {})
-        analysis_tokens = analysis.get("token_usage", {})
-        total_tokens = {
-            "input_tokens": sql_tokens.get("input_tokens", 0) + analysis_tokens.get("input_tokens", 0),
-            "output_tokens": sql_tokens.get("output_tokens", 0) + analysis_tokens.get("output_tokens", 0),
-        }
+        # Step 6: Analyze + Visualize -- locally for trivial results, else a SINGLE Claude call
+        with timer.stage("analyze"):
+            analysis = None
+            if analysis_mode == "auto":
+                analysis = analyze_locally(user_message, execution_result["data"])
+            if analysis is not None:
+                metrics.incr("chat.analysis.local")
+                if on_stream:
+                    await on_stream({"phase": "analyzing", "chunk": analysis["insight"]})
+            else:
+                metrics.incr("chat.analysis.llm")
+                analysis = await self.analyzer.analyze(
+                    user_message=user_message,
+                    sql=generated_sql,
+                    result_data=execution_result["data"],
+                    on_stream=on_stream,
+                )
+
+        if on_stream:
+            await on_stream({"type": "chart_config", "chart_config": analysis["chart_config"]})
 
-        # Step 7: Record token usage against org budget
-        if org_id:
-            await budget_service.record_usage(
-                org_id=org_id,
-                input_tokens=total_tokens.get("input_tokens", 0),
-                output_tokens=total_tokens.get("output_tokens", 0),
-                db=db,
+        insight = analysis["insight"]
+        if result_preview.get("sample_percent") is not None:
+            insight += (
+                f"\n\n_Based on a ~{result_preview['sample_percent']:.2g}% sample: "
+                f"the full query was estimated to be too expensive to run._"
             )
 
+        # Merge token usage from both steps
+        total_tokens = _merge_usage(
+            sql_response.get("token_usage", {}), analysis.get("token_usage", {}),
+        )
+
         return ChatResponse(
-            content=analysis["insight"],
+            content=insight,
             context_summary=analysis["context_summary"],
             generated_sql=generated_sql,
-            query_result_preview=self._truncate_result(execution_result["data"], max_rows=100),
+            query_result_preview=result_preview,
             full_result_row_count=execution_result["data"].get("row_count", 0),
             chart_config=analysis["chart_config"],
             execution_time_ms=execution_result.get("execution_time_ms"),
             token_usage=total_tokens,
         )
 
+    # ── Pre-LLM stages ──────────────────────────────────────────────
+
+    async def _reserve_budget(
+        self, org_id: str | None, timer: StageTimer,
+    ) -> BudgetReservation | None:
+        """Raise TokenBudgetExceeded if the org is over budget, else hold tokens for
+        this message."""
+        if not org_id:
+            return None
+        with timer.stage("budget"):
+            # The session is only touched when the Redis counter must be (re)seeded
+            async with self.session_factory() as session:
+                reservation = await self.budget_service.reserve(org_id, session)
+                await session.commit()  # Keeps a billing-period reset
+                return reservation
+
+    async def _settle_budget(
+        self, reservation: BudgetReservation, response: ChatResponse | None, timer: StageTimer,
+    ) -> None:
+        usage = (response.token_usage if response else None) or {}
+        # Cached prompt tokens are still processed input as far as the budget goes
+        tokens = sum(usage.get(key, 0) or 0 for key in (
+            "input_tokens", "output_tokens",
+            "cache_creation_input_tokens", "cache_read_input_tokens",
+        ))
+        with timer.stage("persist"):
+            async with self.session_factory() as session:
+                await self.budget_service.settle(reservation, tokens, session)
+                await session.commit()
+
+    async def _load_history(
+        self, session_id: str, db: AsyncSession, timer: StageTimer,
+    ) -> list[dict]:
+        with timer.stage("history"):
+            return await self.conversation.get_condensed_history(
+                session_id=session_id, db=db, max_turns=10,
+            )
+
+    async def _load_schema_index(self, connection_id: str, timer: StageTimer) -> SchemaIndex | None:
+        with timer.stage("schema"):
+            async with self.session_factory() as session:
+                return await self.schema_provider.get_schema_index(connection_id, session)
+
     def _truncate_result(self, data: dict, max_rows: int = 100) -> dict:
         """Store only a preview of results in the DB."""
         rows = data.get("rows", [])
-        return {
+        preview = {
             "columns": data.get("columns", []),
-            "rows": rows[:max_rows],
+            "rows": list(rows[:max_rows]),
             "row_count": min(len(rows), max_rows),
             "truncated": len(rows) > max_rows,
         }
+        if data.get("sample_percent") is not None:
+            preview["sample_percent"] = data["sample_percent"]  # Ran on a pre-flight sample
+        return preview
+
+
+def _raise_first(results: list) -> None:
+    """Re-raise the first exception from ``asyncio.gather(..., return_exceptions=True)``.
+
+    Gathering that way lets every stage finish first, so none is left running
+    on a session the caller is about to roll back.
+    """
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def _completed_result(task: asyncio.Future):
+    """*task*'s result if it succeeded, else ``None``."""
+    if not task.cancelled() and task.exception() is None:
+        return task.result()
+    return None
+
+
+def _merge_usage(*usages: dict) -> dict:
+    """Sum token-usage dicts key by key (input/output and prompt-cache counts)."""
+    total: dict[str, int] = {"input_tokens": 0, "output_tokens": 0}
+    for usage in usages:
+        for key, value in usage.items():
+            total[key] = total.get(key, 0) + (value or 0)
+    return total
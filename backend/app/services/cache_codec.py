@@ -0,0 +1,112 @@
+"""Binary, type-preserving codecs for the Redis result cache.
+
+Wire format (``MsgpackCodec``)::
+
+    b"DM" | version (1 byte) | flags (1 byte) | payload
+
+``flags & 1`` means the payload is zlib-compressed; payloads are only
+compressed above ``compress_threshold`` bytes.  Values the JSON cache used to
+flatten with ``str()`` -- Decimal, datetime/date/time, timedelta, UUID --
+travel as msgpack ext types and come back as the same Python types.
+"""
+
+import datetime as dt
+import json
+import uuid
+import zlib
+from collections.abc import Sequence
+from decimal import Decimal
+from typing import Any, Protocol
+
+import msgpack
+
+from app.core.constants import CACHE_COMPRESS_LEVEL, CACHE_COMPRESS_THRESHOLD_BYTES
+from app.core.metrics import metrics
+
+MAGIC = b"DM"
+VERSION = 1
+FLAG_ZLIB = 0x01
+
+_EXT_DECIMAL = 1
+_EXT_DATETIME = 2
+_EXT_DATE = 3
+_EXT_TIME = 4
+_EXT_TIMEDELTA = 5
+_EXT_UUID = 6
+
+
+class CacheCodec(Protocol):
+    def encode(self, value: Any) -> bytes: ...
+    def decode(self, data: bytes) -> Any: ...
+
+
+class MsgpackCodec:
+    """msgpack + ext types, zlib-compressed above a size threshold."""
+
+    def __init__(
+        self,
+        compress_threshold: int = CACHE_COMPRESS_THRESHOLD_BYTES,
+        compress_level: int = CACHE_COMPRESS_LEVEL,
+    ):
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def encode(self, value: Any) -> bytes:
+        payload = msgpack.packb(value, default=_encode_ext, use_bin_type=True, datetime=False)
+        flags = 0
+        metrics.observe("cache.payload_bytes", len(payload))
+        if len(payload) > self.compress_threshold:
+            payload = zlib.compress(payload, self.compress_level)
+            flags |= FLAG_ZLIB
+            metrics.incr("cache.compressed")
+        data = MAGIC + bytes((VERSION, flags)) + payload
+        metrics.observe("cache.encoded_bytes", len(data))
+        return data
+
+    def decode(self, data: bytes) -> Any:
+        if not data.startswith(MAGIC):
+            # Entries written before the binary codec (plain JSON text).
+            return json.loads(data)
+        version, flags = data[2], data[3]
+        if version != VERSION:
+            raise ValueError(f"Unsupported cache codec version {version}")
+        payload = data[4:]
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        return msgpack.unpackb(payload, ext_hook=_decode_ext, raw=False, strict_map_key=False)
+
+
+def _encode_ext(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode())
+    if isinstance(value, dt.datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, dt.date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if isinstance(value, dt.time):
+        return msgpack.ExtType(_EXT_TIME, value.isoformat().encode())
+    if isinstance(value, dt.timedelta):
+        packed = msgpack.packb([value.days, value.seconds, value.microseconds])
+        return msgpack.ExtType(_EXT_TIMEDELTA, packed)
+    if isinstance(value, uuid.UUID):
+        return msgpack.ExtType(_EXT_UUID, value.bytes)
+    if isinstance(value, (Sequence, set, frozenset)) and not isinstance(value, (str, bytes)):
+        return list(value)  # Columnar RowView, sets, ...
+    return str(value)
+
+
+def _decode_ext(code: int, data: bytes) -> Any:
+    if code == _EXT_DECIMAL:
+        return Decimal(data.decode())
+    if code == _EXT_DATETIME:
+        return dt.datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return dt.date.fromisoformat(data.decode())
+    if code == _EXT_TIME:
+        return dt.time.fromisoformat(data.decode())
+    if code == _EXT_TIMEDELTA:
+        days, seconds, microseconds = msgpack.unpackb(data)
+        return dt.timedelta(days=days, seconds=seconds, microseconds=microseconds)
+    if code == _EXT_UUID:
+        return uuid.UUID(bytes=data)
+    return msgpack.ExtType(code, data)
@@ -1,22 +1,38 @@
 """Redis query result caching."""
 
-import json
+import uuid
 from typing import Optional
 import redis.asyncio as redis
 from app.config import settings
+from app.core.metrics import metrics
+from app.services.cache_codec import CacheCodec, MsgpackCodec
 from loguru import logger
 
+# Delete a lock only while it still holds our token (it may have expired and
+# been taken by another worker).
+_RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 class CacheService:
-    """Redis-backed cache for query results."""
+    """Redis-backed cache for query results.
+
+    Values are serialized by a pluggable ``CacheCodec`` (msgpack with
+    type-preserving ext types and threshold compression by default).
+    """
 
-    def __init__(self, redis_url: str = None):
+    def __init__(self, redis_url: str = None, codec: CacheCodec | None = None):
         self._redis_url = redis_url or settings.REDIS_URL
         self._client: Optional[redis.Redis] = None
+        self.codec = codec or MsgpackCodec()
 
     async def _get_client(self) -> redis.Redis:
         if self._client is None:
-            self._client = redis.from_url(self._redis_url, decode_responses=True)
+            self._client = redis.from_url(self._redis_url, decode_responses=False)
         return self._client
 
     async def get(self, key: str) -> Optional[dict]:
@@ -25,8 +41,11 @@ class CacheService:
             client = await self._get_client()
             value = await client.get(f"datamind:cache:{key}")
             if value:
-                return json.loads(value)
+                metrics.incr("cache.hits")
+                return self.codec.decode(value)
+            metrics.incr("cache.misses")
         except Exception as e:
+            metrics.incr("cache.errors")
             logger.warning(f"Cache get error: {e}")
         return None
 
@@ -37,9 +56,10 @@ class CacheService:
             await client.setex(
                 f"datamind:cache:{key}",
                 ttl_seconds,
-                json.dumps(value, default=str),
+                self.codec.encode(value),
             )
         except Exception as e:
+            metrics.incr("cache.errors")
             logger.warning(f"Cache set error: {e}")
 
     async def delete(self, key: str) -> None:
@@ -50,6 +70,62 @@ class CacheService:
         except Exception as e:
             logger.warning(f"Cache delete error: {e}")
 
+    async def get_version(self, key: str) -> Optional[str]:
+        """Current version token for *key*, created on first use.
+
+        Tokens are random rather than counters, so a token lost to eviction
+        never brings back entries cached under an earlier version.  Returns
+        ``None`` when Redis is unavailable.
+        """
+        name = f"datamind:version:{key}"
+        try:
+            client = await self._get_client()
+            token = await client.get(name)
+            if token is None:
+                await client.set(name, uuid.uuid4().hex, nx=True)
+                token = await client.get(name)
+            return token.decode() if token else None
+        except Exception as e:
+            metrics.incr("cache.errors")
+            logger.warning(f"Cache version get error: {e}")
+            return None
+
+    async def bump_version(self, key: str) -> None:
+        """Move *key* to a new version; entries cached under the old one go unused."""
+        try:
+            client = await self._get_client()
+            await client.set(f"datamind:version:{key}", uuid.uuid4().hex)
+        except Exception as e:
+            metrics.incr("cache.errors")
+            logger.warning(f"Cache version bump error: {e}")
+
+    async def acquire_lock(self, key: str, ttl_seconds: int) -> str | None:
+        """Take the lock *key* for at most *ttl_seconds* (``SET NX EX``).
+
+        Returns a token to pass to ``release_lock``, or ``None`` when another
+        holder has it.  With Redis unavailable the lock cannot be checked and
+        a token is returned anyway, so callers keep working unguarded.
+        """
+        token = uuid.uuid4().hex
+        try:
+            client = await self._get_client()
+            acquired = await client.set(f"datamind:lock:{key}", token, nx=True, ex=ttl_seconds)
+            return token if acquired else None
+        except Exception as e:
+            metrics.incr("cache.errors")
+            logger.warning(f"Cache lock error: {e}")
+            return token
+
+    async def release_lock(self, key: str, token: str) -> None:
+        """Release *key* if it is still held under *token*."""
+        try:
+            client = await self._get_client()
+            await client.eval(_RELEASE_LOCK_LUA, 1, f"datamind:lock:{key}", token)
+        except Exception as e:
+            metrics.incr("cache.errors")
+            logger.warning(f"Cache unlock error: {e}")
+
     async def close(self) -> None:
         if self._client:
             await self._client.close()
+            self._client = None
@@ -0,0 +1,147 @@
+"""Column profiling: distinct counts and null fractions for schema metadata.
+
+Statistics come from the database catalog when it keeps them (PostgreSQL
+``pg_stats``, MySQL histograms).  Columns without catalog statistics are
+profiled in a single streaming pass over a bounded sample of the table,
+counting distinct values with a HyperLogLog sketch so memory stays fixed no
+matter how many values a column has.
+"""
+
+import asyncio
+import hashlib
+import math
+from collections.abc import Sequence
+from typing import Any
+
+from app.connectors.base import BaseConnector, ColumnStats, TableInfo
+from app.core.constants import (
+    SCHEMA_PROFILE_ROWS,
+    SCHEMA_PROFILE_TIMEOUT_SECONDS,
+    SCHEMA_SAMPLE_CONCURRENCY,
+)
+from loguru import logger
+
+
+class HyperLogLog:
+    """Approximate distinct counter (~1.6% standard error at the default precision).
+
+    Counts are exact until ``exact_limit`` distinct values have been seen, so
+    low-cardinality columns -- the ones worth flagging -- get true counts.
+    """
+
+    def __init__(self, precision: int = 12, exact_limit: int = 1024):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self.exact_limit = exact_limit
+        self._exact: set[int] | None = set()
+
+    @staticmethod
+    def _hash(value) -> int:
+        if isinstance(value, str):
+            data = value.encode("utf-8", "surrogatepass")
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            data = bytes(value)
+        else:
+            data = repr(value).encode()
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+    def add(self, value) -> None:
+        x = self._hash(value)
+        if self._exact is not None:
+            self._exact.add(x)
+            if len(self._exact) <= self.exact_limit:
+                return
+            hashes, self._exact = self._exact, None
+            for h in hashes:
+                self._add_hash(h)
+        else:
+            self._add_hash(x)
+
+    def _add_hash(self, x: int) -> None:
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        if self._exact is not None:
+            return len(self._exact)
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities.
+        return round(estimate)
+
+
+class ColumnProfiler:
+    """Computes ``ColumnStats`` for the columns of one or more tables."""
+
+    def __init__(self, sample_rows: int = SCHEMA_PROFILE_ROWS):
+        self.sample_rows = sample_rows
+
+    async def profile(
+        self, connector: BaseConnector, columns_by_table: list[tuple[TableInfo, list[str]]],
+    ) -> dict[str, dict[str, ColumnStats] | None]:
+        """Profile several tables a few at a time; a table that fails or runs
+        past ``SCHEMA_PROFILE_TIMEOUT_SECONDS`` maps to ``None``."""
+        semaphore = asyncio.Semaphore(SCHEMA_SAMPLE_CONCURRENCY)
+
+        async def run(table: TableInfo, columns: list[str]):
+            async with semaphore:
+                try:
+                    return table.name, await asyncio.wait_for(
+                        self.profile_table(connector, table, columns),
+                        timeout=SCHEMA_PROFILE_TIMEOUT_SECONDS,
+                    )
+                except Exception as e:
+                    logger.warning(f"Profiling {table.name} failed: {e!r}")
+                    return table.name, None
+
+        return dict(await asyncio.gather(*(run(table, columns) for table, columns in columns_by_table)))
+
+    async def profile_table(
+        self, connector: BaseConnector, table: TableInfo, columns: list[str],
+    ) -> dict[str, ColumnStats]:
+        stats = await connector.get_column_stats(table)
+        missing = [c for c in columns if stats.get(c) is None or stats[c].distinct_count is None]
+        if missing:
+            stats.update(await self._scan(connector, table, missing))
+        return {c: stats[c] for c in columns if c in stats}
+
+    async def _scan(self, connector: BaseConnector, table: TableInfo, columns: list[str]) -> dict[str, ColumnStats]:
+        sketches = [HyperLogLog() for _ in columns]
+        nulls = [0] * len(columns)
+        scanned = 0
+
+        def consume(rows: Sequence[Sequence[Any]]) -> None:
+            for row in rows:
+                for i, value in enumerate(row):
+                    if value is None:
+                        nulls[i] += 1
+                    else:
+                        sketches[i].add(value)
+
+        async for batch in connector.stream_table_sample(table, columns, self.sample_rows):
+            # Hashing is CPU-bound; keep it off the event loop.
+            await asyncio.to_thread(consume, batch.rows)
+            scanned += len(batch.rows)
+
+        if not scanned:
+            return {c: ColumnStats(distinct_count=0, null_fraction=None) for c in columns}
+
+        # A sample that hit the row cap only shows part of the table.  Columns
+        # that are (nearly) unique in the sample are taken to stay unique;
+        # anything else is reported as seen, which is a lower bound.
+        scale = 1.0
+        if scanned >= self.sample_rows and table.row_count and table.row_count > scanned:
+            scale = table.row_count / scanned
+        result = {}
+        for column, sketch, null_count in zip(columns, sketches, nulls):
+            distinct = sketch.count()
+            non_null = scanned - null_count
+            if scale > 1 and non_null and distinct >= 0.95 * non_null:
+                distinct = round(distinct * scale)
+            result[column] = ColumnStats(distinct_count=distinct, null_fraction=null_count / scanned)
+        return result
@@ -1,10 +1,35 @@
-"""Manages database connection pools using read-only credentials."""
+"""Manages database connection pools using read-only credentials.
+
+Connectors are long-lived: every replica keeps a registry of live connectors
+keyed by connection id plus a fingerprint of the credentials they were built
+with.  Callers borrow a connector for the duration of a request
+(``async with manager.get_connector(...) as connector``) and must NOT
+``close()`` it -- the registry owns the underlying driver pool and closes it
+on idle eviction, on invalidation, or at shutdown, never while it is leased.
+Decrypted specs are cached per replica and checked against a version key in
+Redis, so invalidating a connection on one replica reaches all of them.
+"""
 
 import asyncio
+import hashlib
+import json
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.connection import Connection
+from app.core.constants import (
+    CONNECTION_SPEC_TTL_SECONDS,
+    CONNECTOR_IDLE_TTL_SECONDS,
+    CONNECTOR_POOL_MAX_SIZE,
+    QUERY_TIMEOUT_SECONDS,
+)
 from app.core.security import decrypt_value
 from app.core.exceptions import NotFoundError, ConnectionError as ConnError
 from app.connectors.base import BaseConnector
@@ -13,64 +38,315 @@ from app.connectors.mysql import MySQLConnector
 from app.connectors.sqlite import SQLiteConnector
 from app.connectors.csv_connector import CSVConnector
 from app.connectors.excel_connector import ExcelConnector
+from app.services.cache_service import CacheService
 from loguru import logger
 
 
-class ConnectionManager:
-    """Creates and manages database connectors with read-only credentials."""
+@dataclass(frozen=True)
+class ConnectionSpec:
+    """Session-independent snapshot of a Connection row with decrypted read-only credentials."""
 
-    async def get_connector(self, connection_id: str, org_id: str, db: AsyncSession) -> BaseConnector:
-        """Get a connector for the specified connection, scoped to an organization.
+    connection_id: str
+    org_id: str
+    name: str
+    conn_type: str
+    is_active: bool
+    host: str | None = None
+    port: int | None = None
+    database: str | None = None
+    username: str | None = None
+    password: str | None = field(default=None, repr=False)
+    file_path: str | None = None
+    ssl_mode: str = "prefer"
+    extra_config: dict = field(default_factory=dict, compare=False, hash=False)
 
-        This is the SAFE method — API endpoints must use this.
-        """
-        result = await db.execute(
-            select(Connection).where(Connection.id == connection_id, Connection.org_id == org_id)
+    @property
+    def fingerprint(self) -> str:
+        """Hash of everything that determines how the driver pool is built."""
+        material = json.dumps(
+            [self.conn_type, self.host, self.port, self.database,
+             self.username, self.password, self.file_path, self.ssl_mode],
+            default=str,
         )
-        conn = result.scalar_one_or_none()
+        return hashlib.sha256(material.encode()).hexdigest()
 
-        if not conn:
-            raise NotFoundError("Connection")
 
-        if not conn.is_active:
-            raise ConnError(f"Connection {conn.name} is inactive")
+@dataclass
+class _RegistryEntry:
+    fingerprint: str
+    connector: BaseConnector
+    last_used: float
+    in_use: int = 0  # Open leases
 
-        # SECURITY: Use readonly credentials, NEVER the admin credentials
-        username = conn.readonly_username or conn.username
-        password = None
+
+@dataclass
+class _CachedSpec:
+    spec: ConnectionSpec
+    loaded_at: float
+    version: str | None  # Redis version token it was loaded under
+
+
+class ConnectorRegistry:
+    """Per-event-loop cache of live connectors and decrypted connection specs.
+
+    - Connectors are keyed by connection id; a fingerprint mismatch (changed
+      host/credentials/file) closes the old connector and builds a new one.
+    - Connectors are leased (``lease``); leased ones are never closed, and
+      one replaced or invalidated while leased closes on its last release.
+    - Idle connectors unused for ``idle_ttl`` seconds are closed lazily.
+    - At most ``max_size`` connectors are kept; the least recently used idle
+      one is evicted when the cap is reached.  When all of them are leased a
+      new connection waits up to ``busy_timeout`` seconds for a release.
+    """
+
+    def __init__(
+        self,
+        max_size: int = CONNECTOR_POOL_MAX_SIZE,
+        idle_ttl: float = CONNECTOR_IDLE_TTL_SECONDS,
+        spec_ttl: float = CONNECTION_SPEC_TTL_SECONDS,
+        busy_timeout: float = QUERY_TIMEOUT_SECONDS,
+        cache: CacheService | None = None,
+    ):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.spec_ttl = spec_ttl
+        self.busy_timeout = busy_timeout
+        self.cache = cache or CacheService()
+        self._entries: OrderedDict[str, _RegistryEntry] = OrderedDict()
+        self._retired: list[_RegistryEntry] = []  # Discarded while leased
+        self._released = asyncio.Condition()
+        self._specs: dict[str, _CachedSpec] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    # ── Specs ───────────────────────────────────────────────────────
+
+    async def get_spec(self, connection_id: str) -> ConnectionSpec | None:
+        cached = self._specs.get(connection_id)
+        if cached is None or time.monotonic() - cached.loaded_at >= self.spec_ttl:
+            return None
+        if await self.cache.get_version(_spec_version_key(connection_id)) != cached.version:
+            return None  # Invalidated on another replica
+        return cached.spec
+
+    async def put_spec(self, spec: ConnectionSpec) -> None:
+        version = await self.cache.get_version(_spec_version_key(spec.connection_id))
+        self._specs[spec.connection_id] = _CachedSpec(
+            spec=spec, loaded_at=time.monotonic(), version=version,
+        )
+
+    # ── Connectors ──────────────────────────────────────────────────
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        spec: ConnectionSpec,
+        factory: Callable[[ConnectionSpec], Awaitable[BaseConnector]],
+    ) -> AsyncIterator[BaseConnector]:
+        """Borrow the live connector for *spec*, building it with *factory* on miss."""
+        entry = await self._checkout(spec, factory)
         try:
-            encrypted_pw = conn.readonly_password_encrypted or conn.password_encrypted
-            if encrypted_pw:
-                password = decrypt_value(encrypted_pw)
+            yield entry.connector
+        finally:
+            await self._release(entry)
+
+    async def invalidate(self, connection_id: str) -> None:
+        """Forget the cached spec and close the connector for a connection, on
+        every replica (the spec's version key moves on)."""
+        await self.cache.bump_version(_spec_version_key(connection_id))
+        self._specs.pop(connection_id, None)
+        await self._discard(connection_id)
+
+    async def close_all(self) -> None:
+        for key in list(self._entries):
+            await self._discard(key)
+        self._specs.clear()
+        await self.cache.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ── Internal ────────────────────────────────────────────────────
+
+    async def _checkout(
+        self,
+        spec: ConnectionSpec,
+        factory: Callable[[ConnectionSpec], Awaitable[BaseConnector]],
+    ) -> _RegistryEntry:
+        key = spec.connection_id
+        fingerprint = spec.fingerprint
+
+        entry = self._entries.get(key)
+        if entry and entry.fingerprint == fingerprint:
+            return self._touch(key, entry)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Another coroutine may have built it while we waited.
+            entry = self._entries.get(key)
+            if entry and entry.fingerprint == fingerprint:
+                return self._touch(key, entry)
+            if entry:
+                logger.info(f"Connection {key} credentials changed; rebuilding connector")
+                await self._discard(key)
+
+            await self._evict()
+            connector = await factory(spec)
+            entry = self._entries[key] = _RegistryEntry(
+                fingerprint=fingerprint, connector=connector, last_used=time.monotonic(),
+            )
+            logger.debug(f"Connector pool created for connection {key} ({len(self._entries)} live)")
+            return self._touch(key, entry)
+
+    def _touch(self, key: str, entry: _RegistryEntry) -> _RegistryEntry:
+        entry.in_use += 1
+        entry.last_used = time.monotonic()
+        self._entries.move_to_end(key)
+        return entry
+
+    async def _release(self, entry: _RegistryEntry) -> None:
+        entry.in_use -= 1
+        entry.last_used = time.monotonic()
+        if entry.in_use == 0 and entry in self._retired:
+            self._retired.remove(entry)
+            await self._close(entry)
+        async with self._released:
+            self._released.notify_all()
+
+    async def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.in_use:
+            self._retired.append(entry)  # Closed by its last release
+        else:
+            await self._close(entry)
+
+    @staticmethod
+    async def _close(entry: _RegistryEntry) -> None:
+        try:
+            await entry.connector.close()
         except Exception as e:
-            logger.error(f"Failed to decrypt connection password: {e}")
-            raise ConnError("Failed to decrypt connection credentials")
+            logger.warning(f"Error closing connector: {e}")
 
-        return await self._create_connector(
-            conn_type=conn.type,
-            host=conn.host,
-            port=conn.port,
-            database=conn.database_name,
-            username=username,
-            password=password,
-            file_path=conn.file_path,
-            ssl_mode=conn.ssl_mode,
+    def _has_room(self) -> bool:
+        return len(self._entries) < self.max_size or any(
+            not entry.in_use for entry in self._entries.values()
         )
 
-    async def get_connector_internal(self, connection_id: str, db: AsyncSession) -> BaseConnector:
+    async def _evict(self) -> None:
+        """Close idle connectors and enforce the size cap (LRU order)."""
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if not entry.in_use and now - entry.last_used >= self.idle_ttl:
+                await self._discard(key)
+
+        if not self._has_room():
+            logger.warning(
+                f"Connector registry at capacity ({self.max_size}) with every pool leased; "
+                f"waiting for a release"
+            )
+            try:
+                async with asyncio.timeout(self.busy_timeout), self._released:
+                    await self._released.wait_for(self._has_room)
+            except TimeoutError:
+                raise ConnError("Too many database connections are busy; try again shortly")
+
+        while len(self._entries) >= self.max_size:
+            key = next(key for key, entry in self._entries.items() if not entry.in_use)
+            await self._discard(key)
+
+
+def _spec_version_key(connection_id: str) -> str:
+    return f"connection_spec:{connection_id}"
+
+
+# Driver pools are bound to the event loop that created them, so every loop
+# (the API server's, or each asyncio.run() inside a Celery task) gets its own.
+_registries: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ConnectorRegistry]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_connector_registry() -> ConnectorRegistry:
+    loop = asyncio.get_running_loop()
+    registry = _registries.get(loop)
+    if registry is None:
+        registry = ConnectorRegistry()
+        _registries[loop] = registry
+    return registry
+
+
+class ConnectionManager:
+    """Hands out pooled database connectors with read-only credentials.
+
+    Instances are cheap and stateless; all pooling lives in the per-loop
+    ``ConnectorRegistry``.  Connectors lent here are shared -- never close them.
+    """
+
+    @asynccontextmanager
+    async def get_connector(
+        self, connection_id: str, org_id: str, db: AsyncSession,
+    ) -> AsyncIterator[BaseConnector]:
+        """Borrow a connector for the specified connection, scoped to an organization.
+
+        This is the SAFE method — API endpoints must use this.
+        """
+        spec = await self.get_spec(connection_id, db)
+        if spec is None or spec.org_id != str(org_id):
+            raise NotFoundError("Connection")
+        async with self._lease(spec) as connector:
+            yield connector
+
+    @asynccontextmanager
+    async def get_connector_internal(
+        self, connection_id: str, db: AsyncSession,
+    ) -> AsyncIterator[BaseConnector]:
         # INTERNAL ONLY: No org scoping. Only for Celery tasks with pre-validated connections.
-        """Get a connector for the specified connection, using read-only credentials."""
+        """Borrow a connector for the specified connection, using read-only credentials."""
+        spec = await self.get_spec(connection_id, db)
+        if spec is None:
+            raise NotFoundError(f"Connection {connection_id} not found")
+        async with self._lease(spec) as connector:
+            yield connector
+
+    async def get_spec(self, connection_id: str, db: AsyncSession) -> ConnectionSpec | None:
+        """Return the cached connection snapshot, loading it from the app DB on miss."""
+        connection_id = str(connection_id)
+        registry = get_connector_registry()
+        spec = await registry.get_spec(connection_id)
+        if spec is not None:
+            return spec
+
         result = await db.execute(
             select(Connection).where(Connection.id == connection_id)
         )
         conn = result.scalar_one_or_none()
-
         if not conn:
-            raise NotFoundError(f"Connection {connection_id} not found")
+            return None
+
+        spec = self._build_spec(conn)
+        await registry.put_spec(spec)
+        return spec
+
+    async def invalidate(self, connection_id: str) -> None:
+        """Drop cached credentials and close the pool after a connection is updated or
+        deleted (other replicas reload the spec on their next use)."""
+        await get_connector_registry().invalidate(str(connection_id))
 
-        if not conn.is_active:
-            raise ConnError(f"Connection {conn.name} is inactive")
+    async def close_all(self) -> None:
+        """Close every pooled connector owned by the current event loop."""
+        await get_connector_registry().close_all()
 
+    @asynccontextmanager
+    async def _lease(self, spec: ConnectionSpec) -> AsyncIterator[BaseConnector]:
+        if not spec.is_active:
+            raise ConnError(f"Connection {spec.name} is inactive")
+        registry = get_connector_registry()
+        async with registry.lease(spec, self._create_connector_from_spec) as connector:
+            yield connector
+
+    @staticmethod
+    def _build_spec(conn: Connection) -> ConnectionSpec:
         # SECURITY: Use readonly credentials, NEVER the admin credentials
         username = conn.readonly_username or conn.username
         password = None
@@ -82,15 +358,32 @@ class ConnectionManager:
             logger.error(f"Failed to decrypt connection password: {e}")
             raise ConnError("Failed to decrypt connection credentials")
 
-        return await self._create_connector(
+        return ConnectionSpec(
+            connection_id=str(conn.id),
+            org_id=str(conn.org_id),
+            name=conn.name,
             conn_type=conn.type,
+            is_active=bool(conn.is_active),
             host=conn.host,
             port=conn.port,
             database=conn.database_name,
             username=username,
             password=password,
             file_path=conn.file_path,
-            ssl_mode=conn.ssl_mode,
+            ssl_mode=conn.ssl_mode or "prefer",
+            extra_config=dict(conn.extra_config or {}),
+        )
+
+    async def _create_connector_from_spec(self, spec: ConnectionSpec) -> BaseConnector:
+        return await self._create_connector(
+            conn_type=spec.conn_type,
+            host=spec.host,
+            port=spec.port,
+            database=spec.database,
+            username=spec.username,
+            password=spec.password,
+            file_path=spec.file_path,
+            ssl_mode=spec.ssl_mode,
         )
 
     async def _create_connector(
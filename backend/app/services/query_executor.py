@@ -1,18 +1,24 @@
 """Safe SQL execution: sqlglot parse -> read-only user -> timeout."""
 
 import time
+import sqlglot
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.sql_validator import SQLSafetyValidator
+from app.core.sql_validator import SQLSafetyValidator, apply_row_limit
 from app.core.constants import MAX_QUERY_ROWS, QUERY_TIMEOUT_SECONDS
+from app.services.query_guard import PreflightPolicy, QueryGuard
 from loguru import logger
 
+# sqlglot dialect used to re-render rewritten SQL for each connection type.
+_DIALECTS = {"postgresql": "postgres", "mysql": "mysql", "sqlite": "sqlite", "csv": "sqlite", "excel": "sqlite"}
+
 
 class QueryExecutor:
     """Executes validated SQL against user databases with safety controls."""
 
-    def __init__(self, connection_manager):
+    def __init__(self, connection_manager, guard: QueryGuard | None = None):
         self.connection_manager = connection_manager
         self.validator = SQLSafetyValidator()
+        self.guard = guard or QueryGuard()
 
     async def execute(
         self,
@@ -23,7 +29,17 @@ class QueryExecutor:
         max_rows: int = MAX_QUERY_ROWS,
         skip_validation: bool = False,
     ) -> dict:
-        """Execute SQL with safety validation and resource limits."""
+        """Execute SQL with safety validation and resource limits.
+
+        The statement is rewritten to ``LIMIT max_rows + 1`` so the database,
+        not the driver, bounds the result; ``data["truncated"]`` is set when
+        the extra row comes back.
+
+        Connections with a pre-flight policy are planned first (see
+        ``app.services.query_guard``): a blocked query returns an error plus
+        ``"preflight"`` (the verdict), a sampled one ``data["sample_percent"]``.
+        """
+        expression = None
         # Validate SQL (unless caller already validated, e.g. AI engine)
         if not skip_validation:
             validation = self.validator.validate(sql)
@@ -34,36 +50,59 @@ class QueryExecutor:
                     "execution_time_ms": 0,
                 }
             sql = validation.get("parsed_sql", sql)
+            expression = validation.get("expression")
 
         try:
-            connector = await self.connection_manager.get_connector_internal(connection_id, db)
-            try:
+            spec = await self.connection_manager.get_spec(connection_id, db)
+            dialect = _DIALECTS.get(spec.conn_type, "postgres") if spec else "postgres"
+
+            # Pooled connector -- leased from the registry, never closed here.
+            lease = self.connection_manager.get_connector_internal(connection_id, db)
+            async with lease as connector:
+                # Pre-flight: plan the statement and hold back runaway queries
+                sample_percent = None
+                policy = PreflightPolicy.for_connection(spec.extra_config) if spec else None
+                if policy is not None:
+                    verdict = await self.guard.check(
+                        str(connection_id), connector, sql, dialect, policy,
+                    )
+                    if verdict.action in ("reject", "revise"):
+                        return {
+                            "data": {"columns": [], "rows": [], "row_count": 0},
+                            "error": f"Query blocked before running: {verdict.reason}",
+                            "execution_time_ms": 0,
+                            "preflight": verdict.to_dict(),
+                        }
+                    if verdict.action == "sample":
+                        sql, expression, sample_percent = verdict.sql, None, verdict.sample_percent
+
+                sql = self._limit_sql(sql, expression, dialect, max_rows + 1)
                 start = time.perf_counter()
                 result = await connector.execute_query(
                     sql=sql,
                     timeout=timeout_seconds,
-                    max_rows=max_rows,
+                    max_rows=max_rows + 1,
                 )
                 elapsed_ms = int((time.perf_counter() - start) * 1000)
 
-                if result.error:
-                    return {
-                        "data": {"columns": [], "rows": [], "row_count": 0},
-                        "error": result.error,
-                        "execution_time_ms": elapsed_ms,
-                    }
-
+            if result.error:
                 return {
-                    "data": {
-                        "columns": result.columns,
-                        "rows": result.rows,
-                        "row_count": result.row_count,
-                    },
-                    "error": None,
+                    "data": {"columns": [], "rows": [], "row_count": 0},
+                    "error": result.error,
                     "execution_time_ms": elapsed_ms,
                 }
-            finally:
-                await connector.close()
+
+            truncated = len(result.rows) > max_rows
+            rows = result.rows[:max_rows] if truncated else result.rows
+            data = {
+                "columns": result.columns,
+                "rows": rows,
+                "row_count": len(rows),
+                "truncated": truncated,
+            }
+            if sample_percent is not None:
+                data["sample_percent"] = sample_percent
+            return {"data": data, "error": None, "execution_time_ms": elapsed_ms}
 
         except Exception as e:
             logger.error(f"Query execution error: {e}")
@@ -72,3 +111,15 @@ class QueryExecutor:
                 "error": str(e),
                 "execution_time_ms": 0,
             }
+
+    @staticmethod
+    def _limit_sql(sql: str, expression, dialect: str, limit: int) -> str:
+        """Render *sql* with a server-side row cap, parsing it if no AST was supplied."""
+        try:
+            if expression is None:
+                expression = sqlglot.parse_one(sql, read=dialect)
+            return apply_row_limit(expression, limit).sql(dialect=dialect)
+        except sqlglot.errors.SqlglotError as e:
+            # Pre-validated SQL the parser can't round-trip: the driver still caps rows.
+            logger.debug(f"Row limit pushdown skipped: {e}")
+            return sql
@@ -0,0 +1,174 @@
+"""Pre-flight cost check for SQL before it runs on a customer database.
+
+The statement is planned with the connector's ``explain`` (``EXPLAIN``
+without execution) and its estimates are compared with the connection's
+policy, stored as ``extra_config["preflight"]``::
+
+    {"max_estimated_rows": 100000000, "max_estimated_cost": null, "action": "revise"}
+
+Over a limit, the action decides what happens: ``reject`` refuses the query,
+``revise`` refuses it with the plan as the reason so the AI engine can ask the
+model for a fixed query, and ``sample`` rewrites the fully scanned tables with
+``TABLESAMPLE`` (PostgreSQL only; elsewhere it falls back to ``revise``).
+Plans are cached by statement fingerprint, so repeated dashboard queries skip
+the extra round trip.  A failing ``EXPLAIN`` never blocks a query.
+"""
+
+import hashlib
+from dataclasses import asdict, dataclass
+
+import sqlglot
+from loguru import logger
+from sqlglot import exp
+
+from app.config import settings
+from app.connectors.base import BaseConnector, QueryPlan
+from app.core.constants import (
+    PREFLIGHT_DEFAULT_MAX_ROWS,
+    PREFLIGHT_MIN_SAMPLE_PERCENT,
+    PREFLIGHT_PLAN_CACHE_TTL_SECONDS,
+)
+from app.core.metrics import metrics
+from app.services.cache_service import CacheService
+
+PREFLIGHT_ACTIONS = ("reject", "revise", "sample")
+
+
+@dataclass
+class PreflightPolicy:
+    max_estimated_rows: float | None = PREFLIGHT_DEFAULT_MAX_ROWS
+    max_estimated_cost: float | None = None
+    action: str = "revise"
+
+    @classmethod
+    def for_connection(cls, extra_config: dict) -> "PreflightPolicy | None":
+        """The connection's policy, the global default if enabled, else ``None``."""
+        config = extra_config.get("preflight")
+        if isinstance(config, dict):
+            if config.get("enabled") is False:
+                return None
+            policy = cls(
+                max_estimated_rows=config.get("max_estimated_rows", PREFLIGHT_DEFAULT_MAX_ROWS),
+                max_estimated_cost=config.get("max_estimated_cost"),
+                action=config.get("action", "revise"),
+            )
+            if policy.action not in PREFLIGHT_ACTIONS:
+                policy.action = "revise"
+            return policy
+        return cls() if settings.SQL_PREFLIGHT_ENABLED else None
+
+
+@dataclass
+class PreflightVerdict:
+    action: str  # "allow" | "reject" | "revise" | "sample"
+    plan: QueryPlan | None
+    reason: str | None = None
+    sql: str | None = None  # Rewritten statement when action == "sample"
+    sample_percent: float | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class QueryGuard:
+    """Plans statements and applies a connection's ``PreflightPolicy``."""
+
+    def __init__(self, cache: CacheService | None = None):
+        self.cache = cache or CacheService()
+
+    async def check(
+        self,
+        connection_id: str,
+        connector: BaseConnector,
+        sql: str,
+        dialect: str,
+        policy: PreflightPolicy,
+    ) -> PreflightVerdict:
+        plan = await self._plan(connection_id, connector, sql)
+        if plan is None:
+            return PreflightVerdict("allow", None)
+
+        reason = _over_limit(plan, policy)
+        if reason is None:
+            return PreflightVerdict("allow", plan)
+
+        metrics.incr(f"preflight.{policy.action}")
+        if policy.action == "sample":
+            sampled = _sample(sql, plan, policy, dialect)
+            if sampled is not None:
+                sampled_sql, percent = sampled
+                return PreflightVerdict(
+                    "sample", plan, reason, sql=sampled_sql, sample_percent=percent,
+                )
+            return PreflightVerdict("revise", plan, reason)
+        return PreflightVerdict(policy.action, plan, reason)
+
+    async def _plan(
+        self, connection_id: str, connector: BaseConnector, sql: str,
+    ) -> QueryPlan | None:
+        key = "plan:" + hashlib.sha256(f"{connection_id}:{sql}".encode()).hexdigest()
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return QueryPlan(**cached["plan"]) if cached["plan"] else None
+        try:
+            plan = await connector.explain(sql)
+        except Exception as e:
+            metrics.incr("preflight.explain_errors")
+            logger.warning(f"Pre-flight EXPLAIN failed, running the query unchecked: {e}")
+            return None
+        await self.cache.set(
+            key, {"plan": asdict(plan) if plan else None},
+            ttl_seconds=PREFLIGHT_PLAN_CACHE_TTL_SECONDS,
+        )
+        return plan
+
+
+def _over_limit(plan: QueryPlan, policy: PreflightPolicy) -> str | None:
+    """Why *plan* breaks *policy*, worded for the SQL model; ``None`` if it doesn't."""
+    problems = []
+    if policy.max_estimated_rows is not None and plan.estimated_rows is not None \
+            and plan.estimated_rows > policy.max_estimated_rows:
+        problems.append(
+            f"an estimated {plan.estimated_rows:,.0f} rows "
+            f"(limit {policy.max_estimated_rows:,.0f})"
+        )
+    if policy.max_estimated_cost is not None and plan.estimated_cost is not None \
+            and plan.estimated_cost > policy.max_estimated_cost:
+        problems.append(
+            f"an estimated cost of {plan.estimated_cost:,.0f} "
+            f"(limit {policy.max_estimated_cost:,.0f})"
+        )
+    if not problems:
+        return None
+    reason = "the query plan shows " + " and ".join(problems)
+    if plan.full_scans:
+        reason += f", reading {', '.join(plan.full_scans)} in full"
+    return reason + ". Check for missing join conditions or filters."
+
+
+def _sample(
+    sql: str, plan: QueryPlan, policy: PreflightPolicy, dialect: str,
+) -> tuple[str, float] | None:
+    """*sql* with its fully scanned tables block-sampled down to the row limit."""
+    if dialect != "postgres" or not plan.full_scans:
+        return None
+    if not plan.estimated_rows or not policy.max_estimated_rows:
+        return None
+    try:
+        expression = sqlglot.parse_one(sql, read=dialect)
+    except sqlglot.errors.SqlglotError:
+        return None
+    tables = [
+        table for table in expression.find_all(exp.Table)
+        if table.name in plan.full_scans and not table.args.get("sample")
+    ]
+    if not tables:
+        return None
+    # Joined samples multiply: each table keeps the n-th root of the overall fraction.
+    fraction = (policy.max_estimated_rows / plan.estimated_rows) ** (1 / len(tables))
+    percent = max(PREFLIGHT_MIN_SAMPLE_PERCENT, min(100.0, 100 * fraction))
+    for table in tables:
+        table.set("sample", exp.TableSample(
+            method=exp.var("SYSTEM"), percent=exp.Literal.number(round(percent, 4)),
+        ))
+    return expression.sql(dialect=dialect), percent
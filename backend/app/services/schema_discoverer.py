@@ -1,118 +1,508 @@
 """Database schema introspection and AI enrichment."""
 
-from sqlalchemy import select, text
+import asyncio
+import uuid
+from collections import OrderedDict
+from collections.abc import Collection
+from datetime import datetime, timedelta, timezone
+from typing import Any, cast
+
+from loguru import logger
+from sqlalchemy import Table, bindparam, delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from app.models.schema_table import SchemaTable
+
+from app.ai.schema_retriever import SchemaDocument, SchemaIndex
+from app.config import settings
+from app.core.constants import (
+    LOW_CARDINALITY_MAX_DISTINCT,
+    SCHEMA_CONTEXT_CACHE_TTL_SECONDS,
+    SCHEMA_CONTEXT_LOCAL_CACHE_SIZE,
+    SCHEMA_PROFILE_RETRY_MAX_SECONDS,
+    SCHEMA_PROFILE_RETRY_SECONDS,
+    SCHEMA_SAMPLE_CONCURRENCY,
+    SCHEMA_SAMPLE_TIMEOUT_SECONDS,
+    SCHEMA_UPSERT_BATCH_ROWS,
+)
 from app.models.schema_column import SchemaColumn
-from app.models.connection import Connection
-from loguru import logger
+from app.models.schema_table import SchemaTable
+from app.services.cache_service import CacheService
+from app.services.column_profiler import ColumnProfiler
+
+NO_SCHEMA_CONTEXT = "No schema metadata available. Please refresh the schema."
+
+# (connection id, schema version) -> retrieval index, most recently used last.
+_local_indexes: OrderedDict[tuple[str, str], SchemaIndex] = OrderedDict()
+
+# Core tables for the executemany UPDATEs matched on bindparams (ORM bulk
+# updates only match on the primary key).
+_TABLES_TABLE = cast(Table, SchemaTable.__table__)
+_COLUMNS_TABLE = cast(Table, SchemaColumn.__table__)
 
 
 class SchemaDiscoverer:
     """Introspects connected databases and builds schema context."""
 
-    async def get_schema_context(self, connection_id: str, db: AsyncSession) -> str:
-        """Build a text representation of the schema for AI prompts."""
-        result = await db.execute(
-            select(SchemaTable)
+    def __init__(self, profiler: ColumnProfiler | None = None, cache: CacheService | None = None):
+        self.profiler = profiler or ColumnProfiler()
+        self.cache = cache or CacheService()
+
+    async def get_schema_context(
+        self, connection_id: str, db: AsyncSession, question: str | None = None,
+    ) -> str:
+        """Text representation of the schema for AI prompts.
+
+        With *question*, only the most relevant tables (and their join
+        partners) are rendered, within ``SCHEMA_CONTEXT_TOKEN_BUDGET``; see
+        ``app.ai.schema_retriever``.  Without it, every table is rendered.
+        """
+        index = await self.get_schema_index(connection_id, db)
+        return self.render_schema_context(index, question)
+
+    @staticmethod
+    def render_schema_context(index: SchemaIndex | None, question: str | None = None) -> str:
+        """Prompt text for an index from ``get_schema_index`` (see ``get_schema_context``)."""
+        if index is None:
+            return NO_SCHEMA_CONTEXT
+        if question:
+            return index.select(question, settings.SCHEMA_CONTEXT_TOKEN_BUDGET)
+        return index.full_context()
+
+    @staticmethod
+    def is_full_schema(index: SchemaIndex | None) -> bool:
+        """Whether ``render_schema_context`` gives every question the same text."""
+        return index is None or index.fits(settings.SCHEMA_CONTEXT_TOKEN_BUDGET)
+
+    async def get_schema_index(self, connection_id: str, db: AsyncSession) -> SchemaIndex | None:
+        """Rendered tables of a connection, cached per schema version.
+
+        The version token lives in Redis and is bumped whenever discovery or
+        enrichment changes the metadata (``invalidate_schema_context``), so a
+        warm lookup is one Redis GET plus an in-process LRU hit and no app-DB
+        reads.  Without Redis the tables are loaded on every call.  ``None``
+        when nothing has been discovered yet.
+        """
+        connection_id = str(connection_id)
+        version = await self.cache.get_version(f"schema:{connection_id}")
+        if version is None:
+            documents = await self.load_schema_documents(connection_id, db)
+            return SchemaIndex(documents) if documents else None
+
+        local_key = (connection_id, version)
+        index = _local_indexes.get(local_key)
+        if index is not None:
+            _local_indexes.move_to_end(local_key)
+            return index
+
+        redis_key = f"schema_documents:{connection_id}:{version}"
+        cached = await self.cache.get(redis_key)
+        if cached is not None:
+            documents = [SchemaDocument.from_dict(doc) for doc in cached["documents"]]
+        else:
+            documents = await self.load_schema_documents(connection_id, db)
+            if not documents:
+                return None  # Nothing discovered yet; don't pin the empty schema.
+            await self.cache.set(
+                redis_key, {"documents": [doc.to_dict() for doc in documents]},
+                ttl_seconds=SCHEMA_CONTEXT_CACHE_TTL_SECONDS,
+            )
+
+        index = _local_indexes[local_key] = SchemaIndex(documents)
+        while len(_local_indexes) > SCHEMA_CONTEXT_LOCAL_CACHE_SIZE:
+            _local_indexes.popitem(last=False)
+        return index
+
+    async def invalidate_schema_context(self, connection_id: str) -> None:
+        """Call after committing schema metadata changes (discovery, enrichment)."""
+        await self.cache.bump_version(f"schema:{connection_id}")
+
+    async def load_schema_documents(
+        self, connection_id: str, db: AsyncSession,
+    ) -> list[SchemaDocument]:
+        """Render every table from the app DB (plain rows, no ORM objects)."""
+        tables = (await db.execute(
+            select(
+                SchemaTable.id, SchemaTable.table_name, SchemaTable.ai_description,
+                SchemaTable.row_count,
+            )
+            .where(SchemaTable.connection_id == connection_id)
+            # Stable order: full_context(), rank()'s fallback and the cached prompt prefix follow it
+            .order_by(SchemaTable.table_name)
+        )).all()
+
+        columns_by_table: dict[Any, list] = {}
+        for col in await db.execute(
+            select(
+                SchemaColumn.schema_table_id, SchemaColumn.column_name, SchemaColumn.data_type,
+                SchemaColumn.is_primary_key, SchemaColumn.is_foreign_key,
+                SchemaColumn.fk_references, SchemaColumn.distinct_count,
+                SchemaColumn.null_percentage, SchemaColumn.ai_business_term,
+                SchemaColumn.ai_description, SchemaColumn.sample_values,
+            )
+            .join(SchemaTable, SchemaColumn.schema_table_id == SchemaTable.id)
             .where(SchemaTable.connection_id == connection_id)
-            .options(selectinload(SchemaTable.columns))
+            .order_by(SchemaColumn.schema_table_id, SchemaColumn.ordinal_position)
+        ):
+            columns_by_table.setdefault(col.schema_table_id, []).append(col)
+
+        return [_render_table(table, columns_by_table.get(table.id, [])) for table in tables]
+
+    async def discover_schema(
+        self, connection_id: str, connector, db: AsyncSession,
+        tables: Collection[str] | None = None,
+    ) -> dict:
+        """Introspect a database and sync its schema metadata.
+
+        Existing metadata is loaded in one query and diffed in memory; new and
+        changed rows are written with batched ``INSERT ... ON CONFLICT`` and
+        vanished tables/columns are deleted.  AI enrichment on unchanged rows
+        is preserved.  With *tables*, only those names are introspected and
+        synced (a listed table missing from the database is removed).
+        Returns a summary of what changed.
+        """
+        # One bulk catalog pass where the driver supports it (see introspect_schema).
+        schema = await connector.introspect_schema(tables)
+        now = datetime.now(timezone.utc)
+
+        table_query = select(
+            SchemaTable.id, SchemaTable.table_name, SchemaTable.table_type, SchemaTable.row_count,
+            SchemaTable.profile_failures,
+            _profile_due(now).label("profile_due"),
+            (SchemaTable.profile_retry_at > now).label("profile_backoff"),
+        ).where(SchemaTable.connection_id == connection_id)
+        column_query = select(
+            SchemaColumn.id, SchemaColumn.schema_table_id, SchemaColumn.column_name,
+            SchemaColumn.distinct_count,
+            *(getattr(SchemaColumn, field) for field in _COLUMN_FIELDS),
+        ).join(SchemaTable, SchemaColumn.schema_table_id == SchemaTable.id).where(
+            SchemaTable.connection_id == connection_id
+        )
+        if tables is not None:
+            table_query = table_query.where(SchemaTable.table_name.in_(list(tables)))
+            column_query = column_query.where(SchemaTable.table_name.in_(list(tables)))
+        existing_tables = {row.table_name: row for row in await db.execute(table_query)}
+        existing_columns: dict[tuple, Any] = {
+            (row.schema_table_id, row.column_name): row for row in await db.execute(column_query)
+        }
+
+        # ── Tables ──
+        live_names = {entry.table.name for entry in schema}
+        removed_tables = [row for name, row in existing_tables.items() if name not in live_names]
+        table_rows = [
+            {
+                "id": uuid.uuid4(),
+                "connection_id": connection_id,
+                "table_name": entry.table.name,
+                "table_type": entry.table.table_type,
+                "row_count": entry.table.row_count,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for entry in schema
+            if (existing := existing_tables.get(entry.table.name)) is None
+            or (existing.table_type, existing.row_count)
+            != (entry.table.table_type, entry.table.row_count)
+        ]
+        table_ids = {name: row.id for name, row in existing_tables.items()}
+        for batch in _batches(table_rows):
+            insert_stmt = pg_insert(SchemaTable).values(batch)
+            upsert = insert_stmt.on_conflict_do_update(
+                constraint="uq_schema_table_conn_name",
+                set_={
+                    "table_type": insert_stmt.excluded.table_type,
+                    "row_count": insert_stmt.excluded.row_count,
+                    "updated_at": insert_stmt.excluded.updated_at,
+                },
+            ).returning(SchemaTable.id, SchemaTable.table_name)
+            table_ids.update({row.table_name: row.id for row in await db.execute(upsert)})
+
+        # ── Columns ──
+        column_rows, seen_columns = [], set()
+        new_by_table: dict[str, list[dict]] = {}
+        updated_columns = 0
+        for entry in schema:
+            table_id = table_ids[entry.table.name]
+            for col in entry.columns:
+                key = (table_id, col.name)
+                seen_columns.add(key)
+                values = {
+                    "data_type": col.data_type,
+                    "is_nullable": col.is_nullable,
+                    "is_primary_key": col.is_primary_key,
+                    "is_foreign_key": col.is_foreign_key,
+                    "fk_references": col.fk_references,
+                    "ordinal_position": col.ordinal_position,
+                }
+                existing = existing_columns.get(key)
+                if existing is not None:
+                    stored = tuple(getattr(existing, field) for field in _COLUMN_FIELDS)
+                    if stored == tuple(values.values()):
+                        continue
+                    updated_columns += 1
+                row = {
+                    "id": uuid.uuid4(),
+                    "schema_table_id": table_id,
+                    "column_name": col.name,
+                    **values,
+                    "sample_values": None,  # Existing columns keep theirs (not in the upsert SET).
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                column_rows.append(row)
+                if existing is None:
+                    new_by_table.setdefault(entry.table.name, []).append(row)
+
+        tables_by_name = {entry.table.name: entry.table for entry in schema}
+        samples = await self._collect_samples(
+            connector, [(tables_by_name[name], [row["column_name"] for row in rows])
+                        for name, rows in new_by_table.items()],
         )
-        tables = result.scalars().unique().all()
-
-        if not tables:
-            return "No schema metadata available. Please refresh the schema."
-
-        context_parts = []
-        for table in tables:
-            columns = table.columns
-
-            table_desc = f"### Table: {table.table_name}"
-            if table.ai_description:
-                table_desc += f"\nDescription: {table.ai_description}"
-            if table.row_count:
-                table_desc += f"\nRows: ~{table.row_count:,}"
-
-            col_lines = []
-            for col in columns:
-                line = f"  - {col.column_name} ({col.data_type})"
-                if col.is_primary_key:
-                    line += " [PK]"
-                if col.is_foreign_key and col.fk_references:
-                    line += f" [FK → {col.fk_references}]"
-                if col.ai_business_term:
-                    line += f" — \"{col.ai_business_term}\""
-                elif col.ai_description:
-                    line += f" — {col.ai_description}"
-                if col.sample_values:
-                    samples = col.sample_values[:5] if isinstance(col.sample_values, list) else []
-                    if samples:
-                        line += f" (e.g., {', '.join(str(s) for s in samples)})"
-                col_lines.append(line)
-
-            context_parts.append(table_desc + "\n" + "\n".join(col_lines))
-
-        return "\n\n".join(context_parts)
-
-    async def discover_schema(self, connection_id: str, connector, db: AsyncSession) -> None:
-        """Introspect a database and store schema metadata."""
-        tables = await connector.get_tables()
-
-        for table_info in tables:
-            # Upsert table
-            result = await db.execute(
-                select(SchemaTable).where(
-                    SchemaTable.connection_id == connection_id,
-                    SchemaTable.table_name == table_info.name,
-                )
+        for name, rows in new_by_table.items():
+            table_samples = samples.get(name, {})
+            for row in rows:
+                row["sample_values"] = [
+                    value if isinstance(value, str | int | float | bool) else str(value)
+                    for value in table_samples.get(row["column_name"], [])
+                ]  # JSONB: Decimal, datetime, bytes... are stored as text.
+
+        for batch in _batches(column_rows):
+            stmt = pg_insert(SchemaColumn).values(batch)
+            await db.execute(stmt.on_conflict_do_update(
+                constraint="uq_schema_col_table_name",
+                set_={field: stmt.excluded[field] for field in (*_COLUMN_FIELDS, "updated_at")},
+            ))
+
+        # ── Profiles ── (tables that are new, changed size, or are due a first
+        # or retried profile; a table that failed waits out its backoff)
+        changed_tables = {
+            row["table_name"] for row in table_rows
+            if not getattr(existing_tables.get(row["table_name"]), "profile_backoff", False)
+        }
+        unprofiled = {
+            table_id
+            for (table_id, _), row in existing_columns.items()
+            if row.distinct_count is None
+        }
+        due = {row.id for row in existing_tables.values() if row.profile_due}
+        to_profile = [
+            (entry.table, [col.name for col in entry.columns])
+            for entry in schema
+            if entry.columns and (
+                entry.table.name in changed_tables
+                or entry.table.name in new_by_table
+                or table_ids[entry.table.name] in unprofiled & due
             )
-            schema_table = result.scalar_one_or_none()
-
-            if not schema_table:
-                schema_table = SchemaTable(
-                    connection_id=connection_id,
-                    table_name=table_info.name,
-                    table_type=table_info.table_type,
-                    row_count=table_info.row_count,
-                )
-                db.add(schema_table)
-                await db.flush()
-            else:
-                schema_table.row_count = table_info.row_count
-
-            # Get columns
-            columns = await connector.get_columns(table_info.name)
-            for col_info in columns:
-                col_result = await db.execute(
-                    select(SchemaColumn).where(
-                        SchemaColumn.schema_table_id == schema_table.id,
-                        SchemaColumn.column_name == col_info.name,
-                    )
-                )
-                schema_col = col_result.scalar_one_or_none()
-
-                if not schema_col:
-                    # Sample values
-                    try:
-                        samples = await connector.get_sample_values(
-                            table_info.name, col_info.name, limit=10
-                        )
-                    except Exception:
-                        samples = []
-
-                    schema_col = SchemaColumn(
-                        schema_table_id=schema_table.id,
-                        column_name=col_info.name,
-                        data_type=col_info.data_type,
-                        is_nullable=col_info.is_nullable,
-                        is_primary_key=col_info.is_primary_key,
-                        is_foreign_key=col_info.is_foreign_key,
-                        fk_references=col_info.fk_references,
-                        ordinal_position=col_info.ordinal_position,
-                        sample_values=samples,
+        ]
+        profiles = await self.profiler.profile(connector, to_profile)
+        profile_params = [
+            {
+                "_table_id": table_ids[table_name],
+                "_column": column,
+                "distinct_count": stats.distinct_count,
+                "null_percentage": (
+                    None if stats.null_fraction is None else round(stats.null_fraction * 100, 2)
+                ),
+            }
+            for table_name, columns in profiles.items() if columns is not None
+            for column, stats in columns.items()
+        ]
+        if profile_params:
+            await db.execute(
+                update(_COLUMNS_TABLE)
+                .where(_COLUMNS_TABLE.c.schema_table_id == bindparam("_table_id"))
+                .where(_COLUMNS_TABLE.c.column_name == bindparam("_column"))
+                .values(
+                    distinct_count=bindparam("distinct_count"),
+                    null_percentage=bindparam("null_percentage"),
+                ),
+                profile_params,
+            )
+        attempt_params = []
+        for table_name, columns in profiles.items():
+            failures = 0
+            if columns is None:
+                previous = existing_tables.get(table_name)
+                failures = (previous.profile_failures if previous else 0) + 1
+            attempt_params.append({
+                "_table_id": table_ids[table_name],
+                "profiled_at": now,
+                "profile_failures": failures,
+                "profile_retry_at": now + _profile_backoff(failures) if failures else None,
+            })
+        if attempt_params:
+            await db.execute(
+                update(_TABLES_TABLE)
+                .where(_TABLES_TABLE.c.id == bindparam("_table_id"))
+                .values(
+                    profiled_at=bindparam("profiled_at"),
+                    profile_failures=bindparam("profile_failures"),
+                    profile_retry_at=bindparam("profile_retry_at"),
+                ),
+                attempt_params,
+            )
+
+        # ── Removals ── (columns of removed tables go with them via ON DELETE CASCADE)
+        removed_table_ids = {row.id for row in removed_tables}
+        removed_column_ids = [
+            row.id for key, row in existing_columns.items()
+            if key not in seen_columns and row.schema_table_id not in removed_table_ids
+        ]
+        for ids in _batches(removed_column_ids):
+            await db.execute(delete(SchemaColumn).where(SchemaColumn.id.in_(ids)))
+        for ids in _batches(list(removed_table_ids)):
+            await db.execute(delete(SchemaTable).where(SchemaTable.id.in_(ids)))
+
+        summary = {
+            "tables": len(schema),
+            "new_tables": sorted(live_names - existing_tables.keys()),
+            "removed_tables": sorted(row.table_name for row in removed_tables),
+            "new_columns": sum(len(rows) for rows in new_by_table.values()),
+            "updated_columns": updated_columns,
+            "removed_columns": len(removed_column_ids),
+            "profiled_tables": len(to_profile),
+            "failed_profiles": sum(columns is None for columns in profiles.values()),
+        }
+        logger.info(f"Schema discovery complete for connection {connection_id}: {summary}")
+        return summary
+
+    async def refresh_row_counts(self, connection_id: str, connector, db: AsyncSession) -> int:
+        """Store the catalog's row estimates (``reltuples``, ``TABLE_ROWS``,
+        ``sqlite_stat1``) for every known table in one bulk UPDATE.
+
+        Tables whose definition is unchanged skip rediscovery, so this keeps
+        their sizes current for the prompt, sampling and profiling.  Returns
+        how many counts changed.
+        """
+        estimates = {table.name: table.row_count for table in await connector.get_tables()}
+        stored = (await db.execute(
+            select(SchemaTable.table_name, SchemaTable.row_count)
+            .where(SchemaTable.connection_id == connection_id)
+        )).all()
+        params = [
+            {"_name": name, "row_count": estimates[name]}
+            for name, row_count in stored
+            if estimates.get(name) is not None and estimates[name] != row_count
+        ]
+        if params:
+            await db.execute(
+                update(_TABLES_TABLE)
+                .where(_TABLES_TABLE.c.connection_id == connection_id)
+                .where(_TABLES_TABLE.c.table_name == bindparam("_name"))
+                .values(row_count=bindparam("row_count"), updated_at=datetime.now(timezone.utc)),
+                params,
+            )
+        return len(params)
+
+    async def unprofiled_tables(self, connection_id: str, db: AsyncSession) -> set[str]:
+        """Tables with columns lacking stats that are due a profile: never
+        attempted, or failed and past their backoff.  A table profiled without
+        error is not retried; its missing stats are what the database had."""
+        result = await db.execute(
+            select(SchemaTable.table_name).distinct()
+            .join(SchemaColumn, SchemaColumn.schema_table_id == SchemaTable.id)
+            .where(SchemaTable.connection_id == connection_id)
+            .where(SchemaColumn.distinct_count.is_(None))
+            .where(_profile_due(datetime.now(timezone.utc)))
+        )
+        return set(result.scalars())
+
+    @staticmethod
+    async def _collect_samples(
+        connector, columns_by_table: list[tuple],
+    ) -> dict[str, dict[str, list]]:
+        """Sample values for new columns: one bounded read per table, a few tables at a time.
+
+        A table that fails or exceeds ``SCHEMA_SAMPLE_TIMEOUT_SECONDS`` just
+        gets no samples.
+        """
+        semaphore = asyncio.Semaphore(SCHEMA_SAMPLE_CONCURRENCY)
+
+        async def sample(table, columns):
+            async with semaphore:
+                try:
+                    return table.name, await asyncio.wait_for(
+                        connector.get_table_samples(table, columns, limit=10),
+                        timeout=SCHEMA_SAMPLE_TIMEOUT_SECONDS,
                     )
-                    db.add(schema_col)
+                except Exception as e:
+                    logger.warning(f"Sampling {table.name} failed: {e!r}")
+                    return table.name, {}
+
+        return dict(await asyncio.gather(
+            *(sample(table, columns) for table, columns in columns_by_table)
+        ))
+
+
+def _render_table(table, columns: list) -> SchemaDocument:
+    table_desc = f"### Table: {table.table_name}"
+    if table.ai_description:
+        table_desc += f"\nDescription: {table.ai_description}"
+    if table.row_count:
+        table_desc += f"\nRows: ~{table.row_count:,}"
+
+    col_lines, compact_cols, search_terms, fk_tables = [], [], [], []
+    for col in columns:
+        line = f"  - {col.column_name} ({col.data_type})"
+        compact = f"{col.column_name} {col.data_type}"
+        if col.is_primary_key:
+            line += " [PK]"
+            compact += " PK"
+        if col.is_foreign_key and col.fk_references:
+            line += f" [FK → {col.fk_references}]"
+            compact += f" →{col.fk_references}"
+            fk_tables.append(col.fk_references.rsplit(".", 1)[0])
+        if col.distinct_count is not None and col.distinct_count <= LOW_CARDINALITY_MAX_DISTINCT:
+            line += f" [low cardinality: {col.distinct_count} values]"
+        elif col.distinct_count:
+            line += f" [~{col.distinct_count:,} distinct]"
+        if col.null_percentage:
+            line += f" [{col.null_percentage:g}% null]"
+        if col.ai_business_term:
+            line += f" — \"{col.ai_business_term}\""
+            search_terms.append(col.ai_business_term)
+        elif col.ai_description:
+            line += f" — {col.ai_description}"
+        if col.ai_description:
+            search_terms.append(col.ai_description)
+        if col.sample_values:
+            samples = col.sample_values[:5] if isinstance(col.sample_values, list) else []
+            if samples:
+                line += f" (e.g., {', '.join(str(s) for s in samples)})"
+                search_terms.extend(str(s) for s in samples if isinstance(s, str))
+        col_lines.append(line)
+        compact_cols.append(compact)
+
+    if table.ai_description:
+        search_terms.append(table.ai_description)
+    return SchemaDocument(
+        name=table.table_name,
+        full=table_desc + "\n" + "\n".join(col_lines),
+        compact=f"### {table.table_name}({', '.join(compact_cols)})",
+        search_text=" ".join(search_terms),
+        column_names=[col.column_name for col in columns],
+        fk_tables=sorted(set(fk_tables)),
+    )
+
+
+# Metadata compared against the live database; AI-written fields are not.
+_COLUMN_FIELDS = (
+    "data_type", "is_nullable", "is_primary_key", "is_foreign_key", "fk_references",
+    "ordinal_position",
+)
+
+
+def _profile_due(now: datetime):
+    """Never profiled, or a failed profile whose backoff has elapsed."""
+    return or_(SchemaTable.profiled_at.is_(None), SchemaTable.profile_retry_at <= now)
+
+
+def _profile_backoff(failures: int) -> timedelta:
+    """Exponential retry delay after *failures* consecutive profiling failures."""
+    seconds = SCHEMA_PROFILE_RETRY_SECONDS * 2 ** (failures - 1)
+    return timedelta(seconds=min(seconds, SCHEMA_PROFILE_RETRY_MAX_SECONDS))
+
 
-        await db.flush()
-        logger.info(f"Schema discovery complete for connection {connection_id}: {len(tables)} tables")
+def _batches(items: list, size: int = SCHEMA_UPSERT_BATCH_ROWS):
+    """Chunk bulk statements to stay well under the driver's bind-parameter limit."""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
@@ -1,14 +1,96 @@
-"""Per-org token budget enforcement and tracking."""
+"""Per-org token budget enforcement and tracking.
+
+On the chat path each org's counter lives in a Redis hash
+(``datamind:budget:{org_id}``: used, unsynced, budget, reset_at,
+analysis_mode), seeded from the ``Organization`` row on first use.  ``reserve``
+checks the budget and reserves an estimate in one Lua script -- rolling the
+month over when ``reset_at`` has passed -- and ``settle`` replaces the estimate
+with the real usage, so the hot path makes no app-DB round trips and never
+locks the org row.  Touched orgs are queued in a dirty set and ``sync_to_db``
+(a periodic Celery task) adds their ``unsynced`` tokens to
+``token_usage_current``.  Without Redis the service falls back to the row
+(``check_budget`` / ``record_usage``); since the sync adds rather than
+overwrites, usage charged there during an outage is kept.
+"""
 
 import calendar
+from dataclasses import dataclass
 from datetime import datetime, timezone, timedelta
+from typing import Optional
 
-from sqlalchemy import select
+import redis.asyncio as redis
+from sqlalchemy import case, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+from app.core.constants import TOKEN_BUDGET_RESERVE_TOKENS, TOKEN_BUDGET_SYNC_BATCH
+from app.core.metrics import metrics
 from app.models.organization import Organization, PLAN_TOKEN_BUDGETS
 from loguru import logger
 
+DIRTY_KEY = "datamind:budget:dirty"
+
+# KEYS: budget hash, dirty set.  ARGV: now, next reset (epoch seconds), tokens, org id.
+# Returns {status, used, budget, reset_at, analysis_mode}; status -1 = not seeded,
+# 0 = over budget, 1 = reserved.
+_RESERVE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return {-1} end
+if tonumber(ARGV[1]) >= tonumber(redis.call('HGET', KEYS[1], 'reset_at')) then
+  redis.call('HSET', KEYS[1], 'used', 0, 'unsynced', 0, 'reset_at', ARGV[2])
+  redis.call('SADD', KEYS[2], ARGV[4])
+end
+local used = tonumber(redis.call('HGET', KEYS[1], 'used'))
+local budget = tonumber(redis.call('HGET', KEYS[1], 'budget'))
+local fields = redis.call('HMGET', KEYS[1], 'reset_at', 'analysis_mode')
+if used >= budget then return {0, used, budget, fields[1], fields[2]} end
+redis.call('HINCRBY', KEYS[1], 'used', ARGV[3])
+redis.call('HINCRBY', KEYS[1], 'unsynced', ARGV[3])
+return {1, used, budget, fields[1], fields[2]}
+"""
+
+# KEYS: budget hash, dirty set.  ARGV: reserved, actual, reset_at seen at reserve, org id.
+# A reservation made before a month rollover was already wiped by it.
+_SETTLE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local delta = tonumber(ARGV[2])
+if redis.call('HGET', KEYS[1], 'reset_at') == ARGV[3] then delta = delta - tonumber(ARGV[1]) end
+redis.call('HINCRBY', KEYS[1], 'used', delta)
+redis.call('HINCRBY', KEYS[1], 'unsynced', delta)
+redis.call('SADD', KEYS[2], ARGV[4])
+return 1
+"""
+
+# KEYS: budget hash.  Returns {unsynced, reset_at} and zeroes unsynced; nil if missing.
+_TAKE_UNSYNCED_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return false end
+local fields = redis.call('HMGET', KEYS[1], 'unsynced', 'reset_at')
+redis.call('HSET', KEYS[1], 'unsynced', 0)
+return {tonumber(fields[1]) or 0, fields[2]}
+"""
+
+# KEYS: budget hash.  ARGV: field/value pairs.  Seeds a missing hash only.
+_SEED_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+# KEYS: budget hash.  ARGV: field/value pairs.  Updates an existing hash only.
+_UPDATE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+
+@dataclass
+class BudgetReservation:
+    """Tokens held for one chat message; pass to ``settle`` when it is done."""
+    org_id: str
+    tokens: int
+    reset_at: Optional[str]  # Period the tokens were reserved in; None = DB fallback
+    analysis_mode: Optional[str] = None
+
 
 class TokenBudgetExceeded(Exception):
     """Raised when an org has exhausted its monthly token budget."""
@@ -26,14 +108,138 @@ class TokenBudgetExceeded(Exception):
 class TokenBudgetService:
     """Checks and records per-org token usage against monthly budgets."""
 
-    async def check_budget(self, org_id: str, db: AsyncSession) -> None:
-        """Raise TokenBudgetExceeded if the org is over budget.
+    def __init__(self, redis_url: str = None):
+        self._redis_url = redis_url or settings.REDIS_URL
+        self._client: Optional[redis.Redis] = None
+
+    async def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(self._redis_url, decode_responses=True)
+        return self._client
+
+    async def close(self) -> None:
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    # ── Chat hot path (Redis) ───────────────────────────────────────
+
+    async def reserve(
+        self, org_id: str, db: AsyncSession, tokens: int = TOKEN_BUDGET_RESERVE_TOKENS,
+    ) -> BudgetReservation | None:
+        """Reserve *tokens* for a message, or raise TokenBudgetExceeded.
+
+        *db* is only used to seed the counter from the org row the first time
+        (or if Redis is down).  ``None`` when the org does not exist (fail-open).
+        """
+        try:
+            client = await self._get_client()
+            now = datetime.now(timezone.utc)
+            args = (int(now.timestamp()), int(_month_start(now, months=1).timestamp()), tokens, org_id)
+            keys = (_budget_key(org_id), DIRTY_KEY)
+            result = await client.eval(_RESERVE_LUA, 2, *keys, *args)
+            if result[0] == -1:
+                org = await self._get_org(org_id, db)
+                if org is None:
+                    return None
+                await self._reset_if_needed(org, db)
+                await client.eval(_SEED_LUA, 1, _budget_key(org_id), *_hash_fields(org))
+                result = await client.eval(_RESERVE_LUA, 2, *keys, *args)
+        except redis.RedisError as e:
+            metrics.incr("budget.redis_errors")
+            logger.warning(f"Token budget Redis error, using the database: {e}")
+            org = await self.check_budget(org_id, db)
+            return BudgetReservation(org_id, 0, None, org.analysis_mode) if org else None
+
+        status, used, budget, reset_at, analysis_mode = result
+        if status == 0:
+            raise TokenBudgetExceeded(org_id=org_id, used=used, budget=budget)
+        return BudgetReservation(org_id, tokens, reset_at, analysis_mode)
+
+    async def settle(self, reservation: BudgetReservation, tokens_used: int, db: AsyncSession) -> None:
+        """Replace a reservation with the tokens actually used (0 releases it)."""
+        if reservation.reset_at is not None:
+            try:
+                client = await self._get_client()
+                settled = await client.eval(
+                    _SETTLE_LUA, 2, _budget_key(reservation.org_id), DIRTY_KEY,
+                    reservation.tokens, tokens_used, reservation.reset_at, reservation.org_id,
+                )
+                if settled:
+                    return
+            except Exception as e:
+                metrics.incr("budget.redis_errors")
+                logger.warning(f"Token budget Redis error, using the database: {e}")
+        # Counter gone (evicted) or unreachable: charge the org row directly.
+        if tokens_used:
+            await self.record_usage(reservation.org_id, tokens_used, 0, db)
+
+    async def update_cached(self, org: Organization) -> None:
+        """Push admin changes (budget, analysis mode) to a seeded counter."""
+        try:
+            client = await self._get_client()
+            await client.eval(
+                _UPDATE_LUA, 1, _budget_key(str(org.id)),
+                "budget", org.token_budget_monthly, "analysis_mode", org.analysis_mode,
+            )
+        except Exception as e:
+            metrics.incr("budget.redis_errors")
+            logger.warning(f"Token budget Redis update error: {e}")
+
+    async def sync_to_db(self, db: AsyncSession) -> int:
+        """Add the tokens charged in Redis since the last sync to the rows of
+        the orgs touched since then.  Returns how many orgs were written.
+
+        The row is only ever added to, so usage ``record_usage`` charged to it
+        while Redis was unreachable survives the sync.  A row still in an
+        earlier period than the counter takes the counter's period and just
+        this period's usage.
+        """
+        client = await self._get_client()
+        synced = 0
+        while org_ids := await client.spop(DIRTY_KEY, TOKEN_BUDGET_SYNC_BATCH):
+            taken = {}
+            try:
+                for org_id in org_ids:
+                    result = await client.eval(_TAKE_UNSYNCED_LUA, 1, _budget_key(org_id))
+                    if result is None:
+                        continue
+                    delta, reset_at = result
+                    taken[org_id] = delta
+                    reset = datetime.fromtimestamp(int(reset_at), timezone.utc)
+                    rolled_over = Organization.budget_reset_at < reset
+                    await db.execute(
+                        update(Organization)
+                        .where(Organization.id == org_id)
+                        .where(Organization.budget_reset_at <= reset)  # Not a stale period
+                        .values(
+                            token_usage_current=case(
+                                (rolled_over, delta),
+                                else_=Organization.token_usage_current + delta,
+                            ),
+                            budget_reset_at=reset,
+                        )
+                    )
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                for org_id, delta in taken.items():  # Retry on the next run
+                    await client.hincrby(_budget_key(org_id), "unsynced", delta)
+                await client.sadd(DIRTY_KEY, *org_ids)
+                raise
+            synced += len(org_ids)
+        return synced
+
+    # ── Organization row ────────────────────────────────────────────
+
+    async def check_budget(self, org_id: str, db: AsyncSession) -> Organization | None:
+        """Raise TokenBudgetExceeded if the org is over budget, else return the org.
 
         Also resets the counter if the billing period has rolled over.
         """
         org = await self._get_org(org_id, db)
         if not org:
-            return  # Fail-open if org not found
+            return None  # Fail-open if org not found
 
         await self._reset_if_needed(org, db)
 
@@ -43,6 +249,7 @@ class TokenBudgetService:
                 used=org.token_usage_current,
                 budget=org.token_budget_monthly,
             )
+        return org
 
     async def record_usage(
         self,
@@ -73,27 +280,44 @@ class TokenBudgetService:
             return {"error": "Organization not found"}
 
         await self._reset_if_needed(org, db)
+        used, reset_at = await self._live_counter(org)
 
         return {
             "org_id": str(org.id),
             "plan": org.plan,
             "token_budget_monthly": org.token_budget_monthly,
-            "token_usage_current": org.token_usage_current,
+            "token_usage_current": used,
             "tokens_remaining": max(
-                0, org.token_budget_monthly - org.token_usage_current
+                0, org.token_budget_monthly - used
             ),
             "usage_percent": round(
-                (org.token_usage_current / org.token_budget_monthly) * 100, 1
+                (used / org.token_budget_monthly) * 100, 1
             )
             if org.token_budget_monthly > 0
             else 0,
-            "budget_reset_at": org.budget_reset_at.isoformat()
-            if org.budget_reset_at
+            "budget_reset_at": reset_at.isoformat()
+            if reset_at
             else None,
         }
 
     # ── Internal ────────────────────────────────────────────────────
 
+    async def _live_counter(self, org: Organization) -> tuple[int, datetime | None]:
+        """(used, reset_at) from Redis, which runs ahead of the periodic write-back."""
+        try:
+            client = await self._get_client()
+            used, reset_at = await client.hmget(_budget_key(str(org.id)), "used", "reset_at")
+        except Exception as e:
+            logger.warning(f"Token budget Redis read error: {e}")
+            used = None
+        if used is None:
+            return org.token_usage_current, org.budget_reset_at
+        now = datetime.now(timezone.utc)
+        reset = datetime.fromtimestamp(int(reset_at), timezone.utc)
+        if now >= reset:  # Rolled over; the next reserve resets the counter
+            return 0, _month_start(now, months=1)
+        return max(int(used), 0), reset
+
     async def _get_org(
         self, org_id: str, db: AsyncSession
     ) -> Organization | None:
@@ -126,3 +350,23 @@ class TokenBudgetService:
                 f"Reset token budget for org {org.id}, "
                 f"next reset: {next_reset.isoformat()}"
             )
+
+
+def _budget_key(org_id: str) -> str:
+    return f"datamind:budget:{org_id}"
+
+
+def _hash_fields(org: Organization) -> list:
+    return [
+        "used", org.token_usage_current,
+        "unsynced", 0,
+        "budget", org.token_budget_monthly,
+        "reset_at", int(org.budget_reset_at.timestamp()),
+        "analysis_mode", org.analysis_mode or "auto",
+    ]
+
+
+def _month_start(moment: datetime, months: int = 0) -> datetime:
+    """First instant (UTC) of the month *months* after *moment*'s."""
+    month_index = moment.year * 12 + moment.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
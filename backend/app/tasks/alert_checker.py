@@ -1,8 +1,10 @@
 """Celery task: periodic alert checking."""
 
 import asyncio
+from collections.abc import Sequence
 from datetime import datetime, timezone
 from decimal import Decimal, InvalidOperation
+from typing import Any
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -35,66 +37,61 @@ async def _check_single_alert(alert: Alert, db: AsyncSession) -> None:
             alert.last_checked_at = now
             return
 
-        # Get connector for the alert's connection
-        connector = await connection_manager.get_connector_internal(str(alert.connection_id), db)
-
-        try:
-            # Execute the alert's query
+        # Lease the pooled connector for the alert's connection and run the alert's query
+        lease = connection_manager.get_connector_internal(str(alert.connection_id), db)
+        async with lease as connector:
             result = await connector.execute_query(
                 sql=validation.get("parsed_sql", alert.query_sql),
                 timeout=30,
                 max_rows=1,
             )
 
-            if result.error:
-                logger.error(
-                    f"Alert {alert.id} ({alert.name}) query error: {result.error}"
-                )
-                alert.consecutive_failures += 1
-                alert.last_checked_at = now
-                return
+        if result.error:
+            logger.error(
+                f"Alert {alert.id} ({alert.name}) query error: {result.error}"
+            )
+            alert.consecutive_failures += 1
+            alert.last_checked_at = now
+            return
 
-            # Extract the first numeric value from results
-            value = _extract_numeric_value(result.rows)
-            if value is None:
-                logger.warning(
-                    f"Alert {alert.id} ({alert.name}): no numeric value in query result"
-                )
-                alert.consecutive_failures += 1
-                alert.last_checked_at = now
-                return
+        # Extract the first numeric value from results
+        value = _extract_numeric_value(result.rows)
+        if value is None:
+            logger.warning(
+                f"Alert {alert.id} ({alert.name}): no numeric value in query result"
+            )
+            alert.consecutive_failures += 1
+            alert.last_checked_at = now
+            return
 
-            # Compare against threshold
-            triggered = _evaluate_condition(
+        # Compare against threshold
+        triggered = _evaluate_condition(
+            condition_type=alert.condition_type,
+            value=value,
+            threshold=alert.threshold_value,
+            last_value=alert.last_value,
+        )
+
+        if triggered:
+            message = _build_trigger_message(
+                alert_name=alert.name,
                 condition_type=alert.condition_type,
                 value=value,
                 threshold=alert.threshold_value,
                 last_value=alert.last_value,
             )
+            event = AlertEvent(
+                alert_id=alert.id,
+                triggered_value=value,
+                message=message,
+            )
+            db.add(event)
+            logger.info(f"Alert {alert.id} ({alert.name}) TRIGGERED: {message}")
 
-            if triggered:
-                message = _build_trigger_message(
-                    alert_name=alert.name,
-                    condition_type=alert.condition_type,
-                    value=value,
-                    threshold=alert.threshold_value,
-                    last_value=alert.last_value,
-                )
-                event = AlertEvent(
-                    alert_id=alert.id,
-                    triggered_value=value,
-                    message=message,
-                )
-                db.add(event)
-                logger.info(f"Alert {alert.id} ({alert.name}) TRIGGERED: {message}")
-
-            # Update alert state
-            alert.last_value = value
-            alert.last_checked_at = now
-            alert.consecutive_failures = 0
-
-        finally:
-            await connector.close()
+        # Update alert state
+        alert.last_value = value
+        alert.last_checked_at = now
+        alert.consecutive_failures = 0
 
     except Exception as e:
         logger.error(f"Alert {alert.id} ({alert.name}) check failed: {e}")
@@ -102,7 +99,7 @@ async def _check_single_alert(alert: Alert, db: AsyncSession) -> None:
         alert.last_checked_at = now
 
 
-def _extract_numeric_value(rows: list[list]) -> Decimal | None:
+def _extract_numeric_value(rows: Sequence[Sequence[Any]]) -> Decimal | None:
     """Extract the first numeric value from query result rows."""
     if not rows or not rows[0]:
         return None
@@ -204,6 +201,9 @@ async def _run_alert_check_cycle() -> None:
             await db.rollback()
             logger.error(f"Alert check cycle failed: {e}")
             raise
+        finally:
+            # Pools are bound to this asyncio.run() loop; release them before it closes.
+            await connection_manager.close_all()
 
 
 @celery_app.task(name="app.tasks.alert_checker.check_alerts")
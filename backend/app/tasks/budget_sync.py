@@ -0,0 +1,32 @@
+"""Celery task: add Redis token budget usage to the organizations table.
+
+Chat messages account tokens in Redis only (see ``TokenBudgetService``); this
+keeps ``Organization.token_usage_current`` and ``budget_reset_at`` current for
+reporting and for re-seeding the counters if Redis loses them.
+"""
+
+import asyncio
+
+from app.tasks.celery_app import celery_app
+from app.core.database import async_session_factory, engine
+from app.services.token_budget_service import TokenBudgetService
+from loguru import logger
+
+
+async def _sync_token_budgets() -> int:
+    service = TokenBudgetService()
+    try:
+        async with async_session_factory() as db:
+            return await service.sync_to_db(db)
+    finally:
+        # Clients and pools are bound to this asyncio.run() loop.
+        await service.close()
+        await engine.dispose()
+
+
+@celery_app.task(name="app.tasks.budget_sync.sync_token_budgets")
+def sync_token_budgets():
+    """Persist token usage of every org that used tokens since the last run."""
+    synced = asyncio.run(_sync_token_budgets())
+    if synced:
+        logger.info(f"Synced token budget counters for {synced} organizations")
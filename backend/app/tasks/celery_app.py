@@ -7,7 +7,8 @@ celery_app = Celery(
     "datamind",
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL,
-    include=["app.tasks.alert_checker", "app.tasks.schema_refresh", "app.tasks.report_generator"],
+    include=["app.tasks.alert_checker", "app.tasks.schema_refresh", "app.tasks.report_generator",
+             "app.tasks.budget_sync"],
 )
 
 celery_app.conf.update(
@@ -23,7 +24,12 @@ celery_app.conf.update(
         },
         "refresh-schemas": {
             "task": "app.tasks.schema_refresh.refresh_all_schemas",
-            "schedule": 21600.0,  # Every 6 hours
+            # Cheap when nothing changed: unchanged schemas are skipped by fingerprint
+            "schedule": float(settings.SCHEMA_REFRESH_INTERVAL_SECONDS),
+        },
+        "sync-token-budgets": {
+            "task": "app.tasks.budget_sync.sync_token_budgets",
+            "schedule": float(settings.TOKEN_BUDGET_SYNC_INTERVAL_SECONDS),
         },
     },
 )
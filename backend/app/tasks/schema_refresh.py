@@ -1,16 +1,35 @@
-"""Celery task: periodic schema refresh for all active connections."""
+"""Celery task: periodic schema refresh for all active connections.
+
+Each connection is refreshed in its own DB session and transaction, under a
+timeout, with a bounded number running at once -- a slow warehouse only
+delays itself.  Connectors report a per-table digest of their catalog
+(``schema_fingerprint``); it is stored on the connection and only tables
+whose digest changed, or whose profiling never succeeded, are rediscovered.
+The catalog's row estimates for every table are refreshed in one bulk
+UPDATE, so an idle cycle costs two catalog queries per connection.  With
+``SCHEMA_REFRESH_FANOUT`` enabled the cycle instead enqueues one
+``refresh_connection_schema`` task per connection so the work spreads across
+Celery workers.  A per-connection Redis lock, held for the refresh timeout,
+skips a connection whose previous refresh (from an earlier cycle or another
+worker) is still running.
+"""
 
 import asyncio
+import uuid
 from datetime import datetime, timezone
 
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.tasks.celery_app import celery_app
-from app.core.database import async_session_factory
+from app.config import settings
+from app.core.constants import (
+    SCHEMA_REFRESH_CONCURRENCY,
+    SCHEMA_REFRESH_LOCK_SECONDS,
+    SCHEMA_REFRESH_TIMEOUT_SECONDS,
+)
+from app.core.database import async_session_factory, engine
+from app.core.exceptions import NotFoundError
 from app.models.connection import Connection
-from app.models.schema_table import SchemaTable
-from app.models.schema_column import SchemaColumn
 from app.services.connection_manager import ConnectionManager
 from app.services.schema_discoverer import SchemaDiscoverer
 from loguru import logger
@@ -19,124 +38,187 @@ connection_manager = ConnectionManager()
 schema_discoverer = SchemaDiscoverer()
 
 
-async def _refresh_single_connection(connection: Connection, db: AsyncSession) -> dict:
-    """Refresh schema for a single connection. Returns a summary dict."""
-    conn_id = str(connection.id)
+async def _refresh_single_connection(connection_id: str, connection_name: str) -> dict:
+    """Refresh one connection unless a refresh of it is already running."""
+    lock_key = f"schema_refresh:{connection_id}"
+    token = await schema_discoverer.cache.acquire_lock(lock_key, SCHEMA_REFRESH_LOCK_SECONDS)
+    if token is None:
+        logger.info(
+            f"Schema refresh for connection {connection_id} ({connection_name}) "
+            f"still running; skipped"
+        )
+        return {"connection_id": connection_id, "connection_name": connection_name, "skipped": True}
+    try:
+        return await _refresh_locked(connection_id, connection_name)
+    finally:
+        await schema_discoverer.cache.release_lock(lock_key, token)
+
+
+async def _refresh_locked(connection_id: str, connection_name: str) -> dict:
+    """Refresh schema for a single connection in its own session. Returns a summary dict."""
     summary = {
-        "connection_id": conn_id,
-        "connection_name": connection.name,
+        "connection_id": connection_id,
+        "connection_name": connection_name,
         "tables_before": 0,
         "tables_after": 0,
         "new_tables": [],
         "removed_tables": [],
+        "changed_tables": None,
+        "resized_tables": 0,
+        "skipped": False,
         "error": None,
     }
 
-    try:
-        # Count existing tables before refresh
-        existing_result = await db.execute(
-            select(SchemaTable).where(SchemaTable.connection_id == connection.id)
-        )
-        existing_tables = existing_result.scalars().all()
-        existing_table_names = {t.table_name for t in existing_tables}
-        summary["tables_before"] = len(existing_table_names)
-
-        # Get connector
-        connector = await connection_manager.get_connector(conn_id, db)
-
+    async with async_session_factory() as db:
         try:
-            # Introspect current schema from the live database
-            live_tables = await connector.get_tables()
-            live_table_names = {t.name for t in live_tables}
-
-            # Detect new tables
-            new_table_names = live_table_names - existing_table_names
-            summary["new_tables"] = list(new_table_names)
-
-            # Detect removed tables
-            removed_table_names = existing_table_names - live_table_names
-            summary["removed_tables"] = list(removed_table_names)
-
-            # Remove tables that no longer exist in the live database
-            for table in existing_tables:
-                if table.table_name in removed_table_names:
-                    await db.delete(table)
-
-            # Use the schema discoverer to upsert tables and columns
-            await schema_discoverer.discover_schema(conn_id, connector, db)
-
-            # Update connection's last_synced_at
-            connection.last_synced_at = datetime.now(timezone.utc)
+            # Pooled connector, leased from the registry and never closed here
+            lease = connection_manager.get_connector_internal(connection_id, db)
+            async with asyncio.timeout(SCHEMA_REFRESH_TIMEOUT_SECONDS), lease as connector:
+                connection = await db.get(Connection, uuid.UUID(connection_id))
+                if connection is None:
+                    raise NotFoundError(f"Connection {connection_id} not found")
+
+                # Rediscover only tables whose definition digest changed since the last
+                # run, plus those whose profiling failed or timed out before
+                fingerprint = await connector.schema_fingerprint()
+                previous = connection.schema_fingerprint
+                if fingerprint is not None and previous:
+                    changed = {
+                        name for name in fingerprint.keys() | previous.keys()
+                        if fingerprint.get(name) != previous.get(name)
+                    }
+                    unprofiled = await schema_discoverer.unprofiled_tables(connection_id, db)
+                    changed |= unprofiled & fingerprint.keys()
+                else:
+                    changed = None  # No usable fingerprint: full discovery
+
+                if changed is None or changed:
+                    # Diff the live schema against stored metadata and apply it in bulk
+                    changes = await schema_discoverer.discover_schema(
+                        connection_id, connector, db, tables=changed,
+                    )
+                    summary["new_tables"] = changes["new_tables"]
+                    summary["removed_tables"] = changes["removed_tables"]
+                if changed is not None:
+                    # Skipped tables still grow: keep their size estimates current
+                    summary["resized_tables"] = await schema_discoverer.refresh_row_counts(
+                        connection_id, connector, db,
+                    )
 
-            # Count tables after refresh
-            after_result = await db.execute(
-                select(SchemaTable).where(SchemaTable.connection_id == connection.id)
+                if fingerprint is not None:
+                    summary["tables_after"] = len(fingerprint)
+                else:
+                    summary["tables_after"] = changes["tables"]
+                summary["tables_before"] = (
+                    summary["tables_after"]
+                    - len(summary["new_tables"])
+                    + len(summary["removed_tables"])
+                )
+                summary["changed_tables"] = len(changed) if changed is not None else None
+
+                connection.schema_fingerprint = fingerprint
+                connection.last_synced_at = datetime.now(timezone.utc)
+                await db.commit()
+                if changed is None or changed or summary["resized_tables"]:
+                    await schema_discoverer.invalidate_schema_context(connection_id)
+
+        except TimeoutError:
+            await db.rollback()
+            summary["error"] = f"timed out after {SCHEMA_REFRESH_TIMEOUT_SECONDS}s"
+            logger.error(
+                f"Schema refresh timed out for connection {connection_id} ({connection_name})"
             )
-            after_tables = after_result.scalars().all()
-            summary["tables_after"] = len(after_tables)
-
-        finally:
-            await connector.close()
-
-    except Exception as e:
-        logger.error(f"Schema refresh failed for connection {conn_id} ({connection.name}): {e}")
-        summary["error"] = str(e)
+        except Exception as e:
+            await db.rollback()
+            logger.error(
+                f"Schema refresh failed for connection {connection_id} ({connection_name}): {e}"
+            )
+            summary["error"] = str(e)
 
+    _log_summary(summary)
     return summary
 
 
-async def _run_schema_refresh_cycle() -> None:
-    """Main async logic: query all active connections and refresh schemas."""
-    async with async_session_factory() as db:
-        try:
-            result = await db.execute(
-                select(Connection).where(Connection.is_active == True)
-            )
-            connections = result.scalars().all()
+def _log_summary(summary: dict) -> None:
+    name = summary["connection_name"]
+    if summary["new_tables"]:
+        logger.info(
+            f"Connection '{name}': {len(summary['new_tables'])} new tables: "
+            f"{', '.join(summary['new_tables'])}"
+        )
+    if summary["removed_tables"]:
+        logger.info(
+            f"Connection '{name}': {len(summary['removed_tables'])} removed tables: "
+            f"{', '.join(summary['removed_tables'])}"
+        )
+    if summary["error"]:
+        logger.warning(f"Connection '{name}': refresh failed: {summary['error']}")
 
-            if not connections:
-                logger.debug("No active connections to refresh")
-                return
 
-            logger.info(f"Refreshing schemas for {len(connections)} active connections")
+async def _active_connections() -> list[tuple[str, str]]:
+    """(id, name) of every active connection; the listing session closes right away."""
+    async with async_session_factory() as db:
+        result = await db.execute(
+            select(Connection.id, Connection.name).where(Connection.is_active == True)
+        )
+        return [(str(conn_id), name) for conn_id, name in result.all()]
 
-            summaries = []
-            for connection in connections:
-                summary = await _refresh_single_connection(connection, db)
-                summaries.append(summary)
 
-                if summary["new_tables"]:
-                    logger.info(
-                        f"Connection '{connection.name}': {len(summary['new_tables'])} new tables: "
-                        f"{', '.join(summary['new_tables'])}"
-                    )
-                if summary["removed_tables"]:
-                    logger.info(
-                        f"Connection '{connection.name}': {len(summary['removed_tables'])} removed tables: "
-                        f"{', '.join(summary['removed_tables'])}"
-                    )
-                if summary["error"]:
-                    logger.warning(
-                        f"Connection '{connection.name}': refresh failed: {summary['error']}"
-                    )
+async def _run_schema_refresh_cycle() -> None:
+    """Main async logic: refresh every active connection, a bounded number at a time."""
+    try:
+        connections = await _active_connections()
+        if not connections:
+            logger.debug("No active connections to refresh")
+            return
+
+        if settings.SCHEMA_REFRESH_FANOUT:
+            for conn_id, _ in connections:
+                refresh_connection_schema.delay(conn_id)
+            logger.info(f"Enqueued schema refresh for {len(connections)} active connections")
+            return
+
+        logger.info(f"Refreshing schemas for {len(connections)} active connections")
+        semaphore = asyncio.Semaphore(SCHEMA_REFRESH_CONCURRENCY)
+
+        async def refresh(conn_id: str, name: str) -> dict:
+            async with semaphore:
+                return await _refresh_single_connection(conn_id, name)
+
+        summaries = await asyncio.gather(*(refresh(conn_id, name) for conn_id, name in connections))
+
+        # Log overall summary
+        total_skipped = sum(1 for s in summaries if s["skipped"])
+        summaries = [s for s in summaries if not s["skipped"]]
+        total_ok = sum(1 for s in summaries if s["error"] is None)
+        total_err = sum(1 for s in summaries if s["error"] is not None)
+        total_new = sum(len(s["new_tables"]) for s in summaries)
+        total_removed = sum(len(s["removed_tables"]) for s in summaries)
+
+        logger.info(
+            f"Schema refresh cycle complete: {total_ok} succeeded, {total_err} failed, "
+            f"{total_skipped} still running, "
+            f"{total_new} new tables, {total_removed} removed tables"
+        )
+    finally:
+        await _release_pools()
 
-            await db.commit()
 
-            # Log overall summary
-            total_ok = sum(1 for s in summaries if s["error"] is None)
-            total_err = sum(1 for s in summaries if s["error"] is not None)
-            total_new = sum(len(s["new_tables"]) for s in summaries)
-            total_removed = sum(len(s["removed_tables"]) for s in summaries)
+async def _run_single_refresh(connection_id: str) -> dict:
+    try:
+        async with async_session_factory() as db:
+            connection = await db.get(Connection, uuid.UUID(connection_id))
+            name = connection.name if connection is not None else connection_id
+        return await _refresh_single_connection(connection_id, name)
+    finally:
+        await _release_pools()
 
-            logger.info(
-                f"Schema refresh cycle complete: {total_ok} succeeded, {total_err} failed, "
-                f"{total_new} new tables, {total_removed} removed tables"
-            )
 
-        except Exception as e:
-            await db.rollback()
-            logger.error(f"Schema refresh cycle failed: {e}")
-            raise
+async def _release_pools() -> None:
+    # Pools are bound to this asyncio.run() loop; release them before it closes.
+    await connection_manager.close_all()
+    await schema_discoverer.cache.close()
+    await engine.dispose()
 
 
 @celery_app.task(name="app.tasks.schema_refresh.refresh_all_schemas")
@@ -145,3 +227,9 @@ def refresh_all_schemas():
     logger.info("Running schema refresh cycle...")
     asyncio.run(_run_schema_refresh_cycle())
     logger.info("Schema refresh cycle complete")
+
+
+@celery_app.task(name="app.tasks.schema_refresh.refresh_connection_schema")
+def refresh_connection_schema(connection_id: str):
+    """Refresh schema metadata for one connection (fan-out target of the cycle)."""
+    return asyncio.run(_run_single_refresh(connection_id))
@@ -0,0 +1,83 @@
+"""SQLGenerator request shape and prompt-cache accounting (stub Anthropic client)."""
+
+from types import SimpleNamespace
+
+from app.ai.prompts import SYSTEM_PROMPT_SQL_GENERATION
+from app.ai.sql_generator import SQLGenerator
+from app.core.metrics import metrics
+
+
+class StubStream:
+    def __init__(self, text, usage):
+        self._text, self._usage = text, usage
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        yield self._text
+
+    async def get_final_message(self):
+        return SimpleNamespace(usage=self._usage)
+
+
+class StubClient:
+    def __init__(self, usage):
+        self.requests = []
+        self.usage = usage
+        messages = SimpleNamespace(stream=self._stream)
+        self.beta = SimpleNamespace(prompt_caching=SimpleNamespace(messages=messages))
+
+    def _stream(self, **kwargs):
+        self.requests.append(kwargs)
+        return StubStream("<reasoning>r</reasoning><sql>SELECT 1</sql>", self.usage)
+
+
+async def test_schema_prefix_sent_as_cached_block():
+    usage = SimpleNamespace(input_tokens=12, output_tokens=5,
+                            cache_creation_input_tokens=0, cache_read_input_tokens=3000)
+    client = StubClient(usage)
+    metrics.reset()
+
+    result = await SQLGenerator(client).generate(
+        user_message="revenue by month",
+        schema_context="### Table: orders",
+        conversation_history=[{"role": "user", "content": "hi"}],
+    )
+
+    request = client.requests[0]
+    instructions, schema = request["system"]
+    assert instructions["text"] == SYSTEM_PROMPT_SQL_GENERATION
+    assert instructions["cache_control"] == {"type": "ephemeral"}
+    assert "### Table: orders" in schema["text"]
+    assert schema["cache_control"] == {"type": "ephemeral"}
+    assert request["messages"][-1] == {"role": "user", "content": "revenue by month"}
+
+    assert result["sql"] == "SELECT 1"
+    assert result["token_usage"] == {
+        "input_tokens": 12, "output_tokens": 5,
+        "cache_creation_input_tokens": 0, "cache_read_input_tokens": 3000,
+    }
+    assert metrics.snapshot()["counters"]["llm.sql.cache_read_input_tokens"] == 3000
+
+
+async def test_schema_selection_follows_cached_instructions():
+    client = StubClient(SimpleNamespace(input_tokens=7, output_tokens=2))
+    generator = SQLGenerator(client)
+    await generator.generate("top customers", "### Table: customers", [], cache_schema=False)
+    await generator.generate("late shipments", "### Table: shipments", [], cache_schema=False)
+
+    first, second = (request["system"] for request in client.requests)
+    assert first[0] == second[0] and first[0]["cache_control"] == {"type": "ephemeral"}
+    assert "### Table: customers" in first[1]["text"]
+    assert "cache_control" not in first[1] and "cache_control" not in second[1]
+
+
+async def test_usage_without_cache_fields():
+    client = StubClient(SimpleNamespace(input_tokens=7, output_tokens=2))
+    result = await SQLGenerator(client).generate("q", "schema", [])
+    assert result["token_usage"]["cache_read_input_tokens"] == 0
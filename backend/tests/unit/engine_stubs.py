@@ -0,0 +1,42 @@
+"""Stand-ins for the AIEngine's collaborators, shared by the engine tests."""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+DELAY = 0.1
+
+
+class FakeSession:
+    async def commit(self):
+        pass
+
+
+@asynccontextmanager
+async def session_factory():
+    yield FakeSession()
+
+
+class SlowSchema:
+    async def get_schema_index(self, connection_id, db):
+        await asyncio.sleep(DELAY)
+        return None
+
+    def render_schema_context(self, index, question=None):
+        return f"schema for: {question}"
+
+    def is_full_schema(self, index):
+        return False
+
+
+class SlowHistory:
+    async def get_condensed_history(self, session_id, db, max_turns=10):
+        await asyncio.sleep(DELAY)
+        return [{"role": "user", "content": "earlier"}]
+
+
+def returns_sql(sql):
+    """A ``SQLGenerator.generate`` replacement that always answers *sql*."""
+    async def generate(user_message, schema_context, conversation_history, on_stream=None,
+                       cache_schema=True):
+        return {"sql": sql, "reasoning": "", "token_usage": {}}
+    return generate
@@ -0,0 +1,96 @@
+"""AIEngine: concurrent pre-LLM stages, per-stage timings and streamed events."""
+
+import time
+
+from app.core.metrics import StageTimer, metrics
+from app.services.ai_engine import AIEngine
+from tests.unit.engine_stubs import DELAY, SlowHistory, SlowSchema, returns_sql, session_factory
+
+
+class StubGenerator:
+    async def generate(self, user_message, schema_context, conversation_history, on_stream=None,
+                       cache_schema=True):
+        self.schema_context, self.cache_schema = schema_context, cache_schema
+        return {"sql": "NOT_DATA_QUERY", "reasoning": "hello", "token_usage": {}}
+
+
+def make_engine():
+    engine = AIEngine(
+        schema_provider=SlowSchema(), query_runner=None, sql_validator=None,
+        cache_provider=None, conversation_provider=SlowHistory(),
+        anthropic_client=object(), session_factory=session_factory,
+    )
+    engine.sql_generator = StubGenerator()
+    return engine
+
+
+async def test_history_and_schema_load_concurrently():
+    engine = make_engine()
+    metrics.reset()
+
+    start = time.perf_counter()
+    response = await engine.process_message("sales by month?", "conn", "sess", db=None)
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2 * DELAY
+    assert engine.sql_generator.schema_context == "schema for: earlier sales by month?"
+    assert engine.sql_generator.cache_schema is False  # A selection, not the full schema
+    assert set(response.stage_timings) == {"history", "schema", "generate"}
+    assert response.stage_timings["history"] >= DELAY * 1000 * 0.9
+    assert metrics.snapshot()["summaries"]["chat.stage.history_ms"]["count"] == 1
+
+
+async def test_caller_timer_collects_its_own_stages():
+    timer = StageTimer()
+    await make_engine().process_message("hi", "conn", "sess", db=None, timer=timer)
+    with timer.stage("persist"):
+        pass
+    assert {"history", "schema", "generate", "persist"} <= set(timer.as_dict())
+
+
+class StubValidator:
+    def validate(self, sql):
+        return {"is_safe": True}
+
+
+class MissCache:
+    async def get(self, key):
+        return None
+
+    async def set(self, key, value, ttl_seconds):
+        pass
+
+
+class StubRunner:
+    async def execute(self, connection_id, sql, db, timeout_seconds, max_rows, skip_validation=False):
+        data = {"columns": ["region", "revenue"], "rows": [["EU", 1], ["US", 2]], "row_count": 2}
+        return {"data": data, "error": None, "execution_time_ms": 12}
+
+
+class StubAnalyzer:
+    async def analyze(self, user_message, sql, result_data, on_stream=None):
+        await on_stream({"phase": "analyzing", "chunk": "US leads."})
+        return {"insight": "US leads.", "context_summary": "", "token_usage": {},
+                "chart_config": {"chart_type": "bar", "title": "Revenue"}}
+
+
+async def test_result_streams_before_analysis():
+    engine = AIEngine(
+        schema_provider=SlowSchema(), query_runner=StubRunner(), sql_validator=StubValidator(),
+        cache_provider=MissCache(), conversation_provider=SlowHistory(),
+        anthropic_client=object(), session_factory=session_factory,
+    )
+    engine.sql_generator.generate = returns_sql("SELECT region, revenue FROM sales")
+    engine.analyzer = StubAnalyzer()
+    events = []
+
+    async def on_stream(event):
+        events.append(event)
+
+    await engine.process_message("revenue by region", "conn", "sess", db=None, on_stream=on_stream)
+
+    assert [e.get("type", e.get("phase")) for e in events] == ["query_result", "analyzing", "chart_config"]
+    assert events[0]["query_result_preview"]["rows"] == [["EU", 1], ["US", 2]]
+    assert events[0]["execution_time_ms"] == 12
+    assert events[2]["chart_config"]["chart_type"] == "bar"
+
@@ -0,0 +1,48 @@
+"""Cache codec: lossless round-trips, compression threshold, legacy JSON."""
+
+import datetime as dt
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.connectors.base import QueryResult
+from app.services.cache_codec import FLAG_ZLIB, MsgpackCodec
+
+
+class TestMsgpackCodec:
+    def test_round_trips_rich_types(self):
+        value = {
+            "data": {
+                "columns": ["id", "amount", "at", "day", "span", "ref"],
+                "rows": [[1, Decimal("12.50"), dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc),
+                          dt.date(2024, 1, 2), dt.timedelta(hours=3), uuid.UUID(int=7)]],
+            },
+            "error": None,
+        }
+        codec = MsgpackCodec()
+        assert codec.decode(codec.encode(value)) == value
+
+    def test_row_views_encode_as_lists(self):
+        result = QueryResult.from_rows(["a", "b"], [(1, "x"), (2, None)], 0)
+        codec = MsgpackCodec()
+        assert codec.decode(codec.encode({"rows": result.rows})) == {"rows": [[1, "x"], [2, None]]}
+
+    def test_compresses_only_above_threshold(self):
+        codec = MsgpackCodec(compress_threshold=1024)
+        small = codec.encode({"rows": [[1, "a"]]})
+        large_value = {"rows": [[i, "region-name"] for i in range(2000)]}
+        large = codec.encode(large_value)
+
+        assert not small[3] & FLAG_ZLIB
+        assert large[3] & FLAG_ZLIB
+        assert len(large) < len(json.dumps(large_value)) / 3
+        assert codec.decode(large) == large_value
+
+    def test_reads_legacy_json_entries(self):
+        assert MsgpackCodec().decode(b'{"rows": [[1]]}') == {"rows": [[1]]}
+
+    def test_rejects_unknown_version(self):
+        with pytest.raises(ValueError):
+            MsgpackCodec().decode(b"DM\x09\x00")
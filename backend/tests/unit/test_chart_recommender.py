@@ -0,0 +1,69 @@
+"""Rule-based analysis of trivial query results."""
+
+import datetime as dt
+from decimal import Decimal
+
+from app.ai.chart_recommender import analyze_locally
+
+
+def data(columns, rows, **extra):
+    return {"columns": columns, "rows": rows, "row_count": len(rows), **extra}
+
+
+def test_empty_result():
+    analysis = analyze_locally("orders yesterday?", data(["id"], []))
+    assert analysis["chart_config"]["chart_type"] == "table"
+    assert "No rows" in analysis["insight"]
+    assert analysis["token_usage"] == {"input_tokens": 0, "output_tokens": 0}
+
+
+def test_scalar_is_kpi():
+    analysis = analyze_locally("total revenue?", data(["total_revenue"], [[Decimal("1234567.5")]]))
+    assert analysis["chart_config"] == {
+        "chart_type": "kpi", "value_column": "total_revenue", "title": "Total revenue",
+        "format": "currency",
+    }
+    assert analysis["insight"] == "Total revenue: 1.2M."
+
+
+def test_two_column_time_series_is_line():
+    rows = [["2024-03", 150], ["2024-01", 100], ["2024-02", 90]]
+    analysis = analyze_locally("orders by month", data(["month", "orders"], rows))
+    config = analysis["chart_config"]
+    assert (config["chart_type"], config["x_column"], config["y_column"]) == (
+        "line", "month", "orders",
+    )
+    assert "from 100 (2024-01) to 150 (2024-03) (+50.0%)" in analysis["insight"]
+    assert "lowest at 90 (2024-02)" in analysis["insight"]
+
+
+def test_dates_in_second_column():
+    rows = [[5, dt.date(2024, 1, 2)], [7, dt.date(2024, 1, 1)]]
+    config = analyze_locally("q", data(["signups", "day"], rows))["chart_config"]
+    assert (config["x_column"], config["y_column"]) == ("day", "signups")
+
+
+def test_complex_results_fall_back():
+    assert analyze_locally("q", data(["region", "revenue"], [["EU", 1], ["US", 2]])) is None
+    assert analyze_locally("q", data(["a", "b"], [[1, 2]])) is None
+    assert analyze_locally("q", data(["n"], [[1]], truncated=True)) is None
+
+
+def test_format_hints_match_whole_words():
+    def fmt(column):
+        return analyze_locally("q", data([column], [[3]]))["chart_config"]["format"]
+
+    assert fmt("churn_rate") == fmt("conversionRate") == fmt("tax_rates") == "percent"
+    assert fmt("unit_price") == fmt("total_sales") == "currency"
+    assert fmt("corporate_accounts") == fmt("generated_reports") == fmt("accurate_rows") == "number"
+
+
+def test_percent_scale_decided_per_column():
+    rows = [["2024-01", 0.8], ["2024-02", 1.5], ["2024-03", 1.2]]
+    insight = analyze_locally("growth", data(["month", "growth_rate"], rows))["insight"]
+    assert "from 0.8% (2024-01) to 1.2% (2024-03)" in insight
+    assert "peaked at 1.5% (2024-02)" in insight
+
+    rows = [["2024-01", 0.25], ["2024-02", 0.4]]
+    insight = analyze_locally("conversion", data(["month", "conversion_rate"], rows))["insight"]
+    assert "from 25.0% (2024-01) to 40.0% (2024-02)" in insight
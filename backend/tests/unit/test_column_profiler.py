@@ -0,0 +1,67 @@
+"""Column profiling: HyperLogLog accuracy and sampled scans."""
+
+import sqlite3
+
+from app.connectors.base import TableInfo
+from app.connectors.sqlite import SQLiteConnector
+from app.services.column_profiler import ColumnProfiler, HyperLogLog
+
+
+class TestHyperLogLog:
+    def test_exact_below_limit(self):
+        sketch = HyperLogLog()
+        for i in range(500):
+            sketch.add(i % 37)
+        assert sketch.count() == 37
+
+    def test_estimate_within_error_bound(self):
+        sketch = HyperLogLog()
+        for i in range(100_000):
+            sketch.add(f"user-{i}")
+        assert abs(sketch.count() - 100_000) / 100_000 < 0.05
+
+
+class TestColumnProfiler:
+    async def test_scans_when_catalog_has_no_stats(self, tmp_path):
+        path = tmp_path / "data.db"
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE events (id INTEGER, kind TEXT, note TEXT)")
+        conn.executemany(
+            "INSERT INTO events VALUES (?, ?, ?)",
+            [(i, ("click", "view", "buy")[i % 3], None if i % 4 else "x") for i in range(200)],
+        )
+        conn.commit()
+        conn.close()
+
+        connector = SQLiteConnector(str(path))
+        try:
+            stats = await ColumnProfiler().profile_table(
+                connector, TableInfo(name="events", table_type="table", row_count=200), ["id", "kind", "note"],
+            )
+        finally:
+            await connector.close()
+
+        assert stats["id"].distinct_count == 200
+        assert stats["kind"].distinct_count == 3
+        assert stats["note"].distinct_count == 1
+        assert stats["note"].null_fraction == 0.75
+        assert stats["kind"].null_fraction == 0
+
+    async def test_unique_columns_scale_past_the_sample(self, tmp_path):
+        path = tmp_path / "data.db"
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE t (id INTEGER, flag INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, i % 2) for i in range(1000)])
+        conn.commit()
+        conn.close()
+
+        connector = SQLiteConnector(str(path))
+        try:
+            stats = await ColumnProfiler(sample_rows=100).profile_table(
+                connector, TableInfo(name="t", table_type="table", row_count=1000), ["id", "flag"],
+            )
+        finally:
+            await connector.close()
+
+        assert stats["id"].distinct_count == 1000
+        assert stats["flag"].distinct_count == 2
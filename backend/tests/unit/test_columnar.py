@@ -0,0 +1,45 @@
+"""Columnar result storage: typed buffers, null masks, zero-copy views."""
+
+from decimal import Decimal
+
+from app.connectors.base import QueryResult
+from app.connectors.columnar import ColumnarTable
+
+ROWS = [
+    (1, 1.5, "a", Decimal("1.10")),
+    (2, None, None, Decimal("2.20")),
+    (None, 3.5, "c", None),
+    (2 ** 70, 4.5, "d", Decimal("4.40")),
+]
+
+
+class TestColumnarTable:
+    def test_typed_buffers_and_null_masks(self):
+        table = ColumnarTable.from_rows(["id", "score", "name", "amount"], ROWS[:3])
+        ids, scores, names, amounts = table.columns
+
+        assert ids.is_typed and scores.is_typed
+        assert not names.is_typed and not amounts.is_typed
+        assert ids.to_list() == [1, 2, None]
+        assert scores.null_count == 1
+        assert list(scores.values()) == [1.5, 0.0, 3.5]  # NULL slot holds 0
+
+    def test_int_overflow_falls_back_to_objects(self):
+        table = ColumnarTable.from_rows(["id", "score", "name", "amount"], ROWS)
+        assert not table.column("id").is_typed
+        assert table.column("id")[3] == 2 ** 70
+
+    def test_row_view_slicing_is_zero_copy(self):
+        result = QueryResult.from_rows(["id", "score", "name", "amount"], ROWS[:3], 5)
+        preview = result.rows[1:]
+
+        assert preview.table.columns[0]._data is result.table.columns[0]._data
+        assert len(preview) == 2
+        assert preview == [[2, None, None, Decimal("2.20")], [None, 3.5, "c", None]]
+        assert result.rows[-1] == [None, 3.5, "c", None]
+        assert result.slice(0, 1).row_count == 1
+
+    def test_empty_result(self):
+        result = QueryResult.from_rows(["id"], [], 0)
+        assert result.row_count == 0
+        assert list(result.rows) == []
@@ -0,0 +1,145 @@
+"""Connector registry unit tests: reuse, credential rotation, eviction."""
+
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.connectors.base import BaseConnector, QueryResult
+from app.core.exceptions import DataMindConnectionError
+from app.services.cache_service import CacheService
+from app.services.connection_manager import ConnectionSpec, ConnectorRegistry
+
+
+class FakeConnector(BaseConnector):
+    def __init__(self, spec: ConnectionSpec):
+        self.spec = spec
+        self.closed = False
+
+    async def test_connection(self) -> bool:
+        return True
+
+    async def get_tables(self):
+        return []
+
+    async def get_columns(self, table_name: str):
+        return []
+
+    async def execute_query(self, sql: str, timeout: int = 30, max_rows: int = 10000):
+        return QueryResult(columns=["n"], rows=[[1]], row_count=1, execution_time_ms=0)
+
+    async def get_sample_values(self, table: str, column: str, limit: int = 10) -> list:
+        return []
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def make_spec(connection_id: str = "c1", password: str = "pw") -> ConnectionSpec:
+    return ConnectionSpec(
+        connection_id=connection_id, org_id="o1", name="Test", conn_type="postgresql",
+        is_active=True, host="db", port=5432, database="app", username="ro", password=password,
+    )
+
+
+async def factory(spec: ConnectionSpec) -> FakeConnector:
+    return FakeConnector(spec)
+
+
+def make_cache(server: fakeredis.FakeServer | None = None) -> CacheService:
+    cache = CacheService()
+    cache._client = fakeredis.FakeAsyncRedis(server=server or fakeredis.FakeServer())
+    return cache
+
+
+def make_registry(**kwargs) -> ConnectorRegistry:
+    return ConnectorRegistry(cache=make_cache(), **kwargs)
+
+
+async def lease(registry: ConnectorRegistry, spec: ConnectionSpec) -> FakeConnector:
+    async with registry.lease(spec, factory) as connector:
+        return connector
+
+
+class TestConnectorRegistry:
+    async def test_reuses_connector_for_same_spec(self):
+        registry = make_registry()
+        first = await lease(registry, make_spec())
+        second = await lease(registry, make_spec())
+        assert first is second
+        assert len(registry) == 1
+
+    async def test_rebuilds_when_credentials_change(self):
+        registry = make_registry()
+        old = await lease(registry, make_spec(password="old"))
+        new = await lease(registry, make_spec(password="new"))
+        assert old is not new
+        assert old.closed is True
+        assert len(registry) == 1
+
+    async def test_replaced_connector_closes_on_its_last_release(self):
+        registry = make_registry()
+        async with registry.lease(make_spec(password="old"), factory) as old:
+            await lease(registry, make_spec(password="new"))
+            assert old.closed is False  # Still running a query
+        assert old.closed is True
+
+    async def test_invalidate_closes_connector_and_spec(self):
+        registry = make_registry()
+        spec = make_spec()
+        await registry.put_spec(spec)
+        connector = await lease(registry, spec)
+        await registry.invalidate("c1")
+        assert connector.closed is True
+        assert await registry.get_spec("c1") is None
+        assert len(registry) == 0
+
+    async def test_invalidate_reaches_other_replicas(self):
+        server = fakeredis.FakeServer()
+        here = ConnectorRegistry(cache=make_cache(server))
+        there = ConnectorRegistry(cache=make_cache(server))
+        await here.put_spec(make_spec())
+        await there.put_spec(make_spec())
+        await there.invalidate("c1")
+        assert await here.get_spec("c1") is None
+
+    async def test_idle_connectors_are_evicted(self):
+        registry = make_registry(idle_ttl=0)
+        stale = await lease(registry, make_spec("c1"))
+        await lease(registry, make_spec("c2"))
+        assert stale.closed is True
+        assert len(registry) == 1
+
+    async def test_cap_evicts_least_recently_used(self):
+        registry = make_registry(max_size=2)
+        c1 = await lease(registry, make_spec("c1"))
+        c2 = await lease(registry, make_spec("c2"))
+        await lease(registry, make_spec("c1"))  # c1 becomes most recent
+        await lease(registry, make_spec("c3"))
+        assert c2.closed is True
+        assert c1.closed is False
+        assert len(registry) == 2
+
+    async def test_cap_waits_for_a_leased_connector(self):
+        registry = make_registry(max_size=1)
+        async with registry.lease(make_spec("c1"), factory) as c1:
+            waiting = asyncio.create_task(lease(registry, make_spec("c2")))
+            await asyncio.sleep(0.01)
+            assert not waiting.done()
+            assert c1.closed is False
+        c2 = await waiting
+        assert c1.closed is True and c2.closed is False
+        assert len(registry) == 1
+
+    async def test_cap_gives_up_when_every_connector_stays_leased(self):
+        registry = make_registry(max_size=1, busy_timeout=0.01)
+        async with registry.lease(make_spec("c1"), factory):
+            with pytest.raises(DataMindConnectionError):
+                await lease(registry, make_spec("c2"))
+        assert len(registry) == 1
+
+    def test_fingerprint_ignores_non_credential_fields(self):
+        a = make_spec()
+        b = ConnectionSpec(**{**a.__dict__, "name": "Renamed", "extra_config": {"x": 1}})
+        assert a.fingerprint == b.fingerprint
+        assert a.fingerprint != make_spec(password="other").fingerprint
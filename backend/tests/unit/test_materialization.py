@@ -0,0 +1,84 @@
+"""File materialization cache: reuse, rebuild on change, stale cleanup."""
+
+import os
+import sqlite3
+
+from app.connectors.csv_connector import CSVConnector
+from app.connectors.materialization import materialize
+
+
+def write_csv(path, rows: int, mtime_ns: int) -> None:
+    path.write_text("id,value\n" + "".join(f"{i},{i * 10}\n" for i in range(rows)))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class TestMaterialization:
+    def test_reuses_database_until_source_changes(self, tmp_path):
+        src = tmp_path / "sales.csv"
+        write_csv(src, 3, 1_000_000_000)
+        calls = []
+
+        def loader(conn: sqlite3.Connection) -> None:
+            calls.append(1)
+            conn.execute("CREATE TABLE t (x INTEGER)")
+
+        first = materialize(str(src), loader)
+        assert materialize(str(src), loader) == first
+        assert len(calls) == 1
+
+        write_csv(src, 5, 2_000_000_000)
+        second = materialize(str(src), loader)
+        assert second != first
+        assert len(calls) == 2
+        assert not os.path.exists(first)
+
+    async def test_csv_connector_picks_up_replaced_file(self, tmp_path):
+        src = tmp_path / "sales.csv"
+        write_csv(src, 3, 1_000_000_000)
+        connector = CSVConnector(str(src))
+        try:
+            result = await connector.execute_query("SELECT COUNT(*) FROM sales")
+            assert result.rows == [[3]]
+
+            write_csv(src, 7, 2_000_000_000)
+            result = await connector.execute_query("SELECT COUNT(*) FROM sales")
+            assert result.rows == [[7]]
+        finally:
+            await connector.close()
+
+    def test_cleanup_is_scoped_to_the_source_and_removes_sidecars(self, tmp_path):
+        src, other = tmp_path / "sales.csv", tmp_path / "sales.csv.bak.csv"
+        write_csv(src, 3, 1_000_000_000)
+        write_csv(other, 3, 1_000_000_000)
+
+        def loader(conn: sqlite3.Connection) -> None:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+
+        first, sibling = materialize(str(src), loader), materialize(str(other), loader)
+        for suffix in ("-wal", "-shm"):
+            open(first + suffix, "w").close()
+
+        write_csv(src, 5, 2_000_000_000)
+        materialize(str(src), loader)
+        assert os.path.exists(sibling)
+        assert not any(os.path.exists(first + suffix) for suffix in ("", "-wal", "-shm", ".lock"))
+
+    async def test_replaced_materialization_closes_after_in_flight_query(self, tmp_path):
+        src = tmp_path / "sales.csv"
+        write_csv(src, 3, 1_000_000_000)
+        connector = CSVConnector(str(src))
+        try:
+            stream = connector.stream_query("SELECT * FROM sales", batch_size=1)
+            await anext(stream)  # Query in flight on the first materialization
+            old = connector._sqlite
+
+            write_csv(src, 7, 2_000_000_000)
+            result = await connector.execute_query("SELECT COUNT(*) FROM sales")
+            assert result.rows == [[7]]
+            assert connector._retired == {old} and not old._closed
+
+            remaining = [batch async for batch in stream]
+            assert len(remaining) == 2
+            assert connector._retired == set() and old._closed
+        finally:
+            await connector.close()
@@ -0,0 +1,118 @@
+"""Row caps: QueryExecutor pushes LIMIT down in the dialect, connectors fetch no more."""
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from app.connectors.base import QueryResult
+from app.connectors.postgres import PostgreSQLConnector
+from app.services.connection_manager import ConnectionSpec
+from app.services.query_executor import QueryExecutor
+
+
+class RecordingConnector:
+    """Returns *available* rows (capped by ``max_rows``) and records the SQL it receives."""
+
+    def __init__(self, available: int):
+        self.available = available
+        self.calls = []
+
+    async def execute_query(self, sql: str, timeout: int = 30, max_rows: int = 10000):
+        self.calls.append((sql, max_rows))
+        rows = [[i] for i in range(min(self.available, max_rows))]
+        return QueryResult(columns=["name"], rows=rows, row_count=len(rows), execution_time_ms=1)
+
+
+class StubManager:
+    def __init__(self, conn_type: str, connector: RecordingConnector):
+        self.connector = connector
+        self.spec = ConnectionSpec(
+            connection_id="c1", org_id="o1", name="Test", conn_type=conn_type, is_active=True,
+            extra_config={"preflight": {"enabled": False}},
+        )
+
+    async def get_spec(self, connection_id, db):
+        return self.spec
+
+    @asynccontextmanager
+    async def get_connector_internal(self, connection_id, db):
+        yield self.connector
+
+
+async def run(conn_type: str, sql: str, available: int, **kwargs):
+    connector = RecordingConnector(available)
+    result = await QueryExecutor(StubManager(conn_type, connector)).execute(
+        "c1", sql, db=None, max_rows=3, **kwargs,
+    )
+    return result, connector.calls
+
+
+async def test_over_limit_result_is_trimmed_and_flagged():
+    result, calls = await run("mysql", 'SELECT "name" FROM customers', available=10)
+
+    assert calls == [("SELECT `name` FROM customers LIMIT 4", 4)]
+    assert result["error"] is None
+    assert result["data"]["truncated"] is True
+    assert result["data"]["row_count"] == 3
+    assert list(result["data"]["rows"]) == [[0], [1], [2]]
+
+
+async def test_result_within_limit_is_not_truncated():
+    result, calls = await run("postgresql", "SELECT name FROM customers LIMIT 2", available=2)
+
+    assert calls == [("SELECT name FROM customers LIMIT 2", 4)]  # Tighter LIMIT kept
+    assert result["data"]["truncated"] is False
+    assert result["data"]["row_count"] == 2
+
+
+async def test_prevalidated_set_operation_is_parsed_and_wrapped():
+    _, calls = await run(
+        "sqlite", "SELECT name FROM a UNION SELECT name FROM b", available=0, skip_validation=True,
+    )
+
+    [(sql, _)] = calls
+    assert sql == "SELECT * FROM (SELECT name FROM a UNION SELECT name FROM b) AS _limited LIMIT 4"
+
+
+class FakeRecord(tuple):
+    def keys(self):
+        return ["n"]
+
+
+class FakePostgresConnection:
+    def __init__(self, available: int):
+        self.available = available
+        self.fetched = None
+
+    async def execute(self, sql):
+        pass
+
+    def transaction(self, readonly=False):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def cursor(self, sql):
+        return self
+
+    async def fetch(self, n):
+        self.fetched = n
+        return [FakeRecord((i,)) for i in range(min(n, self.available))]
+
+
+async def test_postgres_fetches_no_more_than_max_rows(monkeypatch):
+    conn = FakePostgresConnection(available=1_000)
+    pool = SimpleNamespace(acquire=lambda: conn)
+    connector = PostgreSQLConnector("h", 5432, "d", "u", "p")
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(connector, "_get_pool", get_pool)
+    result = await connector.execute_query("SELECT n FROM big", max_rows=4)
+
+    assert conn.fetched == 4
+    assert result.row_count == 4
@@ -0,0 +1,178 @@
+"""EXPLAIN pre-flight: SQLite plan estimates and the policy decisions."""
+
+import json
+import sqlite3
+
+import pytest
+import sqlglot
+
+from app.connectors.base import QueryPlan, QueryResult
+from app.connectors.mysql import MySQLConnector
+from app.connectors.postgres import PostgreSQLConnector
+from app.connectors.sqlite import SQLiteConnector
+from app.services.query_guard import PreflightPolicy, _over_limit, _sample
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "data.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, customer_id INTEGER)")
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO orders VALUES (?, ?)", [(i, i % 10) for i in range(200)])
+    conn.executemany("INSERT INTO customers VALUES (?, ?)", [(i, f"c{i}") for i in range(10)])
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+class TestSQLiteExplain:
+    async def test_cross_join_multiplies_scanned_tables(self, db_path):
+        connector = SQLiteConnector(db_path)
+        try:
+            plan = await connector.explain("SELECT * FROM orders o, customers c")
+        finally:
+            await connector.close()
+
+        assert plan.full_scans == ["customers", "orders"]
+        assert plan.estimated_rows == 2000
+
+    async def test_indexed_join_scans_one_table(self, db_path):
+        connector = SQLiteConnector(db_path)
+        try:
+            plan = await connector.explain(
+                "SELECT * FROM orders o JOIN customers c ON c.id = o.customer_id"
+            )
+        finally:
+            await connector.close()
+
+        assert plan.full_scans == ["orders"]
+        assert plan.estimated_rows == 200
+
+    async def test_counts_only_scanned_tables(self, db_path, monkeypatch):
+        counted = []
+        count_rows = SQLiteConnector._count_rows
+
+        async def recording_count(self, conn, table, exact):
+            counted.append(table)
+            return await count_rows(self, conn, table, exact)
+
+        monkeypatch.setattr(SQLiteConnector, "_count_rows", recording_count)
+        connector = SQLiteConnector(db_path)
+        try:
+            await connector.explain(
+                "SELECT * FROM orders o JOIN customers c ON c.id = o.customer_id"
+            )
+        finally:
+            await connector.close()
+
+        assert counted == ["orders"]
+
+    async def test_slow_counts_leave_rows_unknown(self, db_path, monkeypatch):
+        async def endless_count(self, conn, table, exact):
+            cursor = await conn.execute(
+                "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 1e9) "
+                "SELECT count(*) FROM n"
+            )
+            return (await cursor.fetchone())[0]
+
+        monkeypatch.setattr(SQLiteConnector, "_count_rows", endless_count)
+        monkeypatch.setattr("app.connectors.sqlite.PREFLIGHT_EXPLAIN_TIMEOUT_SECONDS", 0.2)
+        connector = SQLiteConnector(db_path)
+        try:
+            plan = await connector.explain("SELECT * FROM orders")
+        finally:
+            await connector.close()
+
+        assert plan.full_scans == ["orders"]
+        assert plan.estimated_rows is None
+
+
+def canned_explain(connector, document):
+    async def execute_query(sql, timeout=30, max_rows=10000):
+        return QueryResult.from_rows(["plan"], [[json.dumps(document)]], 1)
+    connector.execute_query = execute_query
+    return connector
+
+
+class TestPlanRows:
+    async def test_postgres_aggregate_over_big_table_counts_its_output(self):
+        plan = [{"Plan": {"Node Type": "Aggregate", "Plan Rows": 1, "Total Cost": 9e6, "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "events", "Plan Rows": 5e8},
+        ]}}]
+        connector = canned_explain(PostgreSQLConnector("h", 5432, "d", "u", "p"), plan)
+        result = await connector.explain("SELECT count(*) FROM events")
+
+        assert result.estimated_rows == 1
+        assert result.full_scans == ["events"]
+
+    async def test_postgres_join_output_counts(self):
+        plan = [{"Plan": {"Node Type": "Aggregate", "Plan Rows": 1, "Total Cost": 9e9, "Plans": [
+            {"Node Type": "Nested Loop", "Plan Rows": 1e12, "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "orders", "Plan Rows": 1e6},
+                {"Node Type": "Seq Scan", "Relation Name": "customers", "Plan Rows": 1e6},
+            ]},
+        ]}}]
+        connector = canned_explain(PostgreSQLConnector("h", 5432, "d", "u", "p"), plan)
+        result = await connector.explain("SELECT count(*) FROM orders, customers")
+
+        assert result.estimated_rows == 1e12
+
+    async def test_mysql_classic_single_table_has_no_row_estimate(self):
+        plan = {"query_block": {"cost_info": {"query_cost": "5000.0"}, "table": {
+            "table_name": "events", "access_type": "ALL",
+            "rows_examined_per_scan": 500_000_000, "rows_produced_per_join": 500_000_000,
+        }}}
+        connector = canned_explain(MySQLConnector("h", 3306, "d", "u", "p"), plan)
+        result = await connector.explain("SELECT count(*) FROM events")
+
+        assert result.estimated_rows is None
+        assert result.full_scans == ["events"]
+
+    async def test_mysql_classic_join_output_counts(self):
+        plan = {"query_block": {"cost_info": {"query_cost": "1e9"}, "nested_loop": [
+            {"table": {"table_name": "orders", "access_type": "ALL",
+                       "rows_produced_per_join": 1000}},
+            {"table": {"table_name": "customers", "access_type": "ALL",
+                       "rows_produced_per_join": 1000000}},
+        ]}}
+        connector = canned_explain(MySQLConnector("h", 3306, "d", "u", "p"), plan)
+        result = await connector.explain("SELECT * FROM orders, customers")
+
+        assert result.estimated_rows == 1_000_000
+        assert result.full_scans == ["customers", "orders"]
+
+
+class TestPolicy:
+    def test_within_limits(self):
+        plan = QueryPlan(estimated_rows=10, estimated_cost=5, full_scans=[])
+        assert _over_limit(plan, PreflightPolicy(max_estimated_rows=100)) is None
+
+    def test_reason_names_full_scans(self):
+        plan = QueryPlan(estimated_rows=5_000, estimated_cost=None, full_scans=["orders"])
+        reason = _over_limit(plan, PreflightPolicy(max_estimated_rows=100))
+        assert "5,000 rows" in reason and "orders" in reason
+
+    def test_disabled_connection_policy(self):
+        assert PreflightPolicy.for_connection({"preflight": {"enabled": False}}) is None
+
+    def test_unknown_action_falls_back_to_revise(self):
+        policy = PreflightPolicy.for_connection({"preflight": {"action": "drop"}})
+        assert policy.action == "revise"
+
+
+class TestSample:
+    def test_postgres_join_samples_each_table(self):
+        plan = QueryPlan(estimated_rows=1_000_000, estimated_cost=None, full_scans=["orders", "customers"])
+        policy = PreflightPolicy(max_estimated_rows=10_000, action="sample")
+        sql, percent = _sample("SELECT * FROM orders o, customers c", plan, policy, "postgres")
+
+        assert percent == pytest.approx(10.0)
+        tables = list(sqlglot.parse_one(sql, read="postgres").find_all(sqlglot.exp.Table))
+        assert all(t.args.get("sample") is not None for t in tables)
+        assert "TABLESAMPLE SYSTEM" in sql
+
+    def test_other_dialects_are_not_sampled(self):
+        plan = QueryPlan(estimated_rows=1_000_000, estimated_cost=None, full_scans=["orders"])
+        policy = PreflightPolicy(max_estimated_rows=10_000, action="sample")
+        assert _sample("SELECT * FROM orders", plan, policy, "mysql") is None
@@ -0,0 +1,61 @@
+"""Versioned caching of the rendered schema context."""
+
+import uuid
+
+import pytest
+
+from app.ai.schema_retriever import SchemaDocument
+from app.services import schema_discoverer as module
+from app.services.schema_discoverer import SchemaDiscoverer
+
+
+class FakeCache:
+    """In-memory stand-in for CacheService's get/set/version API."""
+
+    def __init__(self):
+        self.values, self.versions = {}, {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ttl_seconds=300):
+        self.values[key] = value
+
+    async def get_version(self, key):
+        return self.versions.setdefault(key, uuid.uuid4().hex)
+
+    async def bump_version(self, key):
+        self.versions[key] = uuid.uuid4().hex
+
+
+@pytest.fixture
+def discoverer(monkeypatch):
+    monkeypatch.setattr(module, "_local_indexes", module.OrderedDict())
+    discoverer = SchemaDiscoverer(cache=FakeCache())
+    discoverer.renders = 0
+
+    async def load(connection_id, db):
+        discoverer.renders += 1
+        name = f"t{discoverer.renders}"
+        return [SchemaDocument(name=name, full=f"### Table: {name}", compact=f"### {name}()",
+                               search_text="", column_names=[], fk_tables=[])]
+
+    monkeypatch.setattr(discoverer, "load_schema_documents", load)
+    return discoverer
+
+
+async def test_renders_once_per_version(discoverer):
+    first = await discoverer.get_schema_context("c1", db=None)
+    assert await discoverer.get_schema_context("c1", db=None) == first
+    assert discoverer.renders == 1
+
+    await discoverer.invalidate_schema_context("c1")
+    assert await discoverer.get_schema_context("c1", db=None) != first
+    assert discoverer.renders == 2
+
+
+async def test_other_replicas_reuse_redis_copy(discoverer, monkeypatch):
+    context = await discoverer.get_schema_context("c1", db=None)
+    monkeypatch.setattr(module, "_local_indexes", module.OrderedDict())  # Fresh process
+    assert await discoverer.get_schema_context("c1", db=None) == context
+    assert discoverer.renders == 1
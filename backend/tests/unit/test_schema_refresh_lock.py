@@ -0,0 +1,53 @@
+"""Overlapping schema refreshes: a connection still being refreshed is skipped."""
+
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services.cache_service import CacheService
+from app.tasks import schema_refresh
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = CacheService()
+    cache._client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+    monkeypatch.setattr(schema_refresh.schema_discoverer, "cache", cache)
+    return cache
+
+
+async def test_lock_is_exclusive_until_released(cache):
+    token = await cache.acquire_lock("k", ttl_seconds=60)
+    assert token is not None
+    assert await cache.acquire_lock("k", ttl_seconds=60) is None
+
+    await cache.release_lock("k", "someone-else")
+    assert await cache.acquire_lock("k", ttl_seconds=60) is None
+
+    await cache.release_lock("k", token)
+    assert await cache.acquire_lock("k", ttl_seconds=60) is not None
+
+
+async def test_overlapping_refresh_is_skipped(cache, monkeypatch):
+    started, finish = asyncio.Event(), asyncio.Event()
+    runs = []
+
+    async def refresh(connection_id, connection_name):
+        runs.append(connection_id)
+        started.set()
+        await finish.wait()
+        return {"connection_id": connection_id, "skipped": False}
+
+    monkeypatch.setattr(schema_refresh, "_refresh_locked", refresh)
+    first = asyncio.create_task(schema_refresh._refresh_single_connection("c1", "Warehouse"))
+    await started.wait()
+
+    second = await schema_refresh._refresh_single_connection("c1", "Warehouse")
+    assert second["skipped"] is True
+    finish.set()
+    assert (await first)["skipped"] is False
+
+    # The lock was released, so the next cycle refreshes again
+    assert (await schema_refresh._refresh_single_connection("c1", "Warehouse"))["skipped"] is False
+    assert runs == ["c1", "c1"]
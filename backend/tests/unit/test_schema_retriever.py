@@ -0,0 +1,52 @@
+"""BM25 schema selection with FK expansion and token budgeting."""
+
+from app.ai.schema_retriever import SchemaDocument, SchemaIndex, estimate_tokens, tokenize
+
+
+def _doc(name, columns, fks=(), text=""):
+    lines = "\n".join(f"  - {c} (text)" for c in columns)
+    return SchemaDocument(
+        name=name,
+        full=f"### Table: {name}\n{lines}",
+        compact=f"### {name}({', '.join(columns)})",
+        search_text=text,
+        column_names=list(columns),
+        fk_tables=list(fks),
+    )
+
+
+INDEX = SchemaIndex([
+    _doc("customers", ["id", "name", "region"], text="people who buy from us"),
+    _doc("orders", ["id", "customer_id", "total_amount", "created_at"], fks=["customers"]),
+    _doc("order_items", ["order_id", "product_id", "quantity"], fks=["orders", "products"]),
+    _doc("products", ["id", "title", "category"]),
+    _doc("web_sessions", ["id", "user_agent", "referrer"]),
+    _doc("audit_events", ["id", "actor", "action"]),
+])
+
+
+def test_tokenize_splits_identifiers_and_folds_plurals():
+    assert tokenize("orderItems customer_IDs categories") == ["order", "item", "customer", "id", "category"]
+
+
+def test_ranks_matching_tables_first_and_pulls_in_fk_partners():
+    ranked = INDEX.rank("total order amount by region")
+    assert ranked[:2] == ["orders", "customers"]
+    assert ranked.index("order_items") < ranked.index("web_sessions")
+
+
+def test_ranking_is_deterministic():
+    assert INDEX.rank("product category quantity") == INDEX.rank("product category quantity")
+
+
+def test_select_respects_budget_and_lists_the_rest():
+    budget = 60
+    context = INDEX.select("total order amount by region", token_budget=budget)
+    assert estimate_tokens(context) <= budget + 5
+    assert context.startswith("### Table: orders")
+    assert "Other tables (not shown):" in context
+
+
+def test_small_schema_is_rendered_whole():
+    assert INDEX.select("anything", token_budget=10_000) == INDEX.full_context()
+    assert INDEX.fits(10_000) and not INDEX.fits(60)
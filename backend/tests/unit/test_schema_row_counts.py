@@ -0,0 +1,106 @@
+"""Schema refresh bookkeeping: catalog row estimates and unprofiled tables."""
+
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.connectors.sqlite import SQLiteConnector
+from app.core.constants import SCHEMA_PROFILE_RETRY_MAX_SECONDS, SCHEMA_PROFILE_RETRY_SECONDS
+from app.models.schema_column import SchemaColumn
+from app.models.schema_table import SchemaTable
+from app.services.schema_discoverer import SchemaDiscoverer, _profile_backoff
+
+CONNECTION_ID = uuid.uuid4()
+
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        # Just the columns used here (the models' JSONB has no SQLite rendering)
+        await conn.execute(text(
+            "CREATE TABLE schema_tables (id CHAR(32) PRIMARY KEY, connection_id CHAR(32), "
+            "table_name TEXT, table_type TEXT, row_count INTEGER, "
+            "profiled_at TIMESTAMP, profile_failures INTEGER, profile_retry_at TIMESTAMP, "
+            "created_at TIMESTAMP, updated_at TIMESTAMP)"
+        ))
+        await conn.execute(text(
+            "CREATE TABLE schema_columns (id CHAR(32) PRIMARY KEY, schema_table_id CHAR(32), "
+            "column_name TEXT, is_nullable BOOLEAN, is_primary_key BOOLEAN, "
+            "is_foreign_key BOOLEAN, distinct_count INTEGER, "
+            "created_at TIMESTAMP, updated_at TIMESTAMP)"
+        ))
+    async with async_sessionmaker(engine)() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+async def connector(tmp_path):
+    path = tmp_path / "data.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY)")
+    conn.executemany("INSERT INTO orders VALUES (?)", [(i,) for i in range(40)])
+    conn.executemany("INSERT INTO customers VALUES (?)", [(i,) for i in range(3)])
+    conn.commit()
+    conn.close()
+    connector = SQLiteConnector(str(path))
+    yield connector
+    await connector.close()
+
+
+async def add_table(db, name, row_count, distinct_count, **profile):
+    table_id = uuid.uuid4()
+    await db.execute(insert(SchemaTable.__table__).values(
+        id=table_id, connection_id=CONNECTION_ID, table_name=name, row_count=row_count, **profile,
+    ))
+    await db.execute(insert(SchemaColumn.__table__).values(
+        id=uuid.uuid4(), schema_table_id=table_id, column_name="id", distinct_count=distinct_count,
+    ))
+
+
+async def test_refresh_row_counts_updates_stale_sizes(db, connector):
+    await add_table(db, "orders", row_count=10, distinct_count=10)
+    await add_table(db, "customers", row_count=3, distinct_count=3)
+
+    discoverer = SchemaDiscoverer(cache=object())
+    assert await discoverer.refresh_row_counts(CONNECTION_ID, connector, db) == 1
+
+    counts = dict((await db.execute(select(SchemaTable.table_name, SchemaTable.row_count))).all())
+    assert counts == {"orders": 40, "customers": 3}
+
+
+async def test_unprofiled_tables(db):
+    await add_table(db, "orders", row_count=40, distinct_count=None)
+    await add_table(db, "customers", row_count=3, distinct_count=3)
+
+    discoverer = SchemaDiscoverer(cache=object())
+    assert await discoverer.unprofiled_tables(CONNECTION_ID, db) == {"orders"}
+
+
+async def test_unprofiled_tables_skips_attempted_and_backing_off(db):
+    now = datetime.now(timezone.utc)
+    await add_table(db, "never", row_count=1, distinct_count=None)
+    await add_table(db, "empty_stats", row_count=1, distinct_count=None, profiled_at=now)
+    await add_table(
+        db, "backing_off", row_count=1, distinct_count=None,
+        profiled_at=now, profile_failures=2, profile_retry_at=now + timedelta(hours=1),
+    )
+    await add_table(
+        db, "retry_due", row_count=1, distinct_count=None,
+        profiled_at=now, profile_failures=1, profile_retry_at=now - timedelta(minutes=1),
+    )
+
+    discoverer = SchemaDiscoverer(cache=object())
+    assert await discoverer.unprofiled_tables(CONNECTION_ID, db) == {"never", "retry_due"}
+
+
+def test_profile_backoff_doubles_up_to_the_cap():
+    assert _profile_backoff(1) == timedelta(seconds=SCHEMA_PROFILE_RETRY_SECONDS)
+    assert _profile_backoff(3) == timedelta(seconds=4 * SCHEMA_PROFILE_RETRY_SECONDS)
+    assert _profile_backoff(50) == timedelta(seconds=SCHEMA_PROFILE_RETRY_MAX_SECONDS)
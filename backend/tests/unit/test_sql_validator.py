@@ -1,7 +1,7 @@
 """SQL validator unit tests including adversarial cases."""
 
 import pytest
-from app.core.sql_validator import SQLSafetyValidator
+from app.core.sql_validator import SQLSafetyValidator, apply_row_limit
 
 validator = SQLSafetyValidator()
 
@@ -77,3 +77,29 @@ class TestSQLValidatorAdversarial:
         """Keywords in string literals are safe -- they're just data."""
         result = validator.validate("SELECT * FROM users WHERE name = 'DROP TABLE'")
         assert result["is_safe"] is True
+
+
+class TestApplyRowLimit:
+    def _limited(self, sql: str, limit: int = 101) -> str:
+        expression = validator.validate(sql)["expression"]
+        return apply_row_limit(expression, limit).sql(dialect="postgres")
+
+    def test_adds_limit_after_order_by(self):
+        sql = self._limited("SELECT * FROM events ORDER BY ts DESC")
+        assert sql.startswith("SELECT * FROM events ORDER BY ts DESC")
+        assert sql.endswith("LIMIT 101")
+
+    def test_lowers_larger_limit(self):
+        assert self._limited("SELECT id FROM events LIMIT 50000").endswith("LIMIT 101")
+
+    def test_keeps_tighter_limit(self):
+        assert self._limited("SELECT id FROM events LIMIT 10").endswith("LIMIT 10")
+
+    def test_outer_limit_only_for_cte(self):
+        sql = self._limited("WITH t AS (SELECT * FROM events LIMIT 5000) SELECT * FROM t")
+        assert "LIMIT 5000" in sql and sql.endswith("LIMIT 101")
+
+    def test_does_not_mutate_validated_expression(self):
+        expression = validator.validate("SELECT * FROM events")["expression"]
+        apply_row_limit(expression, 10)
+        assert expression.args.get("limit") is None
@@ -0,0 +1,226 @@
+"""SQLite connector behaviour against a real on-disk database."""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.connectors.base import TableInfo
+from app.connectors.sqlite import SQLiteConnector
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "data.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orders (id INTEGER PRIMARY KEY, amount REAL)")
+    conn.executemany("INSERT INTO orders VALUES (?, ?)", [(i, i * 1.5) for i in range(25)])
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+class TestStreamQuery:
+    async def test_yields_batches_with_columns(self, db_path):
+        connector = SQLiteConnector(db_path)
+        try:
+            batches = [b async for b in connector.stream_query("SELECT * FROM orders", batch_size=10)]
+        finally:
+            await connector.close()
+
+        assert [len(b.rows) for b in batches] == [10, 10, 5]
+        assert all(b.columns == ["id", "amount"] for b in batches)
+        assert batches[-1].rows[-1] == [24, 36.0]
+
+    async def test_empty_result_still_reports_columns(self, db_path):
+        connector = SQLiteConnector(db_path)
+        try:
+            batches = [b async for b in connector.stream_query("SELECT id FROM orders WHERE id < 0")]
+        finally:
+            await connector.close()
+
+        assert len(batches) == 1
+        assert batches[0].columns == ["id"]
+        assert batches[0].rows == []
+
+
+class TestCancellation:
+    async def test_cancel_interrupts_running_statement(self, db_path):
+        connector = SQLiteConnector(db_path)
+        endless = (
+            "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) "
+            "SELECT COUNT(*) FROM n"
+        )
+        try:
+            task = asyncio.create_task(connector.execute_query(endless))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            # The shared connection is usable again right away.
+            result = await asyncio.wait_for(connector.execute_query("SELECT COUNT(*) FROM orders"), 2)
+            assert result.rows == [[25]]
+        finally:
+            await connector.close()
+
+
+class TestPoolAndTimeout:
+    async def test_runaway_query_aborted_at_timeout(self, db_path):
+        connector = SQLiteConnector(db_path)
+        endless = (
+            "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) "
+            "SELECT COUNT(*) FROM n"
+        )
+        try:
+            result = await asyncio.wait_for(connector.execute_query(endless, timeout=1), 5)
+        finally:
+            await connector.close()
+        assert "timeout" in result.error
+
+    async def test_connections_are_read_only(self, db_path):
+        connector = SQLiteConnector(db_path)
+        try:
+            result = await connector.execute_query("DELETE FROM orders")
+        finally:
+            await connector.close()
+        assert "readonly" in result.error
+
+    async def test_queries_run_concurrently(self, db_path):
+        connector = SQLiteConnector(db_path, pool_size=2)
+        slow = (
+            "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 2000000) "
+            "SELECT COUNT(*) FROM n"
+        )
+        try:
+            started = asyncio.get_running_loop().time()
+            slow_task = asyncio.create_task(connector.execute_query(slow))
+            await asyncio.sleep(0.05)
+            fast = await connector.execute_query("SELECT COUNT(*) FROM orders")
+            fast_elapsed = asyncio.get_running_loop().time() - started
+            await slow_task
+        finally:
+            await connector.close()
+        assert fast.rows == [[25]]
+        assert slow_task.result().rows == [[2000000]]
+        assert fast_elapsed < slow_task.result().execution_time_ms / 1000
+
+
+class TestRowCounts:
+    async def test_uses_sqlite_stat1_when_analyzed(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("ANALYZE")
+        # Simulate a stale estimate: stat1 is trusted over scanning.
+        conn.execute("UPDATE sqlite_stat1 SET stat = '1000' WHERE tbl = 'orders'")
+        conn.commit()
+        conn.close()
+
+        connector = SQLiteConnector(db_path)
+        try:
+            estimated = await connector.get_tables()
+            exact = await connector.get_tables(exact=True)
+        finally:
+            await connector.close()
+        assert estimated[0].row_count == 1000
+        assert exact[0].row_count == 25
+
+    async def test_partial_index_does_not_shrink_the_estimate(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE INDEX by_amount ON orders (amount)")
+        # Analyzed (and listed in sqlite_stat1) first, with only the indexed rows
+        conn.execute("CREATE INDEX big_orders ON orders (amount) WHERE amount > 30")
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.close()
+
+        connector = SQLiteConnector(db_path)
+        try:
+            assert (await connector.get_tables())[0].row_count == 25
+        finally:
+            await connector.close()
+
+    async def test_counts_cached_until_file_changes(self, db_path):
+        connector = SQLiteConnector(db_path)
+        try:
+            assert (await connector.get_tables())[0].row_count == 25
+
+            conn = sqlite3.connect(db_path)
+            conn.execute("INSERT INTO orders VALUES (100, 1.0)")
+            conn.commit()
+            conn.close()
+            assert (await connector.get_tables())[0].row_count == 26
+        finally:
+            await connector.close()
+
+    async def test_cache_keeps_only_the_current_version(self, db_path):
+        connector = SQLiteConnector(db_path)
+        try:
+            await connector.get_tables()
+            conn = sqlite3.connect(db_path)
+            conn.execute("CREATE TABLE notes (id INTEGER)")
+            conn.commit()
+            conn.close()
+            await connector.get_tables()
+
+            version, counts = connector._row_counts
+            assert version == connector._file_version()
+            assert counts == {"notes": 0, "orders": 25}
+        finally:
+            await connector.close()
+
+    async def test_tables_listed_by_name(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE customers (id INTEGER)")
+        conn.execute("CREATE VIEW big_orders AS SELECT * FROM orders WHERE amount > 30")
+        conn.commit()
+        conn.close()
+
+        connector = SQLiteConnector(db_path)
+        try:
+            names = [t.name for t in await connector.get_tables()]
+        finally:
+            await connector.close()
+        assert names == ["big_orders", "customers", "orders"]
+
+
+class TestTableSamples:
+    async def test_samples_all_columns_in_one_read(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE tags (id INTEGER, label TEXT)")
+        conn.executemany("INSERT INTO tags VALUES (?, ?)", [(1, "a"), (2, None), (3, "a"), (4, "b")])
+        conn.commit()
+        conn.close()
+
+        connector = SQLiteConnector(db_path)
+        try:
+            samples = await connector.get_table_samples(
+                TableInfo(name="tags", table_type="table", row_count=4), ["id", "label"], limit=3,
+            )
+        finally:
+            await connector.close()
+        assert samples == {"id": [1, 2, 3], "label": ["a", "b"]}
+
+
+class TestSchemaFingerprint:
+    async def test_changes_only_for_altered_table(self, db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE customers (id INTEGER PRIMARY KEY)")
+        conn.commit()
+
+        connector = SQLiteConnector(db_path)
+        try:
+            before = await connector.schema_fingerprint()
+            conn.execute("INSERT INTO orders VALUES (500, 2.0)")  # Data only
+            conn.execute("ALTER TABLE customers ADD COLUMN email TEXT")
+            conn.commit()
+            after = await connector.schema_fingerprint()
+            schema = await connector.introspect_schema(tables=["customers"])
+        finally:
+            conn.close()
+            await connector.close()
+
+        assert before.keys() == after.keys() == {"orders", "customers"}
+        assert before["orders"] == after["orders"]
+        assert before["customers"] != after["customers"]
+        assert [t.table.name for t in schema] == ["customers"]
+        assert [c.name for c in schema[0].columns] == ["id", "email"]
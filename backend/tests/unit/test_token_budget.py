@@ -0,0 +1,238 @@
+"""Token budget: Redis counters and reservations around the chat pipeline."""
+
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+import fakeredis
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.models.organization import Organization
+from app.services.ai_engine import AIEngine
+from app.services.token_budget_service import (
+    DIRTY_KEY,
+    BudgetReservation,
+    TokenBudgetExceeded,
+    TokenBudgetService,
+    _budget_key,
+    _month_start,
+)
+from tests.unit.engine_stubs import DELAY, SlowHistory, SlowSchema, session_factory
+
+ORG = str(uuid.uuid4())
+PAST = datetime(2020, 1, 1, tzinfo=timezone.utc)
+FUTURE = datetime(2999, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeBudget:
+    def __init__(self, exceeded=False):
+        self.exceeded = exceeded
+        self.settled = []
+
+    async def reserve(self, org_id, db):
+        if self.exceeded:
+            raise TokenBudgetExceeded(org_id, used=10, budget=10)
+        return BudgetReservation(org_id, 10_000, "1700000000", "llm")
+
+    async def settle(self, reservation, tokens_used, db):
+        self.settled.append(tokens_used)
+
+
+def make_engine(budget, generate):
+    engine = AIEngine(
+        schema_provider=SlowSchema(), query_runner=None, sql_validator=None,
+        cache_provider=None, conversation_provider=SlowHistory(),
+        anthropic_client=object(), session_factory=session_factory, budget_service=budget,
+    )
+    engine.sql_generator.generate = generate
+    return engine
+
+
+async def test_reservation_settled_with_all_billable_tokens():
+    budget = FakeBudget()
+
+    async def generate(**kwargs):
+        return {"sql": "NOT_DATA_QUERY", "reasoning": "hi", "token_usage": {
+            "input_tokens": 10, "output_tokens": 5, "cache_read_input_tokens": 100,
+        }}
+
+    response = await make_engine(budget, generate).process_message("hi", "c", "s", db=None, org_id="org")
+    assert budget.settled == [115]
+    assert {"budget", "persist"} <= set(response.stage_timings)
+
+
+async def test_over_budget_stops_before_the_llm():
+    response = await make_engine(FakeBudget(exceeded=True), None).process_message(
+        "hi", "c", "s", db=None, org_id="org",
+    )
+    assert "monthly AI token budget" in response.content
+
+
+async def test_reservation_released_when_the_pipeline_fails():
+    budget = FakeBudget()
+
+    async def generate(**kwargs):
+        raise RuntimeError("LLM down")
+
+    with pytest.raises(RuntimeError):
+        await make_engine(budget, generate).process_message("hi", "c", "s", db=None, org_id="org")
+    assert budget.settled == [0]
+
+
+async def test_reservation_released_when_cancelled_mid_gather():
+    budget = FakeBudget()
+    task = asyncio.create_task(
+        make_engine(budget, None).process_message("hi", "c", "s", db=None, org_id="org"),
+    )
+    await asyncio.sleep(DELAY / 2)  # Reserved; history and schema still loading
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert budget.settled == [0]
+
+
+async def test_reservation_settled_when_cancelled_during_reserve():
+    class SlowReserveBudget(FakeBudget):
+        async def reserve(self, org_id, db):
+            reservation = await super().reserve(org_id, db)  # Redis has taken the tokens
+            await asyncio.sleep(DELAY)  # ... but the reply is still on its way back
+            return reservation
+
+    budget = SlowReserveBudget()
+    task = asyncio.create_task(
+        make_engine(budget, None).process_message("hi", "c", "s", db=None, org_id="org"),
+    )
+    await asyncio.sleep(DELAY / 2)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert budget.settled == [0]
+
+
+def test_month_start_rolls_over_the_year():
+    moment = datetime(2025, 12, 17, 9, tzinfo=timezone.utc)
+    assert _month_start(moment) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert _month_start(moment, months=1) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+# ── Redis counters ──────────────────────────────────────────────────
+
+
+class FakeResult:
+    def __init__(self, org):
+        self.org = org
+
+    def scalar_one_or_none(self):
+        return self.org
+
+
+class FakeDB:
+    def __init__(self, org=None):
+        self.org = org
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return FakeResult(self.org)
+
+    async def flush(self):
+        pass
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+def make_org(used=0, budget=25_000, reset_at=FUTURE):
+    return Organization(
+        id=uuid.UUID(ORG), token_usage_current=used, token_budget_monthly=budget,
+        budget_reset_at=reset_at, analysis_mode="auto",
+    )
+
+
+@pytest.fixture
+async def service():
+    service = TokenBudgetService()
+    service._client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    yield service
+    await service.close()
+
+
+async def counter(service) -> dict:
+    return await service._client.hgetall(_budget_key(ORG))
+
+
+async def test_concurrent_reserves_stop_at_the_budget(service):
+    db = FakeDB(make_org(budget=25_000))
+    outcomes = await asyncio.gather(
+        *(service.reserve(ORG, db, tokens=10_000) for _ in range(5)), return_exceptions=True,
+    )
+
+    assert sum(isinstance(o, BudgetReservation) for o in outcomes) == 3
+    assert sum(isinstance(o, TokenBudgetExceeded) for o in outcomes) == 2
+    assert (await counter(service))["used"] == "30000"
+
+
+async def test_reserve_rolls_the_month_over(service):
+    # Seeded while still in the old period; the DB row is not consulted again
+    await service.reserve(ORG, FakeDB(make_org(used=0, budget=25_000)), tokens=0)
+    await service._client.hset(_budget_key(ORG), mapping={
+        "used": 25_000, "reset_at": int(PAST.timestamp()),
+    })
+    await service._client.delete(DIRTY_KEY)
+
+    reservation = await service.reserve(ORG, FakeDB(), tokens=1_000)
+
+    fields = await counter(service)
+    next_reset = _month_start(datetime.now(timezone.utc), months=1)
+    assert fields["used"] == "1000"
+    assert fields["reset_at"] == str(int(next_reset.timestamp())) == reservation.reset_at
+    assert await service._client.smembers(DIRTY_KEY) == {ORG}
+
+
+async def test_settle_after_a_rollover_charges_only_actual_usage(service):
+    before = await service.reserve(ORG, FakeDB(make_org()), tokens=10_000)
+    # The month rolls over while *before*'s message is still running
+    await service._client.hset(_budget_key(ORG), "reset_at", int(PAST.timestamp()))
+    after = await service.reserve(ORG, FakeDB(), tokens=2_000)
+
+    await service.settle(before, 3_000, FakeDB())
+    assert (await counter(service))["used"] == "5000"  # 2,000 held + 3,000 used
+    await service.settle(after, 500, FakeDB())
+    assert (await counter(service))["used"] == "3500"
+
+
+async def test_sync_adds_unsynced_usage_and_clears_the_dirty_set(service):
+    reservation = await service.reserve(ORG, FakeDB(make_org(used=100)), tokens=10_000)
+    await service.settle(reservation, 1_234, FakeDB())
+
+    db = FakeDB()
+    assert await service.sync_to_db(db) == 1
+
+    assert await service._client.scard(DIRTY_KEY) == 0
+    assert (await counter(service))["unsynced"] == "0"
+    assert db.commits == 1
+    statement = db.statements[0].compile(dialect=postgresql.dialect())
+    # Added to the row, so usage charged to it while Redis was down is kept
+    assert "organizations.token_usage_current + " in str(statement)
+    assert 1_234 in statement.params.values()
+    assert statement.params["budget_reset_at"] == FUTURE
+
+
+async def test_failed_sync_keeps_the_unsynced_usage(service):
+    reservation = await service.reserve(ORG, FakeDB(make_org()), tokens=10_000)
+    await service.settle(reservation, 700, FakeDB())
+
+    class BrokenDB(FakeDB):
+        async def commit(self):
+            raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        await service.sync_to_db(BrokenDB())
+
+    assert (await counter(service))["unsynced"] == "700"
+    assert await service._client.smembers(DIRTY_KEY) == {ORG}
@@ -0,0 +1,105 @@
+"""Streaming upload ingestion: type inference, ragged rows, Excel values."""
+
+import datetime as dt
+import io
+import os
+import sqlite3
+import tempfile
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi import UploadFile
+from openpyxl import Workbook
+
+from app.api.v1 import upload as upload_api
+from app.services.upload_service import UploadService
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(UploadService, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    return UploadService()
+
+
+class TestUploadService:
+    async def test_csv_types_inferred_from_sample(self, service, tmp_path):
+        src = tmp_path / "sales data.csv"
+        src.write_text("id,amount,region,id\n1,2.5,EU,\n2,,US,x\n3,4\n")
+        result = await service.ingest_csv(str(src), "sales data.csv")
+
+        assert result["table_name"] == "sales_data"
+        assert result["row_count"] == 3
+        assert result["columns"] == ["id", "amount", "region", "id_1"]
+        conn = sqlite3.connect(result["db_path"])
+        ddl = conn.execute("SELECT sql FROM sqlite_master").fetchone()[0]
+        assert '"id" INTEGER' in ddl and '"amount" REAL' in ddl and '"region" TEXT' in ddl
+        assert conn.execute("SELECT * FROM sales_data ORDER BY id").fetchall() == [
+            (1, 2.5, "EU", None), (2, None, "US", "x"), (3, 4.0, None, None),
+        ]
+
+    async def test_excel_first_sheet(self, service, tmp_path):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["day", "orders"])
+        ws.append([dt.date(2024, 1, 1), 10])
+        ws.append([dt.date(2024, 1, 2), 12])
+        src = tmp_path / "orders.xlsx"
+        wb.save(src)
+
+        result = await service.ingest_excel(str(src), "orders.xlsx")
+        conn = sqlite3.connect(result["db_path"])
+        assert conn.execute("SELECT day, orders FROM orders").fetchall() == [
+            ("2024-01-01T00:00:00", 10), ("2024-01-02T00:00:00", 12),
+        ]
+
+
+class TestCSVEncoding:
+    @pytest.mark.parametrize("encoding", ["utf-8-sig", "cp1252", "utf-16"])
+    async def test_text_decoded_without_loss(self, service, tmp_path, encoding):
+        src = tmp_path / "customers.csv"
+        src.write_bytes("id,name\n1,Café Müller\n".encode(encoding))
+        result = await service.ingest_csv(str(src), "customers.csv")
+
+        conn = sqlite3.connect(result["db_path"])
+        assert conn.execute("SELECT name FROM customers").fetchall() == [("Café Müller",)]
+
+    async def test_bytes_undefined_in_cp1252_fall_back_to_latin1(self, service, tmp_path):
+        src = tmp_path / "legacy.csv"
+        src.write_bytes(b"id,name\n1,Caf\xe9\x81\x8d\x8f\x90\x9d\n")
+        result = await service.ingest_csv(str(src), "legacy.csv")
+
+        conn = sqlite3.connect(result["db_path"])
+        [(name,)] = conn.execute("SELECT name FROM legacy").fetchall()
+        assert name == "Caf\xe9\x81\x8d\x8f\x90\x9d"
+
+
+class TestFileObjectSource:
+    async def test_spooled_upload_ingested_in_place(self, service):
+        with tempfile.SpooledTemporaryFile(max_size=16) as f:
+            f.write("id,name\n1,Café\n2,Bar\n".encode("cp1252"))
+            result = await service.ingest_csv(f, "upload.csv")
+            assert not f.closed  # Still the caller's to close
+
+        conn = sqlite3.connect(result["db_path"])
+        assert conn.execute("SELECT * FROM upload").fetchall() == [(1, "Café"), (2, "Bar")]
+
+
+class TestUploadEndpoint:
+    async def test_database_removed_when_registration_fails(self, service, tmp_path):
+        class FailingSession:
+            def add(self, obj):
+                pass
+
+            async def flush(self):
+                raise RuntimeError("database unavailable")
+
+        file = UploadFile(io.BytesIO(b"id\n1\n"), filename="ids.csv")
+        user = SimpleNamespace(id=uuid.uuid4(), org_id=uuid.uuid4())
+        with pytest.raises(RuntimeError):
+            await upload_api._handle_upload(
+                file, "csv", upload_api.CSV_EXTENSIONS,
+                request=None, db=FailingSession(), user=user,
+            )
+
+        assert os.listdir(service.UPLOAD_DIR) == []
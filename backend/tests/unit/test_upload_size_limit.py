@@ -0,0 +1,47 @@
+"""Upload bodies over the limit are refused before multipart parsing."""
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, UploadFile
+
+from app.core.middleware import UploadSizeLimitMiddleware
+
+LIMIT = 1_000
+
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=LIMIT)
+
+    @app.post("/api/v1/upload/csv")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def test_small_upload_passes(client):
+    response = await client.post("/api/v1/upload/csv", files={"file": ("a.csv", b"x" * 100)})
+    assert response.json() == {"size": 100}
+
+
+async def test_declared_length_over_limit_rejected(client):
+    response = await client.post("/api/v1/upload/csv", files={"file": ("a.csv", b"x" * 5_000)})
+    assert response.status_code == 413
+
+
+async def test_chunked_body_cut_off_at_limit(client):
+    async def body():
+        yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.csv"\r\n\r\n'
+        for _ in range(10):
+            yield b"x" * 500
+        yield b"\r\n--b--\r\n"
+
+    response = await client.post(
+        "/api/v1/upload/csv", content=body(),
+        headers={"content-type": "multipart/form-data; boundary=b"},
+    )
+    assert response.status_code == 413
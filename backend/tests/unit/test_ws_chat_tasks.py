@@ -0,0 +1,61 @@
+"""WebSocket chat task tracking: per-session dedupe and cancellation."""
+
+import asyncio
+
+from app.api import websocket as websocket_module
+from app.api.websocket import ConnectionManagerWS, _run_chat_task
+
+
+async def _forever(started: asyncio.Event):
+    started.set()
+    await asyncio.sleep(3600)
+
+
+class TestChatTasks:
+    async def test_cancel_by_key(self):
+        manager = ConnectionManagerWS()
+        started = asyncio.Event()
+        task = manager.start_chat_task("u1", "s1", _forever(started))
+        await started.wait()
+
+        assert manager.start_chat_task("u1", "s1", _forever(asyncio.Event())) is None
+        assert manager.cancel_chat_tasks("u1", "other") == 0
+        assert manager.cancel_chat_tasks("u1", "s1") == 1
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled()
+        assert manager.chat_tasks == {}
+
+    async def test_disconnect_cancels_everything(self):
+        manager = ConnectionManagerWS()
+        tasks = [manager.start_chat_task("u1", key, _forever(asyncio.Event())) for key in ("a", "b")]
+        await asyncio.sleep(0)
+        manager.disconnect("u1")
+        await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(t.cancelled() for t in tasks)
+
+    async def test_cancelled_pipeline_is_reported_and_ends_cancelled(self, monkeypatch):
+        started = asyncio.Event()
+
+        async def handle(websocket, user_id, message):
+            await _forever(started)
+
+        monkeypatch.setattr(websocket_module, "_handle_chat_message", handle)
+        socket = FakeWebSocket()
+        manager = ConnectionManagerWS()
+        message = {"request_id": "r1", "session_id": None}
+        task = manager.start_chat_task("u1", "r1", _run_chat_task(socket, "u1", "r1", message))
+        await started.wait()
+
+        manager.cancel_chat_tasks("u1", "r1")
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert task.cancelled()
+        assert socket.sent == [{"type": "query_cancelled", "request_id": "r1", "session_id": None}]
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
@@ -10,6 +10,7 @@ import MessageBubble from './message-bubble';
 import SessionSidebar from './session-sidebar';
 import SuggestedQuestions from './suggested-questions';
 import StreamingText from './streaming-text';
+import ChartRenderer from '../charts/chart-renderer';
 import { ErrorBoundary } from '@/components/ui/error-boundary';
 
 export default function ChatContainer() {
@@ -21,19 +22,36 @@ export default function ChatContainer() {
     activeSessionId,
     streamingContent,
     streamingPhase,
+    streamingResult,
     appendStreamChunk,
+    mergeStreamingResult,
     clearStreaming,
+    activeRequestId,
+    setActiveRequest,
   } = useChatStore();
   const { activeConnectionId } = useConnectionStore();
 
   const handleWsMessage = useCallback(
     (data: any) => {
+      // Drop late frames of a request that was cancelled or superseded
+      if (data.request_id && data.request_id !== useChatStore.getState().activeRequestId) return;
+
       if (data.type === 'stream') {
         appendStreamChunk(data.chunk, data.phase);
+      } else if (data.type === 'query_result') {
+        mergeStreamingResult({
+          generated_sql: data.generated_sql,
+          query_result_preview: data.query_result_preview,
+          full_result_row_count: data.full_result_row_count,
+          execution_time_ms: data.execution_time_ms,
+        });
+      } else if (data.type === 'chart_config') {
+        mergeStreamingResult({ chart_config: data.chart_config });
       } else if (data.type === 'stream_start') {
         clearStreaming();
       } else if (data.type === 'chat_response') {
         clearStreaming();
+        setActiveRequest(null);
         addMessage({
           id: data.message_id || crypto.randomUUID(),
           role: 'assistant',
@@ -47,8 +65,13 @@ export default function ChatContainer() {
           created_at: new Date().toISOString(),
         });
         setLoading(false);
+      } else if (data.type === 'query_cancelled') {
+        clearStreaming();
+        setActiveRequest(null);
+        setLoading(false);
       } else if (data.type === 'error') {
         clearStreaming();
+        setActiveRequest(null);
         addMessage({
           id: crypto.randomUUID(),
           role: 'assistant',
@@ -59,7 +82,7 @@ export default function ChatContainer() {
         setLoading(false);
       }
     },
-    [addMessage, setLoading, appendStreamChunk, clearStreaming],
+    [addMessage, setLoading, appendStreamChunk, mergeStreamingResult, clearStreaming, setActiveRequest],
   );
 
   const { send, isConnected } = useWebSocket({
@@ -81,8 +104,11 @@ export default function ChatContainer() {
 
     // Use WebSocket if connected, otherwise fall back to REST
     if (isConnected) {
+      const requestId = crypto.randomUUID();
+      setActiveRequest(requestId);
       send({
         type: 'chat_message',
+        request_id: requestId,
         message: text.trim(),
         connection_id: activeConnectionId,
         session_id: activeSessionId,
@@ -124,6 +150,10 @@ export default function ChatContainer() {
     }
   };
 
+  const handleCancel = () => {
+    if (activeRequestId) send({ type: 'cancel_query', request_id: activeRequestId });
+  };
+
   const phaseLabel =
     streamingPhase === 'generating_sql'
       ? 'Generating SQL...'
@@ -155,12 +185,21 @@ export default function ChatContainer() {
 
           {isLoading && (
             <div className="bg-bg-secondary rounded-lg p-4">
-              {streamingContent ? (
+              {streamingContent && (
                 <div className="text-text-primary">
                   <div className="text-xs text-text-muted mb-2">{phaseLabel}</div>
                   <StreamingText content={streamingContent} isStreaming />
                 </div>
-              ) : (
+              )}
+              {streamingResult?.query_result_preview && (
+                <div className="mt-3">
+                  <ChartRenderer
+                    config={streamingResult.chart_config ?? { chart_type: 'table', title: 'Results' }}
+                    data={streamingResult.query_result_preview}
+                  />
+                </div>
+              )}
+              {!streamingContent && !streamingResult && (
                 <div className="flex items-center gap-2 text-text-muted">
                   <div className="flex gap-1">
                     <div className="w-2 h-2 bg-brand-primary rounded-full animate-bounce" style={{ animationDelay: '0ms' }} />
@@ -175,7 +214,10 @@ export default function ChatContainer() {
         </div>
         </ErrorBoundary>
 
-        <ChatInput />
+        <ChatInput
+          onSend={handleSend}
+          onCancel={isLoading && activeRequestId ? handleCancel : undefined}
+        />
       </div>
     </div>
   );
@@ -3,12 +3,17 @@
 import { useState, useRef, useEffect } from 'react';
 import { useChatStore } from '@/stores/chat-store';
 import { useConnectionStore } from '@/stores/connection-store';
-import { apiClient } from '@/lib/api-client';
 
-export default function ChatInput() {
+interface ChatInputProps {
+  onSend: (text: string) => void;
+  // Set while a cancellable (WebSocket) request is running
+  onCancel?: () => void;
+}
+
+export default function ChatInput({ onSend, onCancel }: ChatInputProps) {
   const [input, setInput] = useState('');
   const textareaRef = useRef<HTMLTextAreaElement>(null);
-  const { addMessage, setLoading, isLoading, activeSessionId } = useChatStore();
+  const { isLoading } = useChatStore();
   const { activeConnectionId, connections } = useConnectionStore();
 
   useEffect(() => {
@@ -18,55 +23,11 @@ export default function ChatInput() {
     }
   }, [input]);
 
-  const handleSubmit = async (e: React.FormEvent) => {
+  const handleSubmit = (e: React.FormEvent) => {
     e.preventDefault();
     if (!input.trim() || isLoading || !activeConnectionId) return;
-
-    const userMessage = input.trim();
+    onSend(input.trim());
     setInput('');
-
-    addMessage({
-      id: crypto.randomUUID(),
-      role: 'user',
-      content: userMessage,
-      created_at: new Date().toISOString(),
-    });
-
-    setLoading(true);
-
-    try {
-      const response = await apiClient('/chat/message', {
-        method: 'POST',
-        body: JSON.stringify({
-          message: userMessage,
-          connection_id: activeConnectionId,
-          session_id: activeSessionId,
-        }),
-      });
-
-      addMessage({
-        id: response.message_id || crypto.randomUUID(),
-        role: 'assistant',
-        content: response.content,
-        generated_sql: response.generated_sql,
-        query_result_preview: response.query_result_preview,
-        full_result_row_count: response.full_result_row_count,
-        chart_config: response.chart_config,
-        execution_time_ms: response.execution_time_ms,
-        error_message: response.error_message,
-        created_at: new Date().toISOString(),
-      });
-    } catch (err: any) {
-      addMessage({
-        id: crypto.randomUUID(),
-        role: 'assistant',
-        content: `Sorry, something went wrong: ${err.message}`,
-        error_message: err.message,
-        created_at: new Date().toISOString(),
-      });
-    } finally {
-      setLoading(false);
-    }
   };
 
   return (
@@ -107,13 +68,23 @@ export default function ChatInput() {
           />
         </div>
 
-        <button
-          type="submit"
-          disabled={!input.trim() || isLoading || !activeConnectionId}
-          className="px-4 py-3 bg-brand-primary text-white rounded-xl font-medium hover:opacity-90 disabled:opacity-50 shadow-[0_0_20px_rgba(99,102,241,0.3)]"
-        >
-          Send
-        </button>
+        {onCancel ? (
+          <button
+            type="button"
+            onClick={onCancel}
+            className="px-4 py-3 bg-bg-elevated border border-border-default text-text-primary rounded-xl font-medium hover:opacity-90"
+          >
+            Stop
+          </button>
+        ) : (
+          <button
+            type="submit"
+            disabled={!input.trim() || isLoading || !activeConnectionId}
+            className="px-4 py-3 bg-brand-primary text-white rounded-xl font-medium hover:opacity-90 disabled:opacity-50 shadow-[0_0_20px_rgba(99,102,241,0.3)]"
+          >
+            Send
+          </button>
+        )}
       </form>
     </div>
   );
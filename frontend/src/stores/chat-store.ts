@@ -9,6 +9,10 @@ interface ChatState {
   sessionsLoading: boolean;
   streamingContent: string;
   streamingPhase: string;
+  // Data and chart that arrive (query_result / chart_config) before the final response
+  streamingResult: Partial<ChatMessage> | null;
+  // Client-generated id of the WebSocket chat request in flight (used to cancel it)
+  activeRequestId: string | null;
 
   setSessions: (sessions: ChatSession[]) => void;
   setActiveSession: (id: string | null) => void;
@@ -17,7 +21,9 @@ interface ChatState {
   setLoading: (loading: boolean) => void;
   setSessionsLoading: (loading: boolean) => void;
   appendStreamChunk: (chunk: string, phase: string) => void;
+  mergeStreamingResult: (result: Partial<ChatMessage>) => void;
   clearStreaming: () => void;
+  setActiveRequest: (id: string | null) => void;
 }
 
 export const useChatStore = create<ChatState>((set) => ({
@@ -28,6 +34,8 @@ export const useChatStore = create<ChatState>((set) => ({
   sessionsLoading: true,
   streamingContent: '',
   streamingPhase: '',
+  streamingResult: null,
+  activeRequestId: null,
 
   setSessions: (sessions) => set({ sessions, sessionsLoading: false }),
   setActiveSession: (id) => set({ activeSessionId: id }),
@@ -41,5 +49,8 @@ export const useChatStore = create<ChatState>((set) => ({
       streamingContent: state.streamingContent + chunk,
       streamingPhase: phase,
     })),
-  clearStreaming: () => set({ streamingContent: '', streamingPhase: '' }),
+  mergeStreamingResult: (result) =>
+    set((state) => ({ streamingResult: { ...state.streamingResult, ...result } })),
+  clearStreaming: () => set({ streamingContent: '', streamingPhase: '', streamingResult: null }),
+  setActiveRequest: (id) => set({ activeRequestId: id }),
 }));